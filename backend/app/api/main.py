@@ -6,7 +6,13 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.analytics_router import router as analytics_router
 from app.api.bookings_router import router as bookings_router
+from app.api.metrics_router import router as metrics_router
 from app.api.ws import router as ws_router
+from app.bus import bus
+from app.core import config
+from app.llm.client import llm_client
+from app.stt.base import get_stt_class
+from app.tts.filler import filler
 
 app = FastAPI()
 
@@ -34,10 +40,25 @@ async def startup_event():
         except Exception as e:
             print(f"Failed to import {module_name}: {e}")
 
+    await bus.start()
+    await llm_client.start()
+    await get_stt_class(config.STT_BACKEND).startup()
+    filler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Cancels event handlers that are still running and closes shared clients."""
+    await bus.close()
+    await llm_client.close()
+    await filler.close()
+    await get_stt_class(config.STT_BACKEND).shutdown()
+
 
 app.include_router(ws_router)
 app.include_router(bookings_router, prefix="/api")
 app.include_router(analytics_router, prefix="/api")
+app.include_router(metrics_router, prefix="/api")
 
 if __name__ == "__main__":
     import uvicorn
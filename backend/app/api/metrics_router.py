@@ -0,0 +1,14 @@
+"""
+HTTP route exposing runtime metrics of the voice pipeline
+"""
+from fastapi import APIRouter
+
+from app.core.metrics import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """Get counters, gauges and latency summaries collected in this process"""
+    return metrics.snapshot()
@@ -0,0 +1,96 @@
+"""
+Per-call lifecycle management for WebSocket connections
+"""
+import asyncio
+import inspect
+from typing import Any, Awaitable, Callable, Coroutine, Optional
+from uuid import UUID
+
+from app.bus import bus as default_bus
+from app.bus.memory_bus import MemoryEventBus
+
+
+class CallSession:
+    """
+    Owns every resource a single call registers: bus subscriptions, background
+    tasks, queues and shutdown callbacks (clients, streams). ``close()`` tears
+    them all down exactly once, so a finished call leaves nothing behind on the
+    shared bus or event loop.
+
+    Usage:
+        async with CallSession(client_id) as session:
+            session.subscribe("client.audio", stt.on_audio_chunk, key=client_id)
+            session.create_task(stt.run())
+            session.on_close(stt.stop)
+    """
+
+    def __init__(self, client_id: UUID, bus: Optional[MemoryEventBus] = None):
+        self.client_id = client_id
+        self.bus = bus or default_bus
+        self.closed = False
+        self._subscriptions: list[tuple[str, Callable, Any]] = []
+        self._tasks: set[asyncio.Task] = set()
+        self._queues: list[asyncio.Queue] = []
+        self._closers: list[Callable[[], Awaitable[None] | None]] = []
+
+    def subscribe(self, topic: str, callback: Callable, key: Any = None) -> Callable:
+        """Subscribe on the bus; removed again when the session closes."""
+        self.bus.subscribe(topic, callback, key=key)
+        self._subscriptions.append((topic, callback, key))
+        return callback
+
+    def create_task(self, coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+        """Start a task that is cancelled when the session closes."""
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def register_queue(self, queue: asyncio.Queue) -> asyncio.Queue:
+        """Track a queue so anything still buffered is released on close."""
+        self._queues.append(queue)
+        return queue
+
+    def on_close(self, callback: Callable[[], Awaitable[None] | None]):
+        """Run a (sync or async) callback on close, in reverse registration order."""
+        self._closers.append(callback)
+        return callback
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+
+        # 1. Stop new events from reaching this call.
+        for topic, callback, key in self._subscriptions:
+            self.bus.unsubscribe(topic, callback, key=key)
+        self._subscriptions.clear()
+
+        # 2. Let owned components shut down (last registered first).
+        for closer in reversed(self._closers):
+            try:
+                result = closer()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"❌ Error while closing session {self.client_id}: {e}")
+        self._closers.clear()
+
+        # 3. Cancel whatever is still running.
+        tasks = tuple(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+        # 4. Drop buffered items so their memory is released immediately.
+        for queue in self._queues:
+            while not queue.empty():
+                queue.get_nowait()
+        self._queues.clear()
+
+    async def __aenter__(self) -> "CallSession":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -1,19 +1,21 @@
 import json
-import os
 import uuid
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from starlette.websockets import WebSocketState
 
+from app.api.session import CallSession
 from app.bus import bus
+from app.core import config
 from app.core.ids import new_id
-from app.schemas.events import ClientAudio, TTSAudio, ManagerAnswer, STTPartial, STTFinal, ClientSttInit, AgentRequest
-from app.stt.google_stt import GoogleSTT
+from app.core.turns import turns
+from app.llm.booking import speculation
+from app.schemas.events import ClientAudio, TTSAudio, ManagerAnswer, STTPartial, STTFinal, ClientSttInit, TurnInterrupted
+from app.stt.base import create_stt
 
 router = APIRouter()
 active_connections: dict[uuid.UUID, WebSocket] = {}
-stt_instances: dict[uuid.UUID, GoogleSTT] = {}
 
 load_dotenv()
 
@@ -38,11 +40,6 @@ async def on_stt_result(event: STTPartial | STTFinal):
         print(f"⚠️ Client {event.client_id} not in active connections")
 
 
-@bus.subscribe("stt.final")
-async def on_stt_final(event: STTFinal):
-    await bus.publish("agent.request", AgentRequest(agent="booking", text=event.text, client_id=event.client_id))
-
-
 @bus.subscribe("tts.audio")
 async def on_tts_audio(event: TTSAudio):
     """
@@ -52,13 +49,32 @@ async def on_tts_audio(event: TTSAudio):
     if event.client_id in active_connections:
         websocket = active_connections[event.client_id]
         try:
-            await websocket.send_bytes(event.chunk)
+            if event.chunk:
+                await websocket.send_bytes(event.chunk)
+            if event.segment_end:
+                # Everything sent since the last boundary plays on its own, before the answer is complete
+                await websocket.send_json({"type": "segment", "client_id": str(event.client_id)})
         except Exception as e:
             print(f"❌ Error sending audio to client {event.client_id}: {e}")
     else:
         print(f"Warning: Received TTS audio for disconnected client {event.client_id}")
 
 
+@bus.subscribe("turn.interrupted")
+async def on_turn_interrupted(event: TurnInterrupted):
+    """Tells the client to stop playing the interrupted answer and drop its queued audio."""
+    if event.client_id in active_connections:
+        try:
+            await active_connections[event.client_id].send_json({
+                "type": "barge_in",
+                "client_id": str(event.client_id),
+                "turn": event.turn,
+                "reason": event.reason,
+            })
+        except Exception as e:
+            print(f"❌ Error sending barge-in to client {event.client_id}: {e}")
+
+
 async def _handle_websocket_message(msg: dict, client_id: uuid.UUID):
     """Handles a single WebSocket message."""
     # text frames
@@ -70,13 +86,17 @@ async def _handle_websocket_message(msg: dict, client_id: uuid.UUID):
             return
 
         if data.get("type") == "stt_init":
+            # Malformed values fall back to the defaults instead of failing the call
+            sample_rate = data.get("sampleRate")
+            encoding = data.get("encoding")
             await bus.publish(
                 "client.stt_init",
                 ClientSttInit(
                     client_id=client_id,
-                    sample_rate=data.get("sampleRate", 16000),
-                    encoding=data.get("encoding", "LINEAR16"),
-                )
+                    sample_rate=sample_rate if isinstance(sample_rate, int) and not isinstance(sample_rate, bool) else 16000,
+                    encoding=encoding if isinstance(encoding, str) and encoding else "LINEAR16",
+                ),
+                key=client_id,
             )
         elif "text" in data and data["text"]:
             await bus.publish( # for TTS
@@ -86,35 +106,38 @@ async def _handle_websocket_message(msg: dict, client_id: uuid.UUID):
 
     # binary frames (audio)
     elif (b := msg.get("bytes")) is not None:
-        await bus.publish("client.audio", ClientAudio(chunk=b, client_id=client_id))
+        await bus.publish("client.audio", ClientAudio(chunk=b, client_id=client_id), key=client_id)
 
 
 @router.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: uuid.UUID):
     await websocket.accept()
-    active_connections[client_id] = websocket
-
-    recognizer_path = (
-        f"projects/{os.getenv('PROJECT_ID')}"
-        f"/locations/{os.getenv('LOCATION')}"
-        f"/recognizers/{os.getenv('RECOGNIZER_NAME')}"
-    )
-    stt = GoogleSTT(client_id=client_id, recognizer_path=recognizer_path)
-    stt_instances[client_id] = stt
-    await stt.start()
-
-    try:
-        while websocket.application_state == WebSocketState.CONNECTED:
-            msg = await websocket.receive()
-            await _handle_websocket_message(msg, client_id)
-
-    except WebSocketDisconnect:
-        print(f"🔌 Client {client_id} disconnected (WebSocketDisconnect)")
-        pass
-    except Exception as e:
-        print(f"❌ Error in WebSocket handler for client {client_id}: {e}")
-    finally:
-        active_connections.pop(client_id, None)
-        stt_inst = stt_instances.pop(client_id, None)
-        if stt_inst:
-            await stt_inst.stop()
+
+    # Everything this call registers is owned by the session and torn down
+    # when it closes, whatever way the connection ends.
+    async with CallSession(client_id) as session:
+        active_connections[client_id] = websocket
+        session.on_close(lambda: active_connections.pop(client_id, None))
+        session.on_close(lambda: turns.forget(client_id))
+        if speculation is not None:
+            # Runs after the recognizer has stopped, so no late partial re-arms it
+            session.on_close(lambda: speculation.discard(client_id))
+        await bus.register_connection(client_id)
+        session.on_close(lambda: bus.unregister_connection(client_id))
+
+        stt = create_stt(config.STT_BACKEND, client_id=client_id)
+        stt.attach(session)
+        await stt.start()
+
+        try:
+            while websocket.application_state == WebSocketState.CONNECTED:
+                msg = await websocket.receive()
+                if msg.get("type") == "websocket.disconnect":
+                    break
+                await _handle_websocket_message(msg, client_id)
+
+        except WebSocketDisconnect:
+            print(f"🔌 Client {client_id} disconnected (WebSocketDisconnect)")
+            pass
+        except Exception as e:
+            print(f"❌ Error in WebSocket handler for client {client_id}: {e}")
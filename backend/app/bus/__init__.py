@@ -1,6 +1,38 @@
+from app.core.config import BUS_ADDRESS, BUS_BACKEND
+from app.schemas.events import (
+    AgentRequest, ClientAudio, ClientSttInit, ManagerAnswer, ManagerAnswerDelta, ManagerRoute,
+    SpeechActivity, STTFinal, STTPartial, TTSAudio, TurnInterrupted,
+)
 from .memory_bus import MemoryEventBus
 
+# Audio topics stay ordered: chunks must reach the socket/recognizer in sequence.
+# client.stt_init too, so the negotiated format applies before the next chunk,
+# and streamed answer pieces, which are spoken in the order they were generated.
+ORDERED_TOPICS = ("client.audio", "client.stt_init", "tts.audio", "stt.partial", "manager.answer.delta")
+
+# Topics that may be forwarded to the node holding a call, and their event types.
+# Frames for any other topic are refused, so a broker connection cannot inject
+# arbitrary objects into a worker.
+ROUTED_TOPICS = {
+    "client.audio": ClientAudio,
+    "client.stt_init": ClientSttInit,
+    "stt.partial": STTPartial,
+    "stt.final": STTFinal,
+    "vad.speech_start": SpeechActivity,
+    "vad.speech_end": SpeechActivity,
+    "manager.route": ManagerRoute,
+    "agent.request": AgentRequest,
+    "manager.answer": ManagerAnswer,
+    "manager.answer.delta": ManagerAnswerDelta,
+    "tts.audio": TTSAudio,
+    "turn.interrupted": TurnInterrupted,
+}
+
 # Create a single, shared instance of the event bus.
 # All parts of the application will import this instance.
-bus = MemoryEventBus()
+if BUS_BACKEND == "socket":
+    from .socket_bus import SocketEventBus
 
+    bus = SocketEventBus(BUS_ADDRESS, topics=ROUTED_TOPICS, ordered_topics=ORDERED_TOPICS)
+else:
+    bus = MemoryEventBus(ordered_topics=ORDERED_TOPICS)
@@ -1,14 +1,32 @@
+import asyncio
 from collections import defaultdict
-from typing import Callable, Any, Optional
+from typing import Callable, Any, Optional, Iterable
+
 
 class MemoryEventBus:
-    def __init__(self):
+    def __init__(self, concurrent: bool = True, ordered_topics: Iterable[str] = ()):
+        """
+        Args:
+            concurrent: Dispatch subscribers as supervised tasks instead of
+                awaiting them one after another inside ``publish``.
+            ordered_topics: Topics whose subscribers are always awaited inline,
+                in order (e.g. audio chunks that must not be reordered).
+        """
         self.subscribers = defaultdict(list)
+        # topic -> routing key -> callbacks; looked up by key at publish time
+        self.keyed_subscribers: dict[str, dict[Any, list[Callable]]] = defaultdict(dict)
+        self.concurrent = concurrent
+        self.ordered_topics = set(ordered_topics)
+        self._tasks: set[asyncio.Task] = set()
 
-    def subscribe(self, topic: str, callback: Optional[Callable] = None):
+    def subscribe(self, topic: str, callback: Optional[Callable] = None, key: Any = None):
         """
         Subscribe to a topic. Can be used as a decorator or direct function call.
 
+        Passing ``key`` registers a routed subscription: the callback only
+        receives events published with that routing key (by default the
+        event's ``client_id``), found with a single dict lookup.
+
         Usage:
             @bus.subscribe("topic")
             def handler(event):
@@ -16,24 +34,108 @@ class MemoryEventBus:
 
         Or:
             bus.subscribe("topic", handler)
+            bus.subscribe("client.audio", stt.on_audio_chunk, key=client_id)
         """
         if callback is not None:
             # Direct function call syntax
-            self.subscribers[topic].append(callback)
+            self._add(topic, callback, key)
             return callback
         else:
             # Decorator syntax
             def decorator(cb: Callable):
-                self.subscribers[topic].append(cb)
+                self._add(topic, cb, key)
                 return cb
             return decorator
 
-    def unsubscribe(self, topic: str, callback: Callable):
+    def _add(self, topic: str, callback: Callable, key: Any):
+        if key is None:
+            self.subscribers[topic].append(callback)
+        else:
+            self.keyed_subscribers[topic].setdefault(key, []).append(callback)
+
+    def unsubscribe(self, topic: str, callback: Callable, key: Any = None):
         """Remove a callback from a topic's subscribers."""
-        if callback in self.subscribers[topic]:
-            self.subscribers[topic].remove(callback)
+        if key is None:
+            if callback in self.subscribers[topic]:
+                self.subscribers[topic].remove(callback)
+            return
+
+        routes = self.keyed_subscribers.get(topic)
+        if not routes or key not in routes:
+            return
+        if callback in routes[key]:
+            routes[key].remove(callback)
+        if not routes[key]:
+            del routes[key]
+
+    async def publish(self, topic: str, event: Any, key: Any = None):
+        """
+        Deliver an event to every subscriber of the topic.
+
+        Routed subscribers are selected by ``key``, falling back to the
+        event's ``client_id``; the cost does not depend on how many other
+        keys are subscribed.
+
+        Ordered topics (and every topic when ``concurrent`` is off) are awaited
+        inline so the publisher gets natural backpressure and chunk order is
+        kept. Other topics are fanned out as tasks, so a slow subscriber does
+        not stall the publisher. In both modes a failing subscriber is logged
+        and does not prevent delivery to the rest.
+        """
+        callbacks = self.subscribers.get(topic) or ()
+        routes = self.keyed_subscribers.get(topic)
+        if routes:
+            if key is None:
+                key = getattr(event, "client_id", None)
+            routed = routes.get(key)
+            if routed:
+                callbacks = (*callbacks, *routed)
+        if not callbacks:
+            return
+
+        if not self.concurrent or topic in self.ordered_topics:
+            for callback in tuple(callbacks):
+                try:
+                    await callback(event)
+                except Exception as e:
+                    self._report(topic, callback, e)
+            return
+
+        for callback in tuple(callbacks):
+            task = asyncio.create_task(callback(event), name=f"bus:{topic}")
+            self._tasks.add(task)
+            task.add_done_callback(lambda t, cb=callback: self._on_task_done(topic, cb, t))
+
+    def _on_task_done(self, topic: str, callback: Callable, task: asyncio.Task):
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            self._report(topic, callback, exc)
+
+    @staticmethod
+    def _report(topic: str, callback: Callable, exc: BaseException):
+        name = getattr(callback, "__qualname__", repr(callback))
+        print(f"❌ Subscriber {name} failed on '{topic}': {exc!r}")
+
+    async def start(self):
+        """Connect to shared infrastructure. Nothing to do in-process."""
+
+    async def register_connection(self, key: Any):
+        """Record that this process holds the call for ``key`` (e.g. its socket)."""
+
+    async def unregister_connection(self, key: Any):
+        """Forget a call registered with ``register_connection``."""
 
-    async def publish(self, topic: str, event: Any):
-        for callback in self.subscribers[topic]:
-            await callback(event)
+    async def drain(self):
+        """Wait until all in-flight subscriber tasks have finished."""
+        while self._tasks:
+            await asyncio.gather(*tuple(self._tasks), return_exceptions=True)
 
+    async def close(self):
+        """Cancel all in-flight subscriber tasks."""
+        for task in tuple(self._tasks):
+            task.cancel()
+        await asyncio.gather(*tuple(self._tasks), return_exceptions=True)
+        self._tasks.clear()
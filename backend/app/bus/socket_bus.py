@@ -0,0 +1,402 @@
+"""
+Multi-process event bus backend.
+
+Every worker process runs a ``SocketEventBus`` that connects to one shared
+``BusBroker`` over a Unix domain socket (``/path/to.sock``) or TCP
+(``host:port``). The broker keeps a connection registry of which node owns
+which call. Events are always handled on the node holding the call's socket:
+publishing an event for a client owned by another node forwards it there, and
+everything else is delivered locally exactly as ``MemoryEventBus`` does.
+
+Run the broker next to the workers:
+    python -m app.bus.socket_bus --address /tmp/voice-agent-bus.sock
+
+Events cross processes in an explicit format (``EventCodec``): only the
+topics and event types the bus was configured with, fields as JSON and audio
+as the raw frame payload, so nothing received from the broker is executed.
+"""
+import argparse
+import asyncio
+import dataclasses
+import json
+import struct
+from typing import Any, Mapping, Optional
+from uuid import UUID
+
+from app.bus.memory_bus import MemoryEventBus
+from app.core.ids import new_id
+
+_LEN = struct.Struct("!I")
+
+# Larger lengths mean a broken or hostile peer, not a real frame. The owners
+# snapshot is the largest header (~60 bytes per call), an MP3 segment the largest payload.
+MAX_HEADER_BYTES = 4 * 1024 * 1024
+MAX_PAYLOAD_BYTES = 16 * 1024 * 1024
+
+
+async def _open_connection(address: str):
+    if address.startswith("/") or ":" not in address:
+        return await asyncio.open_unix_connection(address)
+    host, port = address.rsplit(":", 1)
+    return await asyncio.open_connection(host, int(port))
+
+
+async def _start_server(handler, address: str):
+    if address.startswith("/") or ":" not in address:
+        return await asyncio.start_unix_server(handler, address)
+    host, port = address.rsplit(":", 1)
+    return await asyncio.start_server(handler, host, int(port))
+
+
+def _encode_frame(header: dict, payload: bytes = b"") -> bytes:
+    head = json.dumps(header, separators=(",", ":")).encode()
+    return _LEN.pack(len(head)) + head + _LEN.pack(len(payload)) + payload
+
+
+class FrameError(Exception):
+    """The stream is no longer correctly framed; the connection has to be dropped."""
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> tuple[bytes, bytes]:
+    """Reads one frame: its raw header and payload, within the size limits."""
+    (head_len,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+    if head_len > MAX_HEADER_BYTES:
+        raise FrameError(f"header of {head_len} bytes exceeds {MAX_HEADER_BYTES}")
+    head = await reader.readexactly(head_len)
+    (payload_len,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+    if payload_len > MAX_PAYLOAD_BYTES:
+        raise FrameError(f"payload of {payload_len} bytes exceeds {MAX_PAYLOAD_BYTES}")
+    payload = await reader.readexactly(payload_len) if payload_len else b""
+    return head, payload
+
+
+def _parse_header(head: bytes) -> dict:
+    header = json.loads(head)
+    if not isinstance(header, dict):
+        raise ValueError("frame header is not a JSON object")
+    return header
+
+
+def _field(header: dict, name: str, optional: bool = False) -> Any:
+    """A string field of a frame header (or None when ``optional``)."""
+    value = header.get(name)
+    if isinstance(value, str) or (optional and value is None):
+        return value
+    raise ValueError(f"frame '{name}' must be a string, got {value!r}")
+
+
+def _parse_key(value: Optional[str]) -> Any:
+    """Routing keys are client_ids; other keys stay strings."""
+    if value is None:
+        return None
+    try:
+        return UUID(value)
+    except ValueError:
+        return value
+
+
+class EventCodec:
+    """
+    Wire format for events: the topic's known event type, its fields as JSON
+    and a dataclass ``chunk`` as the raw frame payload. Topics and types not
+    in ``topics`` are refused in both directions.
+    """
+
+    def __init__(self, topics: Mapping[str, type]):
+        self.topics = dict(topics)
+
+    def encode(self, topic: str, event: Any, key: Any) -> tuple[dict, bytes]:
+        cls = self.topics.get(topic)
+        if cls is None or type(event) is not cls:
+            raise ValueError(f"'{topic}' ({type(event).__name__}) cannot cross processes")
+        payload = b""
+        if dataclasses.is_dataclass(event):
+            fields = {}
+            for field in dataclasses.fields(event):
+                value = getattr(event, field.name)
+                if field.name == "chunk":
+                    payload = bytes(value)
+                else:
+                    fields[field.name] = str(value) if isinstance(value, UUID) else value
+        else:
+            fields = event.model_dump(mode="json")
+        return {"fields": fields, "event_key": None if key is None else str(key)}, payload
+
+    def decode(self, topic: str, header: dict, payload: bytes) -> tuple[Any, Any]:
+        cls = self.topics.get(topic)
+        if cls is None:
+            raise ValueError(f"unknown topic '{topic}'")
+        fields = header.get("fields")
+        if not isinstance(fields, dict):
+            raise ValueError(f"'{topic}' frame without fields")
+        try:
+            if dataclasses.is_dataclass(cls):
+                kwargs = {}
+                for field in dataclasses.fields(cls):
+                    if field.name == "chunk":
+                        kwargs["chunk"] = payload
+                    elif field.name in fields:
+                        value = fields[field.name]
+                        kwargs[field.name] = UUID(value) if field.type is UUID else value
+                event = cls(**kwargs)
+            else:
+                event = cls.model_validate(fields)
+            return event, _parse_key(_field(header, "event_key", optional=True))
+        except (TypeError, AttributeError) as e:
+            # Missing or mistyped fields (pydantic's ValidationError already is a ValueError)
+            raise ValueError(f"bad '{topic}' frame: {e}") from e
+
+
+class ConnectionRegistry:
+    """Maps a call's routing key (client_id) to the node that holds its socket."""
+
+    def __init__(self):
+        self._owners: dict[str, str] = {}
+
+    def owner(self, key: Any) -> Optional[str]:
+        return self._owners.get(str(key))
+
+    def set(self, key: Any, node_id: Optional[str]):
+        if node_id is None:
+            self._owners.pop(str(key), None)
+        else:
+            self._owners[str(key)] = node_id
+
+    def drop_node(self, node_id: str) -> list[str]:
+        """Forget every key owned by a node; returns the keys removed."""
+        keys = [k for k, n in self._owners.items() if n == node_id]
+        for k in keys:
+            del self._owners[k]
+        return keys
+
+    def snapshot(self) -> dict[str, str]:
+        return dict(self._owners)
+
+    def replace(self, owners: dict[str, str]):
+        self._owners = dict(owners)
+
+    def __len__(self):
+        return len(self._owners)
+
+
+class BusBroker:
+    """Tracks connected nodes and forwards events to the node owning the call."""
+
+    def __init__(self, address: str):
+        self.address = address
+        self.registry = ConnectionRegistry()
+        self.nodes: dict[str, asyncio.StreamWriter] = {}
+        self._server = None
+
+    async def start(self):
+        self._server = await _start_server(self._handle, self.address)
+        print(f"🛰️ Bus broker listening on {self.address}")
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for writer in self.nodes.values():
+            writer.close()
+        self.nodes.clear()
+
+    def _broadcast(self, header: dict):
+        """
+        Queues an ownership update for every node without waiting for any of
+        them: one slow node must not hold up the registry everywhere else.
+        The frames are small and sent once per call, so buffering them is cheap.
+        """
+        frame = _encode_frame(header)
+        for writer in list(self.nodes.values()):
+            if not writer.is_closing():
+                writer.write(frame)
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, frame: bytes):
+        """Writes and waits for the node to take it, so a slow node cannot grow the broker's buffers."""
+        try:
+            writer.write(frame)
+            await writer.drain()
+        except ConnectionError:
+            pass  # the node's own handler cleans up
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        node_id = None
+        try:
+            while True:
+                head, payload = await _read_frame(reader)
+                try:
+                    header = _parse_header(head)
+                    kind = _field(header, "kind")
+                    if kind == "hello":
+                        node_id = _field(header, "node")
+                        self.nodes[node_id] = writer
+                        await self._send(writer, _encode_frame({"kind": "owners", "owners": self.registry.snapshot()}))
+                    elif node_id is None:
+                        raise ValueError(f"'{kind}' before hello")
+                    elif kind == "register":
+                        key = _field(header, "key")
+                        self.registry.set(key, node_id)
+                        self._broadcast({"kind": "owner", "key": key, "node": node_id})
+                    elif kind == "unregister":
+                        key = _field(header, "key")
+                        if self.registry.owner(key) == node_id:
+                            self.registry.set(key, None)
+                            self._broadcast({"kind": "owner", "key": key, "node": None})
+                    elif kind == "event":
+                        key = _field(header, "key")
+                        target = self.nodes.get(self.registry.owner(key))
+                        if target is not None:
+                            await self._send(target, _encode_frame(header, payload))
+                        else:
+                            print(f"⚠️ Bus broker: no node owns {key}, dropping '{header.get('topic')}'")
+                except ValueError as e:
+                    # A well-framed but malformed frame: skip it, keep the node
+                    print(f"⚠️ Bus broker: skipped frame from {node_id}: {e}")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except FrameError as e:
+            print(f"⚠️ Bus broker: dropping node {node_id}: {e}")
+        finally:
+            if node_id is not None and self.nodes.get(node_id) is writer:
+                del self.nodes[node_id]
+                for key in self.registry.drop_node(node_id):
+                    self._broadcast({"kind": "owner", "key": key, "node": None})
+            writer.close()
+
+
+class SocketEventBus(MemoryEventBus):
+    """``MemoryEventBus`` that forwards events for calls held by other nodes."""
+
+    def __init__(
+        self,
+        address: str,
+        topics: Mapping[str, type],
+        node_id: Optional[str] = None,
+        reconnect_s: float = 1.0,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.address = address
+        self.codec = EventCodec(topics)
+        self.node_id = node_id or new_id("node")
+        self.reconnect_s = reconnect_s
+        self.registry = ConnectionRegistry()
+        self._local_keys: set[str] = set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connected = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run(), name="bus:socket")
+            try:
+                await asyncio.wait_for(self._connected.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                print(f"⚠️ Bus broker {self.address} not reachable yet; delivering locally until it is")
+
+    async def close(self):
+        if self._runner:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        await super().close()
+
+    async def register_connection(self, key: Any):
+        self._local_keys.add(str(key))
+        self.registry.set(key, self.node_id)
+        await self._send({"kind": "register", "key": str(key)})
+
+    async def unregister_connection(self, key: Any):
+        self._local_keys.discard(str(key))
+        self.registry.set(key, None)
+        await self._send({"kind": "unregister", "key": str(key)})
+
+    async def publish(self, topic: str, event: Any, key: Any = None):
+        route = key if key is not None else getattr(event, "client_id", None)
+        if route is not None and self._writer is not None:
+            owner = self.registry.owner(route)
+            if owner is not None and owner != self.node_id:
+                try:
+                    fields, payload = self.codec.encode(topic, event, key)
+                except ValueError as e:
+                    print(f"⚠️ Bus node {self.node_id}: {e}; delivering locally")
+                else:
+                    await self._send({"kind": "event", "topic": topic, "key": str(route), **fields}, payload)
+                    return
+        await super().publish(topic, event, key)
+
+    async def _send(self, header: dict, payload: bytes = b""):
+        writer = self._writer
+        if writer is not None:
+            try:
+                writer.write(_encode_frame(header, payload))
+                await writer.drain()
+            except ConnectionError:
+                pass  # the reader side notices and reconnects
+
+    def _on_frame(self, header: dict, payload: bytes) -> Optional[tuple]:
+        """Applies a frame from the broker; returns (topic, event, key) for an event to deliver."""
+        kind = _field(header, "kind")
+        if kind == "owners":
+            owners = header.get("owners")
+            if not isinstance(owners, dict) or not all(isinstance(n, str) for n in owners.values()):
+                raise ValueError("'owners' must map keys to node ids")
+            self.registry.replace(owners)
+            for key in self._local_keys:
+                self.registry.set(key, self.node_id)
+            self._connected.set()
+        elif kind == "owner":
+            self.registry.set(_field(header, "key"), _field(header, "node", optional=True))
+        elif kind == "event":
+            topic = _field(header, "topic")
+            event, key = self.codec.decode(topic, header, payload)
+            return topic, event, key
+        return None
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await _open_connection(self.address)
+            except OSError:
+                await asyncio.sleep(self.reconnect_s)
+                continue
+
+            self._writer = writer
+            writer.write(_encode_frame({"kind": "hello", "node": self.node_id}))
+            for key in self._local_keys:
+                writer.write(_encode_frame({"kind": "register", "key": key}))
+            print(f"🛰️ Bus node {self.node_id} connected to {self.address}")
+
+            try:
+                while True:
+                    head, payload = await _read_frame(reader)
+                    try:
+                        delivery = self._on_frame(_parse_header(head), payload)
+                    except ValueError as e:
+                        print(f"⚠️ Bus node {self.node_id}: skipped frame: {e}")
+                        continue
+                    if delivery is not None:
+                        await MemoryEventBus.publish(self, *delivery)
+            except (asyncio.IncompleteReadError, ConnectionError, FrameError) as e:
+                print(f"⚠️ Bus node {self.node_id} lost broker connection: {e!r}")
+            finally:
+                self._writer = None
+                self._connected.clear()
+                # Without a broker every call is served by the node that has it
+                self.registry.replace({k: self.node_id for k in self._local_keys})
+                writer.close()
+            await asyncio.sleep(self.reconnect_s)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the shared event bus broker.")
+    parser.add_argument("--address", default="/tmp/voice-agent-bus.sock",
+                        help="Unix socket path or host:port")
+    args = parser.parse_args()
+    asyncio.run(BusBroker(args.address).serve_forever())
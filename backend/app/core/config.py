@@ -13,12 +13,113 @@ ELEVENLABS_LANGUAGE = os.getenv("ELEVENLABS_LANGUAGE")
 ELEVENLABS_LANG = os.getenv("ELEVENLABS_LANG")
 
 LLM_URL = os.getenv("LLM_URL")
+# Several OpenAI-compatible replicas, comma-separated; defaults to LLM_URL alone
+LLM_URLS = os.getenv("LLM_URLS", LLM_URL or "")
 LLM_MODEL = os.getenv("LLM_MODEL")
-LLM_MAX_TOKENS = os.getenv("LLM_MAX_TOKENS")
-LLM_TIMEOUT_S = os.getenv("LLM_TIMEOUT_S")
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "250"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "30"))
 DB_URL = os.getenv("DB_URL")
 
 GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 PROJECT_ID = os.getenv("PROJECT_ID")
 LOCATION = os.getenv("LOCATION")
 RECOGNIZER_NAME = os.getenv("RECOGNIZER_NAME")
+
+# Event bus: "memory" (single process) or "socket" (shared broker, multiple workers)
+BUS_BACKEND = os.getenv("BUS_BACKEND", "memory")
+BUS_ADDRESS = os.getenv("BUS_ADDRESS", "/tmp/voice-agent-bus.sock")
+
+# STT audio ingress: capacity in chunks and overflow policy (block | drop_oldest | collapse_silence)
+STT_INGRESS_MAX_FRAMES = int(os.getenv("STT_INGRESS_MAX_FRAMES", "100"))
+STT_INGRESS_POLICY = os.getenv("STT_INGRESS_POLICY", "drop_oldest")
+STT_SILENCE_RMS = float(os.getenv("STT_SILENCE_RMS", "300"))
+
+# Server-side VAD in front of STT: silent audio is not uploaded
+STT_VAD_ENABLED = os.getenv("STT_VAD_ENABLED", "1") == "1"
+STT_VAD_THRESHOLD_RMS = float(os.getenv("STT_VAD_THRESHOLD_RMS", str(STT_SILENCE_RMS)))
+STT_VAD_START_MS = int(os.getenv("STT_VAD_START_MS", "60"))
+STT_VAD_HANGOVER_MS = int(os.getenv("STT_VAD_HANGOVER_MS", "600"))
+STT_VAD_PREROLL_MS = int(os.getenv("STT_VAD_PREROLL_MS", "300"))
+STT_VAD_KEEPALIVE_MS = int(os.getenv("STT_VAD_KEEPALIVE_MS", "3000"))
+
+# Audio duration carried by each streaming STT request
+STT_FRAME_MS = int(os.getenv("STT_FRAME_MS", "100"))
+
+# Client audio chunks at least this large are transcoded in a worker thread; smaller ones inline
+STT_TRANSCODE_OFFLOAD_BYTES = int(os.getenv("STT_TRANSCODE_OFFLOAD_BYTES", "32768"))
+
+# Shared Google STT clients (gRPC channels) and pre-opened streams for new calls
+STT_CLIENT_POOL_SIZE = int(os.getenv("STT_CLIENT_POOL_SIZE", "2"))
+STT_PREWARM_STREAMS = int(os.getenv("STT_PREWARM_STREAMS", "0"))
+STT_PREWARM_MAX_AGE_S = float(os.getenv("STT_PREWARM_MAX_AGE_S", "5"))
+
+# STT stream rollover: streams are replaced before the provider's duration limit
+STT_STREAM_MAX_S = float(os.getenv("STT_STREAM_MAX_S", "300"))
+STT_ROLLOVER_LEAD_S = float(os.getenv("STT_ROLLOVER_LEAD_S", "15"))
+STT_ROLLOVER_WINDOW_S = float(os.getenv("STT_ROLLOVER_WINDOW_S", "30"))
+STT_ROLLOVER_REPLAY_MS = float(os.getenv("STT_ROLLOVER_REPLAY_MS", "10000"))
+
+# STT provider: "google" or "replay" (scripted transcripts, no network)
+STT_BACKEND = os.getenv("STT_BACKEND", "google")
+STT_REPLAY_SCRIPT = os.getenv("STT_REPLAY_SCRIPT")
+STT_REPLAY_SPEED = float(os.getenv("STT_REPLAY_SPEED", "1.0"))
+
+# Endpointing: where caller turns end ("provider" finals, "silence" timers, or "first" of both)
+STT_ENDPOINTING = os.getenv("STT_ENDPOINTING", "provider")
+STT_ENDPOINT_SILENCE_MS = int(os.getenv("STT_ENDPOINT_SILENCE_MS", "700"))
+STT_ENDPOINT_SETTLE_MS = int(os.getenv("STT_ENDPOINT_SETTLE_MS", "150"))
+
+# Shared LLM HTTP client: pooled keep-alive connections, HTTP/2 if the "h2" package is installed
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_KEEPALIVE_S = float(os.getenv("LLM_KEEPALIVE_S", "60"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "1") == "1"
+
+# Stream LLM tokens into TTS sentence by sentence (vLLM "stream": true)
+LLM_STREAM = os.getenv("LLM_STREAM", "1") == "1"
+
+# Speculative LLM generation once the partial transcript has been stable this long
+LLM_SPECULATIVE = os.getenv("LLM_SPECULATIVE", "0") == "1"
+LLM_SPECULATIVE_STABLE_MS = int(os.getenv("LLM_SPECULATIVE_STABLE_MS", "300"))
+
+# Conversation history packed into a token budget (context = vLLM --max-model-len)
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "8192"))
+LLM_HISTORY_MAX_TOKENS = int(os.getenv("LLM_HISTORY_MAX_TOKENS", "1500"))
+LLM_HISTORY_SUMMARY = os.getenv("LLM_HISTORY_SUMMARY", "0") == "1"
+
+# Fast-path router: greetings, hours, prices and FAQ hits are answered without the LLM
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "1") == "1"
+ROUTER_MIN_SCORE = float(os.getenv("ROUTER_MIN_SCORE", "88"))
+ROUTER_MAX_WORDS = int(os.getenv("ROUTER_MAX_WORDS", "8"))
+
+# LLM answers to standalone questions, reused across calls until the business context changes
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", "3600"))
+
+# Barge-in: caller speech cancels the answer in progress (LLM and TTS)
+BARGE_IN_ENABLED = os.getenv("BARGE_IN_ENABLED", "1") == "1"
+BARGE_IN_MIN_WORDS = int(os.getenv("BARGE_IN_MIN_WORDS", "2"))
+BARGE_IN_ON_VAD = os.getenv("BARGE_IN_ON_VAD", "0") == "1"
+
+# LLM admission control: requests beyond the limit queue by priority and are shed after the deadline
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))
+LLM_QUEUE_DEADLINE_MS = int(os.getenv("LLM_QUEUE_DEADLINE_MS", "3000"))
+
+# LLM endpoint pool: health checks, ejection after consecutive failures, hedged requests
+LLM_HEALTH_INTERVAL_S = float(os.getenv("LLM_HEALTH_INTERVAL_S", "5"))
+LLM_HEALTH_PATH = os.getenv("LLM_HEALTH_PATH", "/health")
+LLM_FAIL_THRESHOLD = int(os.getenv("LLM_FAIL_THRESHOLD", "3"))
+LLM_FAIL_COOLDOWN_S = float(os.getenv("LLM_FAIL_COOLDOWN_S", "10"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_MS = float(os.getenv("LLM_HEDGE_MIN_MS", "300"))
+
+# Booking turns carry the slot-filling state; raw history is cut to this many tokens
+LLM_STATE_HISTORY_TOKENS = int(os.getenv("LLM_STATE_HISTORY_TOKENS", "400"))
+
+# Filler acknowledgement ("Hetk, vaatan…") for escalated turns expected to reach first audio slower than this
+FILLER_ENABLED = os.getenv("FILLER_ENABLED", "0") == "1"
+FILLER_THRESHOLD_MS = float(os.getenv("FILLER_THRESHOLD_MS", "1200"))
+# Expected time to first audio until a kind has real timings ("kind=ms,..."; other kinds use FILLER_DEFAULT_MS)
+FILLER_DEFAULT_MS = float(os.getenv("FILLER_DEFAULT_MS", "1800"))
+FILLER_DEFAULT_MS_BY_KIND = os.getenv("FILLER_DEFAULT_MS_BY_KIND", "booking:long=2500,booking:question=1500,booking:turn=1800")
@@ -0,0 +1,72 @@
+"""
+Lightweight in-process metrics: counters, gauges and latency observations
+"""
+from collections import defaultdict, deque
+from typing import Any, Dict
+
+
+class Metrics:
+    def __init__(self, window: int = 1024):
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._window = window
+        self._samples: Dict[str, deque] = {}
+        self._totals: Dict[str, list] = {}  # name -> [count, sum]
+
+    def incr(self, name: str, value: float = 1):
+        """Increase a monotonically growing counter."""
+        self._counters[name] += value
+
+    def gauge(self, name: str, value: float):
+        """Set a point-in-time value (queue depth, in-flight requests, ...)."""
+        self._gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        """Record a sample (latency in ms, sizes); recent samples feed percentiles."""
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self._window)
+            self._totals[name] = [0, 0.0]
+        samples.append(value)
+        totals = self._totals[name]
+        totals[0] += 1
+        totals[1] += value
+
+    def counter(self, name: str) -> float:
+        return self._counters.get(name, 0)
+
+    def percentile(self, name: str, q: float) -> float | None:
+        """q-th percentile (0-100) of the recent samples, or None without data."""
+        samples = self._samples.get(name)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        idx = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def snapshot(self) -> Dict[str, Any]:
+        observations = {}
+        for name, samples in self._samples.items():
+            count, total = self._totals[name]
+            observations[name] = {
+                "count": count,
+                "avg": round(total / count, 3) if count else 0,
+                "p50": self.percentile(name, 50),
+                "p95": self.percentile(name, 95),
+                "max": max(samples) if samples else None,
+            }
+        return {
+            "counters": dict(self._counters),
+            "gauges": dict(self._gauges),
+            "observations": observations,
+        }
+
+    def reset(self):
+        self._counters.clear()
+        self._gauges.clear()
+        self._samples.clear()
+        self._totals.clear()
+
+
+# Shared instance used across the application
+metrics = Metrics()
@@ -0,0 +1,127 @@
+"""
+Per-call conversation turns: the work answering the current turn, cancelled on barge-in
+"""
+import asyncio
+import time
+from typing import Dict, Optional, Set
+
+from app.bus import bus
+from app.core import config
+from app.core.metrics import metrics
+from app.schemas.events import SpeechActivity, STTFinal, STTPartial, TurnInterrupted
+
+
+class _Turn:
+    __slots__ = ("number", "tasks", "started_at")
+
+    def __init__(self, number: int):
+        self.number = number
+        self.tasks: Set[asyncio.Task] = set()
+        self.started_at = time.monotonic()
+
+
+class TurnTracker:
+    """
+    Tracks, per client, the tasks answering the caller's current turn: the
+    LLM generation and the TTS that speaks it.
+
+    ``begin`` starts a new turn when a final transcript arrives and cancels
+    whatever still answers the previous one. ``interrupt`` does the same when
+    the caller starts speaking over the answer, and reports whether there
+    was anything to stop. Cancelled tasks clean up after themselves (HTTP
+    requests, TTS workers), so nothing of the old answer is sent afterwards.
+    """
+
+    def __init__(self):
+        self._turns: Dict[object, _Turn] = {}
+
+    def begin(self, client_id) -> bool:
+        """Starts the client's next turn; True when an unfinished answer was cancelled."""
+        previous = self._turns.get(client_id)
+        cancelled = self._cancel(client_id, previous, "final") if previous is not None else 0
+        self._turns[client_id] = _Turn(previous.number + 1 if previous else 1)
+        return cancelled > 0
+
+    def current(self, client_id) -> int:
+        turn = self._turns.get(client_id)
+        return turn.number if turn is not None else 0
+
+    def track(self, client_id, task: Optional[asyncio.Task] = None) -> Optional[asyncio.Task]:
+        """Adds ``task`` (default: the running task) to the client's current turn."""
+        task = task or asyncio.current_task()
+        turn = self._turns.get(client_id)
+        if turn is None:
+            turn = self._turns[client_id] = _Turn(1)
+        if task is not None and not task.done():
+            turn.tasks.add(task)
+            task.add_done_callback(turn.tasks.discard)
+        return task
+
+    def active(self, client_id) -> bool:
+        turn = self._turns.get(client_id)
+        return turn is not None and any(task is not asyncio.current_task() for task in turn.tasks)
+
+    def interrupt(self, client_id, reason: str) -> bool:
+        """Cancels the answer in progress; False when nothing was running."""
+        turn = self._turns.get(client_id)
+        if turn is None or not self.active(client_id):
+            return False
+        self._cancel(client_id, turn, reason)
+        self._turns[client_id] = _Turn(turn.number + 1)
+        return True
+
+    def forget(self, client_id):
+        turn = self._turns.pop(client_id, None)
+        if turn is not None:
+            self._cancel(client_id, turn, "closed")
+
+    def _cancel(self, client_id, turn: _Turn, reason: str) -> int:
+        current = asyncio.current_task()
+        cancelled = 0
+        for task in tuple(turn.tasks):
+            if task is not current and not task.done():
+                task.cancel()
+                cancelled += 1
+        turn.tasks.clear()
+        if cancelled and reason != "closed":
+            metrics.incr("turns.barge_in")
+            metrics.incr(f"turns.barge_in.{reason}")
+            metrics.observe("turns.barge_in_after_ms", (time.monotonic() - turn.started_at) * 1000)
+            print(f"✋ Barge-in ({reason}) for {client_id}: cancelled {cancelled} task(s) of turn {turn.number}")
+        return cancelled
+
+
+# Shared instance: stt.final begins turns, agents and TTS register their work
+turns = TurnTracker()
+
+
+async def _interrupted(client_id, reason: str):
+    await bus.publish("turn.interrupted", TurnInterrupted(
+        turn=turns.current(client_id) - 1,
+        reason=reason,
+        client_id=client_id,
+    ))
+
+
+# Registered before any stage that answers a turn (they all import this module),
+# so a final begins its turn before the work answering it is tracked.
+@bus.subscribe("stt.final")
+async def on_stt_final(event: STTFinal):
+    # The new turn replaces whatever still answers the previous one
+    if config.BARGE_IN_ENABLED and turns.begin(event.client_id):
+        await _interrupted(event.client_id, "final")
+
+
+@bus.subscribe("vad.speech_start")
+async def on_speech_start(event: SpeechActivity):
+    if config.BARGE_IN_ENABLED and config.BARGE_IN_ON_VAD and turns.interrupt(event.client_id, "vad"):
+        await _interrupted(event.client_id, "vad")
+
+
+@bus.subscribe("stt.partial")
+async def on_stt_partial(event: STTPartial):
+    # A word or two can be noise or a backchannel ("jah", "mhm"); more is the caller taking the turn
+    if not config.BARGE_IN_ENABLED or len(event.text.split()) < config.BARGE_IN_MIN_WORDS:
+        return
+    if turns.interrupt(event.client_id, "partial"):
+        await _interrupted(event.client_id, "partial")
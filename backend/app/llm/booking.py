@@ -1,67 +1,58 @@
-import httpx
+import asyncio
+import re
+import time
 
 from app.bus import bus
 from app.core.ids import new_id
-from app.schemas.events import AgentRequest, ManagerAnswer
+from app.core.metrics import metrics
+from app.core.turns import turns
+from app.schemas.events import AgentRequest, ManagerAnswer, ManagerAnswerDelta, ManagerRoute, STTPartial
 from app.services.booking_manager import create_booking
-from app.services.context_loader import format_context_for_llm, search_faq
-from app.services.conversation_history import format_history_for_llm, add_message_to_history
+from app.services.context_loader import format_context_for_llm, load_context, search_faq
+from app.services.conversation_history import add_message_to_history
 
 from app.llm.base import Agent
+from app.llm.client import llm_client
+from app.llm.dialogue_state import CONFIRM_MARKER, STATE_MARKER, BookingState, DialogueStateTracker
+from app.llm.history import history_budget, history_packer, token_estimator
+from app.llm.prompt import PromptBuilder, record_usage
+from app.llm.response_cache import ResponseCache, is_cacheable
+from app.llm.scheduler import BOOKING, CONFIRM, DEFAULT, SPECULATIVE, LLMOverloaded, llm_scheduler
+from app.llm.speculative import SpeculativeGenerator
+from app.llm.streaming import MarkerFilter, TextStream, iter_completion_sse
 from app.core import config
 
 # Load business context once at import
 BUSINESS_CONTEXT = format_context_for_llm()
 
+# Slot-filling state per call; the prompt carries it instead of the raw conversation
+dialogue_state = DialogueStateTracker(load_context())
+SERVICE_IDS = ", ".join(f"{s['id']} ({s['name']})" for s in dialogue_state.services.values())
+LOCATION_IDS = ", ".join(f"{l['id']} ({l['name']})" for l in dialogue_state.locations.values())
+
 SYSTEM_PROMPT = f"""Sa oled abivalmis eestikeelne AI assistent broneerimissüsteemi jaoks.
 Sa aitad kasutajatel broneerida aegu, vastata teenuste kohta küsimustele ja pakkuda abi.
 
 OLULINE KONTEKST SINU ETTEVÕTTE KOHTA:
 {BUSINESS_CONTEXT}
 
-BRONEERIMISE PROTSESS:
-1. Küsi kasutajalt, millist teenust ta soovib (haircut/massage/consultation)
-2. Küsi soovitud aega ja kuupäeva
-3. Küsi soovitud asukohta (downtown/suburb)
-4. Küsi kliendi nimi
-5. Küsi kliendi kontakttelefon
-6. AINULT SIIS kui KÕIK 5 andmed on kogutud, korda üle kõik detailid
-7. Küsi kinnitust: "Kas kinnitate broneeringu?"
-8. AINULT SIIS kui kasutaja kinnitab JA kõik andmed on olemas, kasuta BOOKING_CONFIRMED märgendit
-
-TÄHTIS - ENNE BOOKING_CONFIRMED KASUTAMIST:
-✓ Teenus peab olema valitud (haircut/massage/consultation)
-✓ Kuupäev ja kellaaeg peavad olema teada
-✓ Asukoht peab olema valitud (downtown=Kesklinnas või suburb=Kristiines)
-✓ Kliendi nimi peab olema teada
-✓ Kliendi telefon peab olema teada
-✓ Kasutaja peab olema kinnitanud
-
-TÄHTIS - KUUPÄEVA FORMAAT:
-- Kasuta ALATI aastat 2025
-- Formaat: YYYY-MM-DD HH:MM
-- Näiteks: 2025-11-09 14:00, 2025-12-15 10:00
-- Kui kasutaja ütleb "homme", "järgmine nädal", arvuta õige kuupäev aastas 2025
-
 PRAEGUNE KUUPÄEV: 8. november 2025
 
-OLULINE: AINULT kui KÕIK andmed on kogutud JA kasutaja kinnitab, 
-lisa oma vastuse LÕPPU täpselt see märgend formaadis:
-BOOKING_CONFIRMED|teenus_id|teenus_nimi|kuupäev_ja_kellaaeg|asukoht_id|asukoht_nimi|kliendi_nimi|telefon|märkused
-
-Näide õigest protsessist:
-1. Kasutaja: "Tahan broneerida juukselõikuse"
-2. AI: "Millisel ajal?"
-3. Kasutaja: "Homme kell 14:00"
-4. AI: "Kas Kesklinnas või Kristiines?"
-5. Kasutaja: "Kesklinnas"
-6. AI: "Palun andke oma nimi"
-7. Kasutaja: "Robin"
-8. AI: "Ja teie kontakttelefon?"
-9. Kasutaja: "5256"
-10. AI: "Kas kinnitate: Juukselõikus homme kell 14:00 Kesklinnas, Robin, tel 5256?"
-11. Kasutaja: "Jah"
-12. AI: "Suurepärane!" BOOKING_CONFIRMED|haircut|Juukselõikus|2025-11-09 14:00|downtown|Kesklinnas|Robin|5256|
+BRONEERIMINE:
+- Iga kasutaja sõnumi ees on BRONEERINGU OLEK (teadaolevad andmed) ja PUUDU (mida veel küsida).
+  Ära küsi uuesti seda, mis on olekus olemas. Küsi korraga üht puuduvat andmet.
+- KONTROLLI rida tähendab, et eelmine väärtus ei sobinud: selgita kasutajale ja küsi uuesti.
+- Kui kasutaja annab uusi andmeid, lisa vastuse LÕPPU eraldi reale ainult muutunud väljad:
+  {STATE_MARKER}teenus=<id>|aeg=<YYYY-MM-DD HH:MM>|asukoht=<id>|nimi=<nimi>|telefon=<number>|märkused=<tekst>
+- Teenused: {SERVICE_IDS}. Asukohad: {LOCATION_IDS}.
+- Kasuta ALATI aastat 2025; "homme", "järgmine nädal" arvuta praegusest kuupäevast.
+- Kui PUUDU on "-", korda andmed üle ja küsi: "Kas kinnitate broneeringu?"
+- AINULT kui kasutaja kinnitab ja PUUDU on "-", lisa vastuse lõppu eraldi reale: {CONFIRM_MARKER}
+
+Näide:
+Kasutaja: "Tahan esmaspäeval kell 14 juukselõikust"
+AI: "Kas Kesklinnas või Kristiines?"
+{STATE_MARKER}teenus=haircut|aeg=2025-11-10 14:00
 
 JUHISED:
 - Kasuta ülaltoodud konteksti, et vastata küsimustele täpselt ja informatiivselt
@@ -72,112 +63,311 @@ JUHISED:
 - Vasta eesti keeles, kui kasutaja räägib eesti keeles
 - Vasta inglise keeles, kui kasutaja räägib inglise keeles"""
 
+# Bump the label when the prompt changes on purpose; the hash catches the rest
+PROMPT = PromptBuilder(SYSTEM_PROMPT, label="booking-v4")
+print(f"🧩 Booking prompt prefix {PROMPT.version} ({len(PROMPT.prefix)} chars)")
 
-class BookingAgent(Agent):
-    async def process(self, event: AgentRequest):
-        try:
-            # Get conversation history for context
-            conversation_history = format_history_for_llm(event.client_id, limit=5)
-
-            # First, check if this is a FAQ question
-            faq_answer = search_faq(event.text)
-
-            # Generate LLM response using vLLM
-            print(f"🤖 Generating LLM response for: '{event.text}'")
-            if conversation_history:
-                print(f"📜 Including conversation history ({len(conversation_history.split('Kasutaja:')) - 1} exchanges)")
+# Answers to standalone questions asked without earlier context
+response_cache = ResponseCache(
+    max_entries=config.LLM_CACHE_MAX_ENTRIES,
+    ttl_s=config.LLM_CACHE_TTL_S,
+) if config.LLM_CACHE_ENABLED else None
 
-            # Create prompt with system context, history, and user message
-            full_prompt = f"{SYSTEM_PROMPT}\n\n"
 
-            # Add conversation history if available
-            if conversation_history:
-                full_prompt += f"{conversation_history}\n"
+OVERLOAD_TEXT = "Vabandust, mul on hetkel väga palju kõnesid. Palun korrake oma küsimust hetke pärast."
+FALLBACK_TEXT = "Vabandust, mul tekkis viga. Palun proovi uuesti."
+_CONFIRMATION = re.compile(r"\b(jah|jaa|kinnitan|kinnitame|sobib|õige|täpselt|yes)\b")
 
-            # Add FAQ answer if found
-            if faq_answer:
-                full_prompt += f"LEITUD FAQ VASTUS: {faq_answer}\n\n"
 
-            full_prompt += f"Kasutaja: {event.text}\n\nAssistent:"
+def turn_priority(text: str, history: str, state: BookingState | None = None, speculative: bool = False) -> int:
+    """Scheduling priority: confirming a booking first, then ongoing conversations."""
+    if speculative:
+        return SPECULATIVE
+    if state is not None and state.complete and _CONFIRMATION.search(text.lower()):
+        return CONFIRM
+    if history or (state is not None and state.started):
+        return BOOKING
+    return DEFAULT
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                # LLM PROMPTING
-                response = await client.post(
-                    config.LLM_URL,
-                    headers={"Content-Type": "application/json"},
-                    json={
-                        "model": config.LLM_MODEL,
-                        "prompt": full_prompt,
-                        "max_tokens": 250,
-                        "temperature": 0.7,
-                        "stop": ["\n\nKasutaja:", "Kasutaja:"]
-                    }
-                )
-                response.raise_for_status()
-                data = response.json()
-
-            response_text = data["choices"][0]["text"].strip()
-            print(f"🤖 LLM generated response: '{response_text}'")
-
-            # Check if response contains booking confirmation marker
-            booking_created = False
-            if "BOOKING_CONFIRMED|" in response_text:
-                # Extract booking details
-                parts = response_text.split("BOOKING_CONFIRMED|")
-                if len(parts) > 1:
-                    booking_data = parts[1].split("|")
-                    if len(booking_data) >= 7:
-                        service_id, service_name, date_time, location_id, location_name, customer_name, customer_phone = booking_data[:7]
-                        notes = booking_data[8] if len(booking_data) > 8 else ""
-
-                        # Create the booking
-                        booking_id = create_booking(
-                            client_id=event.client_id,
-                            service_id=service_id.strip(),
-                            service_name=service_name.strip(),
-                            date_time=date_time.strip(),
-                            location_id=location_id.strip(),
-                            location_name=location_name.strip(),
-                            customer_name=customer_name.strip(),
-                            customer_phone=customer_phone.strip(),
-                            notes=notes.strip() if notes else None
-                        )
-
-                        if booking_id:
-                            booking_created = True
-                            print(f"📅 Booking created: {booking_id}")
-                            # Remove the marker from response
-                            response_text = parts[0].strip()
-                            # Add confirmation message
-                            response_text += f"\n\nTeie broneering on salvestatud ja ootab kinnitust. Broneeringu number: {booking_id[:8]}"
 
-            # Save this exchange to conversation history
-            saved = add_message_to_history(event.client_id, event.text, response_text)
-            if saved:
-                print(f"💾 Conversation saved to history")
+class BookingAgent(Agent):
+    async def process(self, event: AgentRequest, stream: TextStream | None = None):
+        """Answers one user turn; ``stream`` is a generation that was already started speculatively."""
+        try:
+            if stream is None:
+                stream = self.generate(event.text, event.client_id)
+            else:
+                # The speculation only read the history window; this turn is real
+                self.commit_history(event.text, event.client_id)
+            await self.finish(event, stream)
 
-            # Send the response to the client via TTS
+        except asyncio.CancelledError:
+            # Barge-in: stop the generation too, it may still be running
+            if stream is not None:
+                stream.cancel()
+            raise
+        except LLMOverloaded as e:
+            print(f"🚦 {e}")
             await bus.publish("manager.answer", ManagerAnswer(
-                text=response_text,
+                text=OVERLOAD_TEXT,
                 trace_id=new_id("trace"),
                 client_id=event.client_id
             ))
-
         except Exception as e:
             print(f"❌ Error in BookingAgent: {e}")
             import traceback
             traceback.print_exc()
-            # Fallback response if LLM fails
-            fallback_text = "Vabandust, mul tekkis viga. Palun proovi uuesti."
+            # Fallback response if LLM fails before anything was spoken (finish() ends a started answer itself)
             await bus.publish("manager.answer", ManagerAnswer(
-                text=fallback_text,
+                text=FALLBACK_TEXT,
                 trace_id=new_id("trace"),
                 client_id=event.client_id
             ))
 
+    def generate(self, text: str, client_id, speculative: bool = False) -> TextStream:
+        """
+        Starts the LLM for a user message and returns its output as it streams.
+        A ``speculative`` generation leaves per-call state as it was (booking
+        state and history window are only read), so dropping it is free.
+        """
+        # What is known about the booking so far; read only, updated in finish()
+        state = dialogue_state.peek(client_id)
+        state_block = dialogue_state.render(state)
+
+        # Check if this is a FAQ question
+        faq_answer = search_faq(text)
+
+        conversation_history = self._history(text, client_id, state_block, faq_answer, commit=not speculative)
+
+        # Cached answers were given without any context, so only a first turn
+        # outside a booking may reuse one (a follow-up can mean something else)
+        cacheable = (
+            response_cache is not None
+            and not conversation_history
+            and not (state and state.started)
+            and is_cacheable(text)
+        )
+        if cacheable:
+            cached = response_cache.get(text)
+            if cached is not None:
+                print(f"♻️ Cached LLM response for: '{text}'")
+                stream = TextStream()
+                stream.append(cached)
+                stream.close()
+                return stream
+
+        # Generate LLM response using vLLM
+        print(f"🤖 Generating LLM response for: '{text}'")
+        if conversation_history:
+            print(f"📜 Including conversation history ({len(conversation_history.split('Kasutaja:')) - 1} exchanges)")
+
+        # Stable prefix first, then history, booking state, FAQ hit and the user message
+        full_prompt = PROMPT.build(text, history=conversation_history, state=state_block, faq_answer=faq_answer)
+
+        stream = TextStream()
+        cache_as = text if cacheable else None
+        priority = turn_priority(text, conversation_history, state, speculative)
+        stream.task = asyncio.create_task(self._complete(full_prompt, stream, priority, cache_as))
+        return stream
+
+    @staticmethod
+    def _history(text: str, client_id, state_block: str, faq_answer: str | None, commit: bool = True) -> str:
+        # Most recent conversation history that fits the context window; the
+        # booking facts are in the state block, so a few exchanges are enough
+        budget = min(
+            history_budget(PROMPT.prefix, state_block, text, faq_answer or ""),
+            config.LLM_STATE_HISTORY_TOKENS,
+        )
+        return history_packer.pack(client_id, budget, commit=commit)
+
+    def commit_history(self, text: str, client_id):
+        """Moves the history window (and starts its summary) as generate() would have for a real turn."""
+        state_block = dialogue_state.render(dialogue_state.peek(client_id))
+        self._history(text, client_id, state_block, search_faq(text))
+
+    async def _complete(self, prompt: str, stream: TextStream, priority: int = DEFAULT, cache_as: str | None = None):
+        """
+        Runs one /completions request into ``stream``, token by token when
+        streaming is on, once the scheduler admits it at ``priority``. With
+        ``cache_as``, the answer is cached for that question.
+        """
+        payload = {
+            "model": config.LLM_MODEL,
+            "prompt": prompt,
+            "max_tokens": config.LLM_MAX_TOKENS,
+            "temperature": 0.7,
+            "stop": ["\n\nKasutaja:", "Kasutaja:"],
+            "stream": config.LLM_STREAM,
+        }
+        if config.LLM_STREAM:
+            payload["stream_options"] = {"include_usage": True}
+        first_token = True
+        usage = None
+        try:
+            async with llm_scheduler.slot(priority):
+                started = time.monotonic()
+                # LLM PROMPTING
+                if config.LLM_STREAM:
+                    async with llm_client.stream(payload) as response:
+                        async for chunk in iter_completion_sse(response):
+                            if chunk.get("usage"):
+                                usage = chunk["usage"]
+                            if not chunk.get("choices"):
+                                continue
+                            if first_token:
+                                first_token = False
+                                metrics.observe("llm.first_token_ms", (time.monotonic() - started) * 1000)
+                            stream.append(chunk["choices"][0].get("text", ""))
+                else:
+                    data = await llm_client.complete(payload)
+                    usage = data.get("usage")
+                    stream.append(data["choices"][0]["text"])
+        except asyncio.CancelledError as e:
+            stream.close(e)
+            raise
+        except Exception as e:
+            # Reported by whoever reads the stream
+            stream.close(e)
+            return
+        metrics.observe("llm.generation_ms", (time.monotonic() - started) * 1000)
+        record_usage(usage, PROMPT.version)
+        if usage:
+            token_estimator.observe(len(prompt), usage.get("prompt_tokens") or 0)
+        stream.close()
+        if cache_as is not None:
+            answer = await stream.text()
+            if answer.strip() and CONFIRM_MARKER not in answer:
+                response_cache.put(cache_as, answer)
+
+    async def finish(self, event: AgentRequest, stream: TextStream):
+        """
+        Acts on a generated answer: books if confirmed, saves history and sends
+        it to TTS. With streaming, speech starts while the answer is still
+        being generated; the booking marker and what follows it are never spoken.
+
+        Every answer ends exactly once: if generation fails after speech has
+        started, the apology is the closing delta of the same answer; a failure
+        before that is raised, for process() to answer with the fallback.
+        """
+        trace_id = new_id("trace")
+        seq = 0
+        said: list[str] = []
+        ended = False
+
+        async def speak(text: str, final: bool = False, full_text: str | None = None):
+            nonlocal seq, ended
+            await bus.publish("manager.answer.delta", ManagerAnswerDelta(
+                text=text, trace_id=trace_id, client_id=event.client_id,
+                seq=seq, is_final=final, full_text=full_text,
+            ))
+            seq += 1
+            said.append(text)
+            ended = final
+
+        try:
+            if config.LLM_STREAM:
+                speakable = MarkerFilter(STATE_MARKER, CONFIRM_MARKER)
+                async for delta in stream:
+                    text = speakable.push(delta.lstrip() if seq == 0 else delta)
+                    if text:
+                        await speak(text)
+                tail = speakable.flush()
+                if tail:
+                    await speak(tail)
+
+            generated = await stream.text()
+            print(f"🤖 LLM generated response: '{generated}'")
+
+            # Slot updates and the confirmation come on machine lines after the spoken answer
+            updates, confirmed = dialogue_state.parse(generated)
+            response_text = dialogue_state.spoken(generated)
+            state = dialogue_state.get(event.client_id)
+            accepted = dialogue_state.apply(state, updates)
+            if accepted or state.rejected:
+                print(f"🧾 Booking state: +{accepted} rejected={state.rejected} missing={state.missing}")
+
+            addition = None
+            if confirmed and state.complete:
+                booking_id = create_booking(client_id=event.client_id, **dialogue_state.booking_fields(state))
+                if booking_id:
+                    print(f"📅 Booking created: {booking_id}")
+                    metrics.incr("llm.booking.created")
+                    dialogue_state.reset(event.client_id)
+                    addition = f"Teie broneering on salvestatud ja ootab kinnitust. Broneeringu number: {booking_id[:8]}"
+            elif confirmed:
+                # The model confirmed too early: nothing is booked, the caller is asked for the rest
+                print(f"⚠️ Booking confirmation with missing slots: {state.missing}")
+                metrics.incr("llm.booking.incomplete")
+                addition = f"Broneeringu jaoks on veel puudu: {', '.join(state.missing)}."
+            if addition:
+                response_text = f"{response_text}\n\n{addition}".strip()
+                if config.LLM_STREAM:
+                    await speak(f" {addition}")
+
+            # Save this exchange to conversation history
+            saved = add_message_to_history(event.client_id, event.text, response_text)
+            if saved:
+                print(f"💾 Conversation saved to history")
+
+            # Send the response to the client via TTS
+            if config.LLM_STREAM:
+                await speak("", final=True, full_text=response_text)
+            else:
+                await bus.publish("manager.answer", ManagerAnswer(
+                    text=response_text,
+                    trace_id=trace_id,
+                    client_id=event.client_id
+                ))
+        except asyncio.CancelledError:
+            # Barge-in: the speaker is cancelled with this turn, no closing delta
+            raise
+        except Exception as e:
+            if not seq:
+                raise
+            print(f"❌ Answer {trace_id} failed after speech started: {e}")
+            metrics.incr("llm.answer.failed_midway")
+            if not ended:
+                # The apology replaces the answer's ending; process() sends nothing more
+                spoken = "".join(said).strip()
+                await speak(f" {FALLBACK_TEXT}", final=True, full_text=f"{spoken} {FALLBACK_TEXT}".strip())
+
+
+# One agent serves every call; per-call state lives in history and the bus events
+booking_agent = BookingAgent()
+
+# Speculative mode: answers are generated from stable partials and claimed by the final
+speculation = SpeculativeGenerator(
+    lambda text, client_id: booking_agent.generate(text, client_id, speculative=True),
+    stable_ms=config.LLM_SPECULATIVE_STABLE_MS,
+) if config.LLM_SPECULATIVE else None
+# Requests still being answered, per client: until they finish, the history is not final.
+# One entry per request, so overlapping turns do not clear each other's.
+_in_flight: dict = {}
+
+
+@bus.subscribe("stt.partial")
+async def on_stt_partial(event: STTPartial):
+    if speculation is not None and event.client_id not in _in_flight:
+        speculation.on_partial(event.client_id, event.text)
+
+
+@bus.subscribe("manager.route")
+async def on_manager_route(event: ManagerRoute):
+    # Answered without the LLM: a speculative generation for it is never claimed
+    if speculation is not None and "booking" not in event.agents:
+        speculation.discard(event.client_id)
+
+
 @bus.subscribe("agent.request")
 async def on_agent_request(event: AgentRequest):
     if event.agent == "booking":
-        agent = BookingAgent()
-        await agent.process(event)
-
+        request = turns.track(event.client_id)
+        answering = _in_flight.setdefault(event.client_id, set())
+        answering.add(request)
+        try:
+            stream = speculation.claim(event.client_id, event.text) if speculation else None
+            await booking_agent.process(event, stream)
+        finally:
+            answering.discard(request)
+            if not answering and _in_flight.get(event.client_id) is answering:
+                del _in_flight[event.client_id]
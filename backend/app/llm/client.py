@@ -0,0 +1,382 @@
+"""
+Application-scoped HTTP client for the vLLM servers
+"""
+import asyncio
+import contextlib
+import importlib.util
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+from urllib.parse import urljoin
+
+import httpx
+
+from app.core import config
+from app.core.metrics import metrics
+
+
+class Endpoint:
+    """One OpenAI-compatible /completions URL and what the client knows about its health."""
+
+    __slots__ = ("url", "outstanding", "healthy", "failures", "down_until", "last_used")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0       # requests (or open streams) in progress
+        self.healthy = True        # last active health check
+        self.failures = 0          # consecutive failed requests
+        self.down_until = 0.0      # passive health: skipped until then
+        self.last_used = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and time.monotonic() >= self.down_until
+
+
+class _StreamResponse:
+    """
+    A streamed response whose first line was already read (to see which
+    hedged request answered first); ``aiter_lines`` replays it.
+    """
+
+    def __init__(self, response: httpx.Response, lines: AsyncIterator[str], first: Optional[str]):
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self._lines = lines
+        self._first = first
+
+    async def aiter_lines(self) -> AsyncIterator[str]:
+        if self._first is not None:
+            yield self._first
+        async for line in self._lines:
+            yield line
+
+
+class _Opened:
+    __slots__ = ("endpoint", "stack", "response", "lines", "first")
+
+    def __init__(self, endpoint: Endpoint, stack: contextlib.AsyncExitStack):
+        self.endpoint = endpoint
+        self.stack = stack
+        self.response: Optional[httpx.Response] = None
+        self.lines: Optional[AsyncIterator[str]] = None
+        self.first: Optional[str] = None
+
+
+class LLMClient:
+    """
+    One pooled ``httpx.AsyncClient`` shared by every turn, so requests reuse
+    kept-alive connections instead of opening a new one (TCP and, behind
+    TLS, a handshake) per turn. HTTP/2 is used when the optional ``h2``
+    package is installed; httpx negotiates it over TLS and falls back to
+    HTTP/1.1 otherwise.
+
+    Requests are spread over a pool of endpoints (replicas of the same
+    model): each goes to the available endpoint with the fewest outstanding
+    requests. An endpoint is taken out of rotation for ``cooldown_s`` after
+    ``fail_threshold`` consecutive failures (passive check) and while it
+    does not answer ``health_path`` (active check, every ``health_interval_s``).
+    Any response but a 5xx counts as alive, so servers without vLLM's
+    /health (a 404) are not ejected for it. A request that fails to connect
+    (or gets a 5xx) is retried once on another endpoint.
+
+    With ``hedge`` on, a request that has not produced its first byte
+    within the ``hedge_percentile`` of recent first-byte times (at least
+    ``hedge_min_ms``) is sent to a second endpoint as well; the first to
+    answer is used and the other is cancelled. Non-streamed completions
+    only answer when they are done, so they are timed (and hedged) apart.
+    """
+
+    def __init__(
+        self,
+        urls: str | Sequence[str] | None,
+        timeout_s: float = 30.0,
+        max_connections: int = 20,
+        keepalive_s: float = 60.0,
+        http2: bool = True,
+        health_interval_s: float = 5.0,
+        health_path: str = "/health",
+        fail_threshold: int = 3,
+        cooldown_s: float = 10.0,
+        hedge: bool = False,
+        hedge_percentile: float = 95,
+        hedge_min_ms: float = 300,
+    ):
+        if isinstance(urls, str):
+            urls = [u.strip() for u in urls.split(",")]
+        self.endpoints: List[Endpoint] = [Endpoint(u) for u in urls or () if u]
+        self.timeout_s = timeout_s
+        self.max_connections = max_connections
+        self.keepalive_s = keepalive_s
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self.health_interval_s = health_interval_s
+        self.health_path = health_path
+        self.fail_threshold = fail_threshold
+        self.cooldown_s = cooldown_s
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_ms = hedge_min_ms
+        self._client: httpx.AsyncClient | None = None
+        self._health_task: asyncio.Task | None = None
+
+    @property
+    def url(self) -> str | None:
+        return self.endpoints[0].url if self.endpoints else None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily too, so scripts that never run the app's startup still work
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout_s, connect=min(5.0, self.timeout_s)),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=self.keepalive_s,
+                ),
+                http2=self.http2,
+                headers={"Content-Type": "application/json"},
+            )
+        return self._client
+
+    async def start(self):
+        """Creates the pool, opens a first connection to each endpoint and starts health checks."""
+        self.client  # creates the pool
+        if not self.endpoints:
+            return
+        await self.check_health()
+        for endpoint in self.endpoints:
+            if endpoint.healthy:
+                print(f"🔌 LLM client connected to {endpoint.url} (http2={'on' if self.http2 else 'off'})")
+            else:
+                print(f"⚠️ LLM server not reachable at startup: {endpoint.url}")
+        if self.health_interval_s > 0 and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop(), name="llm:health")
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._health_task
+            self._health_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # --- health ---
+
+    async def check_health(self):
+        """Active check: GET ``health_path`` on every endpoint; an answer without a 5xx means alive."""
+        async def probe(endpoint: Endpoint):
+            try:
+                response = await self.client.get(urljoin(endpoint.url, self.health_path), timeout=2.0)
+                healthy = response.status_code < 500
+            except Exception:
+                healthy = False
+            if healthy and not endpoint.healthy:
+                print(f"✅ LLM endpoint {endpoint.url} is healthy again")
+                endpoint.failures = 0
+                endpoint.down_until = 0.0
+            elif not healthy and endpoint.healthy:
+                print(f"⚠️ LLM endpoint {endpoint.url} failed its health check")
+                metrics.incr("llm.endpoint.health_failures")
+            endpoint.healthy = healthy
+
+        await asyncio.gather(*(probe(e) for e in self.endpoints))
+        metrics.gauge("llm.endpoints.available", sum(e.available for e in self.endpoints))
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval_s)
+            try:
+                await self.check_health()
+            except Exception as e:
+                print(f"⚠️ LLM health check failed: {e}")
+
+    def _succeeded(self, endpoint: Endpoint):
+        endpoint.failures = 0
+
+    def _failed(self, endpoint: Endpoint, error: BaseException):
+        # Only the server's fault counts: connection errors, timeouts and 5xx
+        if isinstance(error, httpx.HTTPStatusError) and error.response.status_code < 500:
+            return
+        if not isinstance(error, httpx.HTTPError):
+            return
+        endpoint.failures += 1
+        metrics.incr("llm.endpoint.errors")
+        if endpoint.failures >= self.fail_threshold and endpoint.available:
+            endpoint.down_until = time.monotonic() + self.cooldown_s
+            metrics.incr("llm.endpoint.ejections")
+            print(f"⚠️ LLM endpoint {endpoint.url} ejected for {self.cooldown_s:.0f}s after {endpoint.failures} failures")
+        metrics.gauge("llm.endpoints.available", sum(e.available for e in self.endpoints))
+
+    # --- balancing ---
+
+    def pick(self, exclude: Sequence[Endpoint] = ()) -> Optional[Endpoint]:
+        """The available endpoint with the fewest outstanding requests (least recently used on ties)."""
+        candidates = [e for e in self.endpoints if e not in exclude]
+        if not candidates:
+            return None
+        # With every endpoint down, trying one beats failing outright
+        candidates = [e for e in candidates if e.available] or candidates
+        endpoint = min(candidates, key=lambda e: (e.outstanding, e.last_used))
+        endpoint.last_used = time.monotonic()
+        return endpoint
+
+    def _hedge_delay_s(self, metric: str) -> Optional[float]:
+        if not self.hedge or len(self.endpoints) < 2:
+            return None
+        typical = metrics.percentile(metric, self.hedge_percentile)
+        if typical is None:
+            return None
+        return max(self.hedge_min_ms, typical) / 1000
+
+    @staticmethod
+    def _retriable(error: BaseException) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code >= 500
+        return isinstance(error, httpx.TransportError)
+
+    async def _race(self, attempt, metric: str, cleanup=None):
+        """
+        Runs ``attempt(endpoint)`` on the best endpoint, adds a hedge on a
+        second one when the first is slow, and fails over once when every
+        running attempt has failed. Returns the first result; ``cleanup``
+        disposes of results that arrive too late to be used; ``metric`` holds
+        the response times the hedge delay is taken from.
+        """
+        if not self.endpoints:
+            raise RuntimeError("No LLM endpoint configured (LLM_URL / LLM_URLS)")
+        tasks: Dict[asyncio.Task, str] = {}
+        tried: List[Endpoint] = []
+
+        def launch(endpoint: Endpoint, kind: str):
+            tried.append(endpoint)
+            tasks[asyncio.create_task(attempt(endpoint))] = kind
+
+        launch(self.pick(), "primary")
+        delay = self._hedge_delay_s(metric)
+        hedge_at = None if delay is None else time.monotonic() + delay
+        failed_over = False
+        try:
+            while True:
+                timeout = None if hedge_at is None else max(0.0, hedge_at - time.monotonic())
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # First byte is late: ask a second endpoint too
+                    hedge_at = None
+                    endpoint = self.pick(exclude=tried)
+                    if endpoint is not None:
+                        metrics.incr("llm.hedge.started")
+                        launch(endpoint, "hedge")
+                    continue
+
+                error: Optional[BaseException] = None
+                for task in done:
+                    kind = tasks.pop(task)
+                    if task.exception() is None:
+                        if kind != "primary":
+                            metrics.incr(f"llm.{kind}.won")
+                        return task.result()
+                    error = task.exception()
+                if tasks:
+                    continue
+                endpoint = None if failed_over else self.pick(exclude=tried)
+                if endpoint is None or not self._retriable(error):
+                    raise error
+                failed_over = True
+                hedge_at = None
+                metrics.incr("llm.failover.started")
+                launch(endpoint, "failover")
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+                if cleanup is not None:
+                    for result in results:
+                        if not isinstance(result, BaseException):
+                            await cleanup(result)
+
+    # --- requests ---
+
+    async def complete(self, payload: dict) -> dict:
+        async def attempt(endpoint: Endpoint) -> dict:
+            endpoint.outstanding += 1
+            started = time.monotonic()
+            try:
+                response = await self.client.post(endpoint.url, json=payload)
+                response.raise_for_status()
+                data = response.json()
+            except Exception as e:
+                self._failed(endpoint, e)
+                raise
+            finally:
+                endpoint.outstanding -= 1
+            self._succeeded(endpoint)
+            metrics.observe("llm.endpoint.complete_ms", (time.monotonic() - started) * 1000)
+            return data
+
+        return await self._race(attempt, "llm.endpoint.complete_ms")
+
+    @asynccontextmanager
+    async def stream(self, payload: dict) -> AsyncIterator[_StreamResponse]:
+        """
+        A streamed response from whichever endpoint sent its first line
+        first; ``aiter_lines`` yields the body like ``httpx.Response``'s.
+        """
+        async def attempt(endpoint: Endpoint) -> _Opened:
+            opened = _Opened(endpoint, contextlib.AsyncExitStack())
+            endpoint.outstanding += 1
+            opened.stack.callback(self._release, endpoint)
+            started = time.monotonic()
+            try:
+                opened.response = await opened.stack.enter_async_context(
+                    self.client.stream("POST", endpoint.url, json=payload)
+                )
+                opened.response.raise_for_status()
+                opened.lines = opened.response.aiter_lines()
+                opened.first = await anext(opened.lines, None)
+            except BaseException as e:
+                await opened.stack.aclose()
+                if isinstance(e, Exception):
+                    self._failed(endpoint, e)
+                raise
+            metrics.observe("llm.endpoint.first_byte_ms", (time.monotonic() - started) * 1000)
+            return opened
+
+        async def discard(opened: _Opened):
+            await opened.stack.aclose()
+
+        opened = await self._race(attempt, "llm.endpoint.first_byte_ms", cleanup=discard)
+        try:
+            yield _StreamResponse(opened.response, opened.lines, opened.first)
+        except Exception as e:
+            self._failed(opened.endpoint, e)
+            raise
+        else:
+            self._succeeded(opened.endpoint)
+        finally:
+            await opened.stack.aclose()
+
+    @staticmethod
+    def _release(endpoint: Endpoint):
+        endpoint.outstanding -= 1
+
+
+# Shared instance; opened and closed by the app's startup/shutdown hooks
+llm_client = LLMClient(
+    config.LLM_URLS,
+    timeout_s=config.LLM_TIMEOUT_S,
+    max_connections=config.LLM_MAX_CONNECTIONS,
+    keepalive_s=config.LLM_KEEPALIVE_S,
+    http2=config.LLM_HTTP2,
+    health_interval_s=config.LLM_HEALTH_INTERVAL_S,
+    health_path=config.LLM_HEALTH_PATH,
+    fail_threshold=config.LLM_FAIL_THRESHOLD,
+    cooldown_s=config.LLM_FAIL_COOLDOWN_S,
+    hedge=config.LLM_HEDGE,
+    hedge_percentile=config.LLM_HEDGE_PERCENTILE,
+    hedge_min_ms=config.LLM_HEDGE_MIN_MS,
+)
@@ -0,0 +1,227 @@
+"""
+Per-session booking state, filled slot by slot from the conversation
+"""
+import re
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from rapidfuzz import fuzz, process
+
+from app.core.metrics import metrics
+
+STATE_MARKER = "OLEK|"
+CONFIRM_MARKER = "BOOKING_CONFIRMED"
+
+# Slot -> label used in the prompt and in the model's OLEK| lines
+SLOTS = {
+    "service_id": "teenus",
+    "date_time": "aeg",
+    "location_id": "asukoht",
+    "customer_name": "nimi",
+    "customer_phone": "telefon",
+}
+NOTES_LABEL = "märkused"
+_LABEL_TO_SLOT = {label: slot for slot, label in SLOTS.items()}
+
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+_DAY_KEYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+_STATE_LINE = re.compile(re.escape(STATE_MARKER) + r"([^\n]*)")
+_PHONE_CHARS = re.compile(r"[\s\-()]")
+
+
+class BookingState:
+    """The booking being collected in one call: validated slot values only."""
+
+    __slots__ = ("service_id", "date_time", "location_id", "customer_name", "customer_phone", "notes", "rejected")
+
+    def __init__(self):
+        self.service_id: Optional[str] = None
+        self.date_time: Optional[str] = None
+        self.location_id: Optional[str] = None
+        self.customer_name: Optional[str] = None
+        self.customer_phone: Optional[str] = None
+        self.notes: Optional[str] = None
+        self.rejected: Dict[str, str] = {}  # label -> why the last value was refused, shown once
+
+    @property
+    def started(self) -> bool:
+        return any(getattr(self, slot) for slot in SLOTS)
+
+    @property
+    def missing(self) -> List[str]:
+        return [label for slot, label in SLOTS.items() if not getattr(self, slot)]
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+
+class DialogueStateTracker:
+    """
+    Keeps a ``BookingState`` per client and renders it for the prompt.
+
+    The model does not re-read the conversation to find out what is known:
+    each prompt carries the current values and the missing slots, and the
+    model reports only what changed on an ``OLEK|label=value|...`` line at
+    the end of its answer. Values are checked against the business context
+    (service and location ids, opening hours, phone format) before they
+    enter the state; a refused value is shown to the model on the next turn.
+    A ``BOOKING_CONFIRMED`` line books the validated state, so booking data
+    is never taken from free text.
+    """
+
+    def __init__(self, context: Dict[str, Any], max_clients: int = 1000):
+        self.services = {s["id"]: s for s in context.get("services", []) if s.get("available", True)}
+        self.locations = {l["id"]: l for l in context.get("locations", []) if l.get("available", True)}
+        self.hours = context.get("working_hours", {})
+        self.max_clients = max_clients
+        self._states: OrderedDict = OrderedDict()
+        # Ids and display names, so "Kesklinnas" resolves to "downtown"
+        self._service_names = self._aliases(self.services)
+        self._location_names = self._aliases(self.locations)
+
+    @staticmethod
+    def _aliases(items: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        names = {}
+        for item_id, item in items.items():
+            names[item_id.lower()] = item_id
+            if item.get("name"):
+                names[item["name"].lower()] = item_id
+        return names
+
+    def get(self, client_id) -> BookingState:
+        state = self._states.get(client_id)
+        if state is None:
+            state = self._states[client_id] = BookingState()
+            while len(self._states) > self.max_clients:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(client_id)
+        return state
+
+    def peek(self, client_id) -> Optional[BookingState]:
+        """The state without creating or touching one (safe for speculative prompts)."""
+        return self._states.get(client_id)
+
+    def reset(self, client_id):
+        """Drops the client's state, e.g. once its booking has been made."""
+        self._states.pop(client_id, None)
+
+    # --- prompt ---
+
+    def render(self, state: Optional[BookingState]) -> str:
+        """Compact state block for the prompt."""
+        if state is None or (not state.started and not state.rejected):
+            return "BRONEERINGU OLEK: pole alustatud\n"
+        known = []
+        for slot, label in SLOTS.items():
+            value = getattr(state, slot)
+            if value:
+                known.append(f"{label}={self.describe(slot, value)}")
+        if state.notes:
+            known.append(f"{NOTES_LABEL}={state.notes}")
+        lines = [f"BRONEERINGU OLEK: {'; '.join(known) or '-'}"]
+        lines.append(f"PUUDU: {', '.join(state.missing) or '-'}")
+        if state.rejected:
+            lines.append("KONTROLLI: " + "; ".join(f"{label}: {why}" for label, why in state.rejected.items()))
+        return "\n".join(lines) + "\n"
+
+    def describe(self, slot: str, value: str) -> str:
+        if slot == "service_id":
+            return f"{self.services[value]['name']} ({value})"
+        if slot == "location_id":
+            return f"{self.locations[value]['name']} ({value})"
+        return value
+
+    # --- updates ---
+
+    @staticmethod
+    def parse(text: str) -> Tuple[Dict[str, str], bool]:
+        """``(label -> value updates, confirmed)`` from the machine lines of an answer."""
+        updates: Dict[str, str] = {}
+        for match in _STATE_LINE.finditer(text):
+            for field in match.group(1).split("|"):
+                label, sep, value = field.partition("=")
+                label, value = label.strip().lower(), value.strip()
+                if sep and value and (label in _LABEL_TO_SLOT or label == NOTES_LABEL):
+                    updates[label] = value
+        return updates, CONFIRM_MARKER in text
+
+    @staticmethod
+    def spoken(text: str) -> str:
+        """The answer without its machine lines."""
+        cut = [i for i in (text.find(STATE_MARKER), text.find(CONFIRM_MARKER)) if i >= 0]
+        return text[:min(cut)].strip() if cut else text.strip()
+
+    def apply(self, state: BookingState, updates: Dict[str, str]) -> List[str]:
+        """Validates and applies updates; returns the labels that were accepted."""
+        state.rejected.clear()
+        accepted = []
+        for label, value in updates.items():
+            if label == NOTES_LABEL:
+                state.notes = value[:200]
+                continue
+            slot = _LABEL_TO_SLOT[label]
+            normalized, problem = self.validate(slot, value)
+            if problem:
+                state.rejected[label] = problem
+                metrics.incr("llm.state.rejected")
+                continue
+            if getattr(state, slot) != normalized:
+                setattr(state, slot, normalized)
+                accepted.append(label)
+        if accepted:
+            metrics.incr("llm.state.updates", len(accepted))
+        return accepted
+
+    def validate(self, slot: str, value: str) -> Tuple[Optional[str], Optional[str]]:
+        """``(normalized value, None)`` or ``(None, reason)``."""
+        if slot == "service_id":
+            return self._match(value, self._service_names, "teenus", self.services)
+        if slot == "location_id":
+            return self._match(value, self._location_names, "asukoht", self.locations)
+        if slot == "date_time":
+            try:
+                when = datetime.strptime(value, DATE_FORMAT)
+            except ValueError:
+                return None, f"'{value}' ei ole kujul YYYY-MM-DD HH:MM"
+            day = self.hours.get(_DAY_KEYS[when.weekday()])
+            if day is not None:
+                if day.get("closed"):
+                    return None, f"{value} oleme suletud"
+                if not day["open"] <= when.strftime("%H:%M") < day["close"]:
+                    return None, f"{value} on väljaspool lahtiolekuaega ({day['open']}-{day['close']})"
+            return when.strftime(DATE_FORMAT), None
+        if slot == "customer_phone":
+            phone = _PHONE_CHARS.sub("", value)
+            digits = phone.lstrip("+")
+            if not digits.isdigit() or not 4 <= len(digits) <= 15:
+                return None, f"'{value}' ei ole telefoninumber"
+            return phone, None
+        if slot == "customer_name":
+            name = " ".join(value.split())
+            if not name or len(name) > 60 or any(ch.isdigit() for ch in name):
+                return None, f"'{value}' ei ole nimi"
+            return name, None
+        return value, None
+
+    @staticmethod
+    def _match(value: str, names: Dict[str, str], label: str, items: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+        match = process.extractOne(value.lower(), list(names), scorer=fuzz.ratio, score_cutoff=80)
+        if match is None:
+            return None, f"'{value}' ei ole meie {label} (valikud: {', '.join(items)})"
+        return names[match[0]], None
+
+    def booking_fields(self, state: BookingState) -> Dict[str, Any]:
+        """Keyword arguments for ``create_booking`` from a complete state."""
+        return {
+            "service_id": state.service_id,
+            "service_name": self.services[state.service_id]["name"],
+            "date_time": state.date_time,
+            "location_id": state.location_id,
+            "location_name": self.locations[state.location_id]["name"],
+            "customer_name": state.customer_name,
+            "customer_phone": state.customer_phone,
+            "notes": state.notes,
+        }
@@ -0,0 +1,207 @@
+"""
+Conversation history packed into a token budget
+"""
+import asyncio
+import math
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core import config
+from app.core.metrics import metrics
+from app.llm.client import llm_client
+from app.llm.scheduler import BACKGROUND, llm_scheduler
+from app.services.conversation_history import get_conversation_history
+
+HEADER = "EELMINE VESTLUS:"
+SUMMARY_LABEL = "VARASEMA VESTLUSE KOKKUVÕTE:"
+
+
+class TokenEstimator:
+    """
+    Token counts from text length. The characters-per-token ratio starts at
+    a conservative guess and is calibrated from the prompt token counts the
+    LLM server reports for real prompts, so no tokenizer is loaded here.
+    """
+
+    def __init__(self, chars_per_token: float = 3.0, alpha: float = 0.2):
+        self.chars_per_token = chars_per_token
+        self.alpha = alpha
+
+    def count(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token) if text else 0
+
+    def observe(self, chars: int, tokens: int):
+        if chars <= 0 or tokens <= 0:
+            return
+        self.chars_per_token += self.alpha * (chars / tokens - self.chars_per_token)
+        metrics.gauge("llm.chars_per_token", self.chars_per_token)
+
+
+class _Window:
+    __slots__ = ("start_ts", "summary", "pending", "summary_upto", "summarizing")
+
+    def __init__(self):
+        self.start_ts: Optional[str] = None     # timestamp of the oldest exchange in the prompt
+        self.summary: str = ""                  # in the prompt
+        self.pending: str = ""                  # newer summary, covers the exchanges before summary_upto
+        self.summary_upto: Optional[str] = None
+        self.summarizing: Optional[asyncio.Task] = None
+
+
+class HistoryPacker:
+    """
+    Picks the most recent exchanges that fit a token budget.
+
+    The window's first exchange only moves when the budget is exceeded, and
+    then jumps ahead to ``low_water`` of the budget: the history block stays
+    byte-identical from turn to turn (it only grows at the end), which keeps
+    the LLM server's prefix cache useful for several turns at a time.
+
+    With a ``summarize`` callable, exchanges that leave the window are folded
+    into a rolling summary in the background. A finished summary waits for
+    the next window move, so the block changes once per move instead of
+    twice, and counts against the same budget.
+
+    ``pack(..., commit=False)`` only reads the window: it returns the block a
+    real turn would get, but moves nothing, starts no summary and records no
+    metrics (for speculative prompts that may be thrown away).
+    """
+
+    def __init__(
+        self,
+        estimator: TokenEstimator,
+        max_exchanges: int = 50,
+        low_water: float = 0.6,
+        summarize: Optional[Callable[[str, List[Dict[str, Any]]], Awaitable[str]]] = None,
+        max_clients: int = 1000,
+    ):
+        self.estimator = estimator
+        self.max_exchanges = max_exchanges
+        self.low_water = low_water
+        self.summarize = summarize
+        self.max_clients = max_clients
+        self._windows: OrderedDict = OrderedDict()
+
+    def _window(self, client_id) -> _Window:
+        window = self._windows.get(client_id)
+        if window is None:
+            window = self._windows[client_id] = _Window()
+            while len(self._windows) > self.max_clients:
+                self._windows.popitem(last=False)
+        else:
+            self._windows.move_to_end(client_id)
+        return window
+
+    def _peek(self, client_id) -> _Window:
+        """A copy of the client's window, to pack without changing it."""
+        current = self._windows.get(client_id)
+        window = _Window()
+        if current is not None:
+            window.start_ts, window.summary, window.pending = current.start_ts, current.summary, current.pending
+        return window
+
+    def pack(self, client_id, budget_tokens: int, commit: bool = True) -> str:
+        exchanges = get_conversation_history(client_id, limit=self.max_exchanges)
+        if not exchanges or budget_tokens <= 0:
+            return ""
+
+        window = self._window(client_id) if commit else self._peek(client_id)
+        lines = [f"Kasutaja: {m['user']}\nAssistent: {m['assistant']}" for m in exchanges]
+        costs = [self.estimator.count(line) + 1 for line in lines]
+        timestamps = [m.get("timestamp") for m in exchanges]
+        start = timestamps.index(window.start_ts) if window.start_ts in timestamps else 0
+        suffix = [0] * (len(costs) + 1)
+        for i in range(len(costs) - 1, -1, -1):
+            suffix[i] = suffix[i + 1] + costs[i]
+
+        if self._fixed(window) + suffix[start] > budget_tokens:
+            if window.pending:
+                window.summary, window.pending = window.pending, ""
+            fixed = self._fixed(window)
+            target = budget_tokens * self.low_water
+            while start < len(costs) and fixed + suffix[start] > target:
+                start += 1
+            if commit:
+                metrics.incr("llm.history.window_moves")
+        fixed = self._fixed(window)
+
+        if start >= len(costs):
+            # Not even the last exchange fits
+            return ""
+
+        if window.start_ts != timestamps[start]:
+            window.start_ts = timestamps[start]
+            if commit and start > 0:
+                self._schedule_summary(window, exchanges[:start], timestamps[start])
+
+        if commit:
+            metrics.observe("llm.history_tokens", fixed + suffix[start])
+            metrics.observe("llm.history_exchanges", len(costs) - start)
+
+        parts = [HEADER]
+        if window.summary:
+            parts.append(f"{SUMMARY_LABEL} {window.summary}")
+        parts.extend(lines[start:])
+        parts.append("")
+        return "\n".join(parts)
+
+    def _fixed(self, window: _Window) -> int:
+        cost = self.estimator.count(HEADER) + 1
+        if window.summary:
+            cost += self.estimator.count(f"{SUMMARY_LABEL} {window.summary}") + 1
+        return cost
+
+    def _schedule_summary(self, window: _Window, dropped: List[Dict[str, Any]], upto: str):
+        if self.summarize is None or (window.summarizing and not window.summarizing.done()):
+            return
+        # Only exchanges the current summary does not cover yet
+        if window.summary_upto is not None:
+            dropped = [m for m in dropped if m.get("timestamp", "") >= window.summary_upto]
+        if not dropped:
+            return
+
+        async def run():
+            try:
+                previous = window.pending or window.summary
+                window.pending = (await self.summarize(previous, dropped)).strip()
+                window.summary_upto = upto
+                metrics.incr("llm.history.summaries")
+            except Exception as e:
+                print(f"⚠️ History summary failed: {e}")
+
+        window.summarizing = asyncio.create_task(run())
+
+
+async def summarize_history(previous: str, exchanges: List[Dict[str, Any]]) -> str:
+    """Folds exchanges that left the prompt window into a short running summary."""
+    dialogue = "\n".join(f"Kasutaja: {m['user']}\nAssistent: {m['assistant']}" for m in exchanges)
+    prompt = (
+        "Võta vestlus kokku kuni kolme lausega. Säilita broneeringu andmed "
+        "(teenus, aeg, asukoht, nimi, telefon) ja kasutaja soovid.\n\n"
+        + (f"SENINE KOKKUVÕTE: {previous}\n\n" if previous else "")
+        + f"{dialogue}\n\nKOKKUVÕTE:"
+    )
+    async with llm_scheduler.slot(BACKGROUND):
+        data = await llm_client.complete({
+            "model": config.LLM_MODEL,
+            "prompt": prompt,
+            "max_tokens": 120,
+            "temperature": 0.2,
+        })
+    return data["choices"][0]["text"]
+
+
+# Shared instances; the estimator is calibrated by every completion's usage report
+token_estimator = TokenEstimator()
+history_packer = HistoryPacker(
+    token_estimator,
+    summarize=summarize_history if config.LLM_HISTORY_SUMMARY else None,
+)
+
+
+def history_budget(*fixed_parts: str) -> int:
+    """Tokens left for history once the fixed prompt parts and the answer are reserved."""
+    used = sum(token_estimator.count(part) for part in fixed_parts)
+    # Headroom for estimation error on the fixed parts
+    left = int((config.LLM_CONTEXT_TOKENS - config.LLM_MAX_TOKENS - used) * 0.9)
+    return max(0, min(config.LLM_HISTORY_MAX_TOKENS, left))
@@ -0,0 +1,241 @@
+"""
+Fast-path intent router between stt.final and agent.request
+"""
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from rapidfuzz import fuzz, process
+
+from app.bus import bus
+from app.core import config
+from app.core.ids import new_id
+from app.core.metrics import metrics
+from app.llm.response_cache import is_cacheable
+from app.llm.speculative import normalize_transcript
+from app.schemas.events import AgentRequest, ManagerAnswer, ManagerRoute, STTFinal
+from app.services.context_loader import get_faq, load_context
+from app.services.conversation_history import add_message_to_history
+
+ESCALATE = "booking"
+
+# (intent, allowed words, words of which one must be present): an utterance
+# made only of allowed words is answered by the intent's template
+RULES = [
+    ("greeting",
+     {"tere", "tervist", "tsau", "hei", "halloo", "hallo", "hommikust", "päevast", "õhtust"},
+     {"tere", "tervist", "tsau", "hei", "halloo", "hallo", "hommikust"}),
+    ("goodbye",
+     {"head", "aega", "nägemist", "nägemiseni", "hüvasti", "ilusat", "päeva", "aitäh", "teile", "ka"},
+     {"nägemist", "nägemiseni", "hüvasti", "aega"}),
+    ("thanks",
+     {"aitäh", "tänan", "tänud", "suur", "väga", "tore", "teile"},
+     {"aitäh", "tänan", "tänud"}),
+]
+
+# Example phrasings per informational intent, compared with the whole utterance
+EXAMPLES = {
+    "hours": [
+        "mis kell te lahti olete",
+        "millal te lahti olete",
+        "millal te avatud olete",
+        "mis kell te avatud olete",
+        "millised on lahtiolekuajad",
+        "millised on teie lahtiolekuajad",
+        "mis on teie lahtiolekuajad",
+        "lahtiolekuajad",
+        "kui kaua te lahti olete",
+    ],
+    "prices": [
+        "mis teenused maksavad",
+        "millised on teie hinnad",
+        "millised on hinnad",
+        "mis on teie hinnad",
+        "mis hinnad teil on",
+        "palju teenused maksavad",
+        "hinnad",
+        "hinnakiri",
+    ],
+    "location": [
+        "kus te asute",
+        "kus te olete",
+        "mis on teie aadress",
+        "mis aadressil te asute",
+        "kus teie asukohad on",
+        "aadress",
+    ],
+}
+
+# (key, "on" day, "from" day, "until" day)
+DAYS = [
+    ("monday", "esmaspäeval", "esmaspäevast", "esmaspäevani"),
+    ("tuesday", "teisipäeval", "teisipäevast", "teisipäevani"),
+    ("wednesday", "kolmapäeval", "kolmapäevast", "kolmapäevani"),
+    ("thursday", "neljapäeval", "neljapäevast", "neljapäevani"),
+    ("friday", "reedel", "reedest", "reedeni"),
+    ("saturday", "laupäeval", "laupäevast", "laupäevani"),
+    ("sunday", "pühapäeval", "pühapäevast", "pühapäevani"),
+]
+
+
+def _hours_answer(hours: Dict[str, Any]) -> Optional[str]:
+    """Groups consecutive days with the same hours: "esmaspäevast neljapäevani 09:00 kuni 18:00"."""
+    groups: List[list] = []  # [first day, last day, hours]
+    for day in DAYS:
+        entry = hours.get(day[0])
+        if entry is None:
+            continue
+        span = "suletud" if entry.get("closed") else f"{entry['open']} kuni {entry['close']}"
+        if groups and groups[-1][2] == span:
+            groups[-1][1] = day
+        else:
+            groups.append([day, day, span])
+    if not groups:
+        return None
+
+    parts = []
+    for first, last, span in groups:
+        days = first[1] if first is last else f"{first[2]} {last[3]}"
+        parts.append(f"{days} {span}")
+    return f"Oleme avatud {', '.join(parts)}."
+
+
+def _prices_answer(services: List[Dict[str, Any]]) -> Optional[str]:
+    parts = []
+    for svc in services:
+        if not svc.get("available", True):
+            continue
+        price = svc.get("price_eur")
+        parts.append(f"{svc['name'].lower()} on tasuta" if not price else f"{svc['name'].lower()} {price} eurot")
+    if not parts:
+        return None
+    listed = parts[0] if len(parts) == 1 else f"{', '.join(parts[:-1])} ja {parts[-1]}"
+    return f"Hinnad: {listed}."
+
+
+def _location_answer(locations: List[Dict[str, Any]]) -> Optional[str]:
+    parts = [f"{loc['name']} aadressil {loc['address']}" for loc in locations if loc.get("available", True)]
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return f"Asume {parts[0]}."
+    return f"Meil on {len(parts)} asukohta: {', '.join(parts[:-1])} ja {parts[-1]}."
+
+
+class IntentRouter:
+    """
+    Answers simple turns from templates and escalates the rest to the LLM.
+
+    Greetings, thanks and goodbyes are recognised by rule: every word of
+    the utterance must belong to the intent's vocabulary. Opening hours,
+    prices, locations and FAQ questions are matched with rapidfuzz against
+    example phrasings, scoring the whole utterance, so a longer turn that
+    merely mentions prices ("kui palju maksab juukselõikus homme kell 14")
+    still reaches the LLM. Answers come from the business context and are
+    built once.
+    """
+
+    def __init__(self, context: Dict[str, Any], faqs: List[Dict[str, Any]], min_score: float = 88, max_words: int = 8):
+        self.min_score = min_score
+        self.max_words = max_words
+        business = context.get("business", {}).get("name")
+
+        self.answers: Dict[str, str] = {
+            "greeting": f"Tere! Siin {business}. Kuidas saan teid aidata?" if business else "Tere! Kuidas saan teid aidata?",
+            "thanks": "Palun! Kas saan veel millegagi aidata?",
+            "goodbye": "Head aega ja ilusat päeva!",
+        }
+        templates = {
+            "hours": _hours_answer(context.get("working_hours", {})),
+            "prices": _prices_answer(context.get("services", [])),
+            "location": _location_answer(context.get("locations", [])),
+        }
+
+        # Flat list of (normalized example, intent) for one extractOne call
+        self._choices: List[str] = []
+        self._intents: List[str] = []
+        for intent, answer in templates.items():
+            if answer:
+                self.answers[intent] = answer
+                for example in EXAMPLES[intent]:
+                    self._add(example, intent)
+        for faq in faqs:
+            if faq.get("question") and faq.get("answer"):
+                intent = f"faq:{faq.get('id', len(self.answers))}"
+                self.answers[intent] = faq["answer"]
+                self._add(faq["question"], intent)
+
+    def _add(self, example: str, intent: str):
+        self._choices.append(normalize_transcript(example))
+        self._intents.append(intent)
+
+    def route(self, text: str) -> Tuple[str, Optional[str]]:
+        """
+        ``(intent, answer)``; the answer is None when the turn goes to the LLM,
+        and the intent is then ``booking:<kind>`` (long, question or turn).
+        """
+        key = normalize_transcript(text)
+        words = key.split()
+        if not words or len(words) > self.max_words:
+            return self._escalation(text, words), None
+
+        vocabulary = set(words)
+        for intent, allowed, required in RULES:
+            if vocabulary <= allowed and vocabulary & required:
+                return intent, self.answers[intent]
+
+        match = process.extractOne(key, self._choices, scorer=fuzz.ratio, score_cutoff=self.min_score)
+        if match is None:
+            return self._escalation(text, words), None
+        intent = self._intents[match[2]]
+        return intent, self.answers[intent]
+
+    def _escalation(self, text: str, words: List[str]) -> str:
+        """What the LLM is asked for; these take very different times to answer."""
+        if len(words) > self.max_words:
+            return f"{ESCALATE}:long"
+        if is_cacheable(text):
+            return f"{ESCALATE}:question"
+        return f"{ESCALATE}:turn"
+
+
+router = IntentRouter(
+    load_context(),
+    get_faq(),
+    min_score=config.ROUTER_MIN_SCORE,
+    max_words=config.ROUTER_MAX_WORDS,
+)
+
+
+@bus.subscribe("stt.final")
+async def on_stt_final(event: STTFinal):
+    if not config.ROUTER_ENABLED:
+        await bus.publish("agent.request", AgentRequest(agent=ESCALATE, text=event.text, client_id=event.client_id))
+        return
+
+    started = time.perf_counter()
+    intent, answer = router.route(event.text)
+    local = answer is not None
+    await bus.publish("manager.route", ManagerRoute(
+        intent=intent,
+        agents=[] if local else [ESCALATE],
+        client_id=event.client_id,
+    ))
+
+    metrics.incr("router.turns")
+    metrics.incr("router.local" if local else "router.escalated")
+    metrics.gauge("router.local_fraction", metrics.counter("router.local") / metrics.counter("router.turns"))
+    if not local:
+        await bus.publish("agent.request", AgentRequest(agent=ESCALATE, text=event.text, client_id=event.client_id))
+        return
+
+    metrics.incr(f"router.intent.{intent.split(':')[0]}")
+    print(f"⚡ Answered '{event.text}' locally ({intent})")
+    await bus.publish("manager.answer", ManagerAnswer(
+        text=answer,
+        trace_id=new_id("trace"),
+        client_id=event.client_id,
+    ))
+    metrics.observe("router.local_ms", (time.perf_counter() - started) * 1000)
+
+    # The LLM sees locally answered turns in later prompts
+    add_message_to_history(event.client_id, event.text, answer)
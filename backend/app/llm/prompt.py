@@ -0,0 +1,58 @@
+"""
+Prompt layout that keeps vLLM's prefix cache warm
+"""
+import hashlib
+
+from app.core.metrics import metrics
+
+
+class PromptBuilder:
+    """
+    Builds completion prompts in a fixed order, from most to least stable:
+
+        [prefix: system prompt + business context]   same bytes for every call
+        [conversation history]                        grows within a session
+        [booking state] [FAQ hit] [user turn]         changes every turn
+        "Assistent:"
+
+    vLLM reuses cached KV blocks only for byte-identical prefixes, so the
+    prefix is built once and never formatted per request. ``version`` names
+    it (a label plus a hash of its bytes): when it changes, caches go cold.
+    """
+
+    def __init__(self, system_prompt: str, label: str):
+        self.prefix = system_prompt.rstrip() + "\n\n"
+        digest = hashlib.sha256(self.prefix.encode("utf-8")).hexdigest()[:8]
+        self.version = f"{label}-{digest}"
+
+    def build(self, user_text: str, history: str = "", state: str = "", faq_answer: str | None = None) -> str:
+        parts = [self.prefix]
+        if history:
+            parts.append(f"{history}\n")
+        if state:
+            parts.append(f"{state}\n")
+        if faq_answer:
+            parts.append(f"LEITUD FAQ VASTUS: {faq_answer}\n\n")
+        parts.append(f"Kasutaja: {user_text}\n\nAssistent:")
+        return "".join(parts)
+
+
+def record_usage(usage: dict | None, version: str):
+    """
+    Per-turn prompt instrumentation from the usage block of a completion.
+    ``cached_tokens`` is reported by vLLM with --enable-prompt-tokens-details.
+    """
+    if not usage:
+        return
+    prompt = usage.get("prompt_tokens") or 0
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    metrics.observe("llm.prompt_tokens", prompt)
+    metrics.observe("llm.cached_tokens", cached)
+    metrics.observe("llm.completion_tokens", usage.get("completion_tokens") or 0)
+    metrics.incr("llm.prompt_tokens_total", prompt)
+    metrics.incr("llm.cached_tokens_total", cached)
+    total = metrics.counter("llm.prompt_tokens_total")
+    if total:
+        metrics.gauge("llm.cache_hit_rate", metrics.counter("llm.cached_tokens_total") / total)
+    print(f"📊 LLM prompt {prompt} tokens, {cached} cached ({cached / prompt if prompt else 0:.0%}), "
+          f"completion {usage.get('completion_tokens', 0)}, prefix {version}")
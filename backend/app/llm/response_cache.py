@@ -0,0 +1,88 @@
+"""
+Cache of LLM answers to standalone informational questions
+"""
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.metrics import metrics
+from app.llm.speculative import normalize_transcript
+
+QUESTION_WORDS = {"mis", "mida", "millal", "kus", "kuhu", "kui", "kas", "milline", "millised", "mitu", "palju", "kuidas", "kes", "miks"}
+# Words that belong to a booking in progress: the answer depends on the conversation
+BOOKING_WORDS = re.compile(r"\b(broneeri\w*|tahan|tahaks\w*|soovi\w*|kinnita\w*|jah|ei|homme|täna|ülehomme)\b")
+
+
+def is_cacheable(text: str, max_words: int = 12) -> bool:
+    """
+    A short question that carries no booking details (dates, times, names,
+    numbers, confirmations), so its answer does not depend on who asks or
+    what was said before.
+    """
+    key = normalize_transcript(text)
+    words = key.split()
+    if not words or len(words) > max_words:
+        return False
+    if any(ch.isdigit() for ch in key) or BOOKING_WORDS.search(key):
+        return False
+    return text.rstrip().endswith("?") or words[0] in QUESTION_WORDS
+
+
+class _Entry:
+    __slots__ = ("text", "expires_at")
+
+    def __init__(self, text: str, expires_at: float):
+        self.text = text
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """
+    LRU cache with a TTL, keyed on the normalized question.
+
+    The cache lives in the process, and the prompt prefix (system prompt plus
+    business context) is built once at startup: a changed context takes
+    effect on restart, with an empty cache. The TTL bounds how long an
+    answer is reused within one process.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_s: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, text: str) -> Optional[str]:
+        key = normalize_transcript(text)
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            metrics.incr("llm.response_cache.miss")
+            self._update_rate()
+            return None
+        self._entries.move_to_end(key)
+        metrics.incr("llm.response_cache.hit")
+        self._update_rate()
+        return entry.text
+
+    def put(self, text: str, answer: str):
+        key = normalize_transcript(text)
+        self._entries[key] = _Entry(answer, time.monotonic() + self.ttl_s)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            metrics.incr("llm.response_cache.evictions")
+        metrics.incr("llm.response_cache.stores")
+        metrics.gauge("llm.response_cache.size", len(self._entries))
+
+    def clear(self):
+        self._entries.clear()
+        metrics.gauge("llm.response_cache.size", 0)
+
+    @staticmethod
+    def _update_rate():
+        hits = metrics.counter("llm.response_cache.hit")
+        total = hits + metrics.counter("llm.response_cache.miss")
+        metrics.gauge("llm.response_cache.hit_rate", hits / total)
@@ -0,0 +1,146 @@
+"""
+Admission control for LLM requests: bounded concurrency, priorities and deadlines
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+from app.core import config
+from app.core.metrics import metrics
+
+# Lower runs first
+CONFIRM = 0       # the caller is confirming a booking
+BOOKING = 1       # a conversation in progress
+DEFAULT = 2       # a first turn, chit-chat
+SPECULATIVE = 3   # may never be used
+BACKGROUND = 4    # history summaries, never shed
+
+PRIORITY_NAMES = {CONFIRM: "confirm", BOOKING: "booking", DEFAULT: "default", SPECULATIVE: "speculative", BACKGROUND: "background"}
+
+
+class LLMOverloaded(Exception):
+    """The request was shed: it could not start before its deadline."""
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "future", "enqueued_at")
+
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: "_Waiter"):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class LLMScheduler:
+    """
+    Lets at most ``max_in_flight`` requests reach the LLM server at once; the
+    rest wait in a priority queue (FIFO within a priority).
+
+    A request that has not started within ``deadline_s`` is shed with
+    ``LLMOverloaded``, or right away when the queue ahead of it would take
+    longer than that (estimated from recent request durations); only
+    ``BACKGROUND`` requests wait as long as it takes. Callers answer a shed
+    turn with a canned reply, so under overload most callers still get a
+    timely answer instead of all of them getting a late one.
+    """
+
+    def __init__(self, max_in_flight: int = 16, deadline_s: Optional[float] = 3.0):
+        self.max_in_flight = max_in_flight
+        self.deadline_s = deadline_s
+        self.in_flight = 0
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for w in self._queue if not w.future.done())
+
+    def expected_wait_s(self, priority: int) -> float:
+        """Rough wait for a new request: the work queued ahead of it, spread over all slots."""
+        if self.in_flight < self.max_in_flight:
+            return 0.0
+        typical_ms = metrics.percentile("llm.generation_ms", 50)
+        if typical_ms is None:
+            return 0.0
+        ahead = sum(1 for w in self._queue if w.priority <= priority and not w.future.done())
+        return (ahead + 1) / self.max_in_flight * typical_ms / 1000
+
+    @asynccontextmanager
+    async def slot(self, priority: int = DEFAULT) -> AsyncIterator[None]:
+        """Holds one in-flight slot for the duration of the block."""
+        await self.acquire(priority, None if priority >= BACKGROUND else self.deadline_s)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: int = DEFAULT, deadline_s: Optional[float] = None):
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        if self.in_flight < self.max_in_flight and not self.queued:
+            self.in_flight += 1
+            self._gauges()
+            self._waited(name, 0.0)
+            return
+
+        if deadline_s is not None and self.expected_wait_s(priority) > deadline_s:
+            self._shed(name, "predicted")
+
+        waiter = _Waiter(priority, next(self._seq))
+        heapq.heappush(self._queue, waiter)
+        self._gauges()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=deadline_s)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                waiter.future.cancel()
+                self._gauges()
+                self._shed(name, "deadline")
+            # Granted at the last moment: keep the slot
+        except asyncio.CancelledError:
+            # The turn was cancelled while waiting (barge-in); a slot granted meanwhile goes back
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release()
+            else:
+                waiter.future.cancel()
+            self._gauges()
+            raise
+        self._waited(name, (time.monotonic() - waiter.enqueued_at) * 1000)
+
+    def release(self):
+        self.in_flight -= 1
+        while self._queue and self.in_flight < self.max_in_flight:
+            waiter = heapq.heappop(self._queue)
+            if waiter.future.done():
+                continue  # shed or cancelled while queued
+            self.in_flight += 1
+            waiter.future.set_result(None)
+        self._gauges()
+
+    @staticmethod
+    def _waited(name: str, wait_ms: float):
+        metrics.observe("llm.queue_wait_ms", wait_ms)
+        metrics.observe(f"llm.queue_wait_ms.{name}", wait_ms)
+
+    def _shed(self, name: str, reason: str):
+        metrics.incr("llm.shed")
+        metrics.incr(f"llm.shed.{reason}")
+        metrics.incr(f"llm.shed.{name}")
+        raise LLMOverloaded(f"LLM overloaded ({self.in_flight} in flight, {self.queued} queued), {name} request shed ({reason})")
+
+    def _gauges(self):
+        metrics.gauge("llm.in_flight", self.in_flight)
+        metrics.gauge("llm.queue_depth", self.queued)
+
+
+# Shared by every LLM request of this process
+llm_scheduler = LLMScheduler(
+    max_in_flight=config.LLM_MAX_IN_FLIGHT,
+    deadline_s=config.LLM_QUEUE_DEADLINE_MS / 1000,
+)
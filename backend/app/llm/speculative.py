@@ -0,0 +1,115 @@
+"""
+Speculative LLM generation on stable STT partials
+"""
+import asyncio
+import re
+import time
+from typing import Callable, Optional
+
+from app.core.metrics import metrics
+from app.llm.streaming import TextStream
+
+_PUNCT = re.compile(r"[^\w\s]")
+
+
+def normalize_transcript(text: str) -> str:
+    """Case, punctuation and spacing differ between partials and finals; words don't."""
+    return " ".join(_PUNCT.sub(" ", text.lower()).split())
+
+
+class _Speculation:
+    __slots__ = ("key", "text", "task", "stream", "started_at", "finished_at")
+
+    def __init__(self, key: str, text: str):
+        self.key = key
+        self.text = text
+        self.task: Optional[asyncio.Task] = None
+        self.stream: Optional[TextStream] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+
+class SpeculativeGenerator:
+    """
+    Starts a generation once a caller's partial transcript has not changed for
+    ``stable_ms``. The final transcript then claims the result if it says the
+    same thing; a partial that changes, or a final that differs, cancels it.
+
+    ``generate(text, client_id)`` starts a generation and returns its
+    ``TextStream``; it must be free of side effects, since a speculative
+    answer that is never claimed is simply dropped. A claimed stream may
+    still be generating: its reader picks it up from the first token.
+    """
+
+    def __init__(self, generate: Callable[[str, object], TextStream], stable_ms: float = 300, expire_s: float = 10):
+        self._generate = generate
+        self.stable_ms = stable_ms
+        self.expire_s = expire_s
+        self._pending: dict[object, _Speculation] = {}
+
+    def on_partial(self, client_id, text: str):
+        key = normalize_transcript(text)
+        spec = self._pending.get(client_id)
+        if spec is not None and spec.key == key:
+            return  # still stable
+        if spec is not None:
+            self._cancel(client_id, spec, "diverged")
+        if not key:
+            return
+
+        spec = _Speculation(key, text)
+        spec.task = asyncio.create_task(self._run(client_id, spec), name=f"llm:speculate:{client_id}")
+        self._pending[client_id] = spec
+
+    async def _run(self, client_id, spec: _Speculation):
+        await asyncio.sleep(self.stable_ms / 1000)
+        spec.started_at = time.monotonic()
+        metrics.incr("llm.speculative.started")
+        print(f"🔮 Speculative generation for {client_id}: '{spec.text}'")
+        spec.stream = self._generate(spec.text, client_id)
+        try:
+            await spec.stream.wait()
+        finally:
+            spec.finished_at = time.monotonic()
+            # A final that never comes (hang-up, STT error) must not pin the entry
+            asyncio.get_running_loop().call_later(self.expire_s, self._expire, client_id, spec)
+
+    def _expire(self, client_id, spec: _Speculation):
+        if self._pending.get(client_id) is spec:
+            del self._pending[client_id]
+            metrics.incr("llm.speculative.expired")
+
+    def _cancel(self, client_id, spec: _Speculation, reason: str):
+        if self._pending.get(client_id) is spec:
+            del self._pending[client_id]
+        spec.task.cancel()
+        if spec.stream is not None:
+            spec.stream.cancel()
+        if spec.started_at is not None:
+            metrics.incr(f"llm.speculative.{reason}")
+
+    def discard(self, client_id):
+        spec = self._pending.get(client_id)
+        if spec is not None:
+            self._cancel(client_id, spec, "discarded")
+
+    def claim(self, client_id, text: str) -> Optional[TextStream]:
+        """
+        The speculative generation for this final transcript, or None when
+        there is none to use (different words, not started yet, or it failed).
+        """
+        spec = self._pending.pop(client_id, None)
+        if spec is None:
+            return None
+        if spec.key != normalize_transcript(text) or spec.stream is None:
+            self._cancel(client_id, spec, "diverged")
+            return None
+        if spec.stream.failed:
+            print(f"⚠️ Speculative generation for {client_id} failed, generating again")
+            return None
+
+        # Time the turn did not have to wait: the part of the generation that ran before the final
+        now = time.monotonic()
+        metrics.incr("llm.speculative.hit")
+        metrics.observe("llm.speculative.saved_ms", (min(now, spec.finished_at or now) - spec.started_at) * 1000)
+        return spec.stream
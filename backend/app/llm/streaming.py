@@ -0,0 +1,118 @@
+"""
+Streaming LLM output: replayable text streams and vLLM SSE parsing
+"""
+import asyncio
+import json
+from typing import AsyncIterator, Optional
+
+import httpx
+
+
+class TextStream:
+    """
+    The text of one generation as it arrives. Any number of readers can
+    iterate it from the beginning, also after it has finished, so a
+    generation can be started before anyone knows who will consume it.
+    """
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None  # the producer, cancelled with the stream
+        self._parts: list[str] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def failed(self) -> bool:
+        return self._error is not None
+
+    def append(self, delta: str):
+        if delta:
+            self._parts.append(delta)
+            self._changed.set()
+
+    def close(self, error: Optional[BaseException] = None):
+        self._done = True
+        self._error = error
+        self._changed.set()
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+        if not self._done:
+            self.close(asyncio.CancelledError())
+
+    async def wait(self):
+        """Waits until the generation has ended, successfully or not."""
+        while not self._done:
+            self._changed.clear()
+            await self._changed.wait()
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        i = 0
+        while True:
+            while i < len(self._parts):
+                yield self._parts[i]
+                i += 1
+            if self._done:
+                if self._error is not None:
+                    raise self._error
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+    async def text(self) -> str:
+        """The whole generated text; raises if the generation failed."""
+        await self.wait()
+        if self._error is not None:
+            raise self._error
+        return "".join(self._parts).strip()
+
+
+async def iter_completion_sse(response: httpx.Response) -> AsyncIterator[dict]:
+    """Chunks of a streamed vLLM /completions response (server-sent events)."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            return
+        yield json.loads(payload)
+
+
+class MarkerFilter:
+    """
+    Passes streamed text through until one of ``markers`` appears and
+    withholds everything from there on. A tail that could still turn into
+    a marker is held back until the next delta decides it.
+    """
+
+    def __init__(self, *markers: str):
+        self.markers = markers
+        self.found = False
+        self._held = ""
+
+    def push(self, delta: str) -> str:
+        if self.found:
+            return ""
+        text = self._held + delta
+        hits = [i for i in (text.find(m) for m in self.markers) if i >= 0]
+        if hits:
+            self.found = True
+            self._held = ""
+            return text[:min(hits)]
+        keep = 0
+        for n in range(min(max(len(m) for m in self.markers) - 1, len(text)), 0, -1):
+            if any(m.startswith(text[-n:]) for m in self.markers):
+                keep = n
+                break
+        self._held = text[len(text) - keep:] if keep else ""
+        return text[:len(text) - keep]
+
+    def flush(self) -> str:
+        held, self._held = self._held, ""
+        return "" if self.found else held
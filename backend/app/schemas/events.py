@@ -1,14 +1,21 @@
+from dataclasses import dataclass
 from typing import List, Literal
 from uuid import UUID
 
 from pydantic import BaseModel, Field
 
+# Audio frames are published many times per second per call, so they are plain
+# slotted dataclasses: no validation and no copy of the payload. ``chunk`` may be
+# any bytes-like object (bytes, bytearray, memoryview) and is passed through as is.
+# Control-plane events below stay pydantic models.
 
-class ClientAudio(BaseModel):
-    chunk: bytes
+
+@dataclass(slots=True)
+class ClientAudio:
+    chunk: bytes | memoryview
+    client_id: UUID
     encoding: Literal["pcm_s16le"] = "pcm_s16le"
     sr: int = 16000
-    client_id: UUID
 
 class STTPartial(BaseModel):
     text: str
@@ -46,9 +53,29 @@ class ManagerAnswer(BaseModel):
     trace_id: str
     client_id: UUID
 
-class TTSAudio(BaseModel):
-    chunk: bytes
+class ManagerAnswerDelta(BaseModel):
+    """A piece of an answer that is still being generated; TTS speaks it sentence by sentence."""
+    text: str
+    trace_id: str
+    client_id: UUID
+    seq: int
+    is_final: bool = False
+    full_text: str | None = None  # the complete answer, on the final delta
+
+@dataclass(slots=True)
+class TTSAudio:
+    chunk: bytes | memoryview
+    client_id: UUID
     mime: Literal["audio/mpeg"] = "audio/mpeg"
+    text: str | None = None
+    is_final: bool = False
+    filler: bool = False  # latency-masking acknowledgement, not part of the answer
+    segment_end: bool = False  # the audio so far is a complete MP3 segment (one sentence) the client can play
+
+class TurnInterrupted(BaseModel):
+    """The answer to ``turn`` was cancelled: the client drops audio it still has queued."""
+    turn: int
+    reason: Literal["final", "partial", "vad"]
     client_id: UUID
 
 class Error(BaseModel):
@@ -57,6 +84,12 @@ class Error(BaseModel):
     client_id: UUID
 
 
+class SpeechActivity(BaseModel):
+    kind: Literal["speech_start", "speech_end"]
+    at_ms: int  # audio time since the start of the call
+    client_id: UUID
+
+
 class ClientSttInit(BaseModel):
     client_id: UUID
     sample_rate: int
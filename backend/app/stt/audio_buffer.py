@@ -0,0 +1,136 @@
+"""
+Bounded audio ingress buffer between the WebSocket and the recognizer
+"""
+import asyncio
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+from app.core.metrics import metrics
+
+POLICIES = ("block", "drop_oldest", "collapse_silence")
+
+
+def is_silent(chunk: bytes | memoryview, threshold_rms: float) -> bool:
+    """True if a LINEAR16 chunk's RMS energy is below the threshold."""
+    samples = np.frombuffer(chunk, dtype=np.int16, count=len(chunk) // 2)
+    if samples.size == 0:
+        return True
+    rms = np.sqrt(np.mean(samples.astype(np.float32) ** 2))
+    return rms < threshold_rms
+
+
+class AudioIngressBuffer:
+    """
+    Ring buffer of audio chunks with a hard capacity, so a stalled recognizer
+    cannot make a call's memory (or its replay latency) grow without bound.
+
+    Overflow policies:
+    - ``block``: ``put`` waits for room, pushing backpressure to the socket.
+    - ``drop_oldest``: the oldest chunk is discarded to keep audio real-time.
+    - ``collapse_silence``: silent chunks are discarded first, then the oldest.
+
+    Exposes the same ``put``/``get``/``empty``/``get_nowait`` surface as
+    ``asyncio.Queue``; ``None`` is the end-of-stream marker and is never dropped.
+    A chunk can carry the call time it was recorded at (``put(chunk, at_ms)``),
+    read back with ``get_timed``, so the reader knows where audio went missing.
+    """
+
+    def __init__(self, max_frames: int = 100, policy: str = "drop_oldest", silence_rms: float = 300.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown ingress policy '{policy}', expected one of {POLICIES}")
+        self.max_frames = max_frames
+        self.policy = policy
+        self.silence_rms = silence_rms
+        self._frames: deque[tuple[Optional[bytes | memoryview], bool, Optional[float]]] = deque()
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+
+        self.dropped = 0
+        self.collapsed = 0
+        self.max_depth = 0
+
+    def qsize(self) -> int:
+        return len(self._frames)
+
+    def empty(self) -> bool:
+        return not self._frames
+
+    async def put(self, chunk: Optional[bytes | memoryview], at_ms: Optional[float] = None):
+        if chunk is None:
+            self._append(None, False, None)
+            return
+
+        silent = self.policy == "collapse_silence" and is_silent(chunk, self.silence_rms)
+        while len(self._frames) >= self.max_frames:
+            if self.policy == "block":
+                self._writable.clear()
+                await self._writable.wait()
+                continue
+            if silent:
+                # Incoming silence is the cheapest thing to lose
+                self.collapsed += 1
+                metrics.incr("stt.ingress.collapsed")
+                return
+            if not self._evict():
+                # Stream already ended; nothing left to make room for
+                self.dropped += 1
+                metrics.incr("stt.ingress.dropped")
+                return
+
+        self._append(chunk, silent, at_ms)
+
+    def _evict(self) -> bool:
+        if self.policy == "collapse_silence":
+            for i, (_, silent, _) in enumerate(self._frames):
+                if silent:
+                    del self._frames[i]
+                    self.collapsed += 1
+                    metrics.incr("stt.ingress.collapsed")
+                    return True
+        if self._frames[0][0] is None:
+            return False
+        self._frames.popleft()
+        self.dropped += 1
+        metrics.incr("stt.ingress.dropped")
+        return True
+
+    def _append(self, chunk, silent: bool, at_ms: Optional[float]):
+        self._frames.append((chunk, silent, at_ms))
+        depth = len(self._frames)
+        if depth > self.max_depth:
+            self.max_depth = depth
+        metrics.observe("stt.ingress.depth", depth)
+        self._readable.set()
+
+    async def get(self) -> Optional[bytes | memoryview]:
+        chunk, _ = await self.get_timed()
+        return chunk
+
+    async def get_timed(self) -> tuple[Optional[bytes | memoryview], Optional[float]]:
+        """The next chunk and the call time it was put with."""
+        while not self._frames:
+            self._readable.clear()
+            await self._readable.wait()
+        return self._pop()
+
+    def get_nowait(self) -> Optional[bytes | memoryview]:
+        if not self._frames:
+            raise asyncio.QueueEmpty
+        chunk, _ = self._pop()
+        return chunk
+
+    def _pop(self) -> tuple[Optional[bytes | memoryview], Optional[float]]:
+        chunk, _, at_ms = self._frames.popleft()
+        self._writable.set()
+        return chunk, at_ms
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self._frames),
+            "max_depth": self.max_depth,
+            "dropped": self.dropped,
+            "collapsed": self.collapsed,
+        }
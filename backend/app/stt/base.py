@@ -0,0 +1,113 @@
+import asyncio
+import importlib
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Type
+
+from app.bus import bus
+from app.core import config
+from app.core.metrics import metrics
+from app.schemas.events import ClientAudio, ClientSttInit
+from app.stt.endpointing import TurnDetector
+from app.stt.transcode import AudioTranscoder
+
+# Provider name -> module that registers it; imported only when selected, so a
+# machine without e.g. the Google SDK can still run the replay backend.
+PROVIDER_MODULES = {
+    "google": "app.stt.google_stt",
+    "replay": "app.stt.replay_stt",
+}
+
+_providers: Dict[str, Type["STT"]] = {}
+
+
+class STT(ABC):
+    # Rate the recognizer is fed; client audio in other formats is converted to it
+    sample_rate = 16000
+
+    def __init__(self, client_id):
+        self.client_id = client_id
+        self.transcoder: AudioTranscoder | None = None  # None: client sends LINEAR16 at sample_rate
+        # Results are published through the turn detector, which decides where turns end
+        self.turns = TurnDetector(
+            client_id,
+            bus.publish,
+            mode=config.STT_ENDPOINTING,
+            silence_ms=config.STT_ENDPOINT_SILENCE_MS,
+            settle_ms=config.STT_ENDPOINT_SETTLE_MS,
+        )
+
+    def attach(self, session):
+        """Registers this recognizer's subscription and shutdown with a call session."""
+        session.subscribe("client.audio", self.on_audio_chunk, key=self.client_id)
+        session.subscribe("client.stt_init", self.on_stt_init, key=self.client_id)
+        session.on_close(self.turns.close)
+        session.on_close(self.stop)
+
+    async def on_stt_init(self, event: ClientSttInit):
+        """Applies the audio format the client negotiated; a missing or malformed encoding means LINEAR16."""
+        encoding = event.encoding if isinstance(event.encoding, str) and event.encoding else "LINEAR16"
+        try:
+            transcoder = AudioTranscoder(encoding, event.sample_rate, self.sample_rate)
+        except (ValueError, TypeError) as e:
+            print(f"⚠️ Ignoring stt_init from client {self.client_id}: {e}")
+            return
+        self.transcoder = None if transcoder.passthrough else transcoder
+        print(f"🎚️ Client {self.client_id} audio: {encoding} @ {event.sample_rate} Hz -> LINEAR16 @ {self.sample_rate} Hz")
+
+    async def decode_audio(self, chunk: bytes | memoryview) -> bytes | memoryview:
+        """
+        Client audio as LINEAR16 at ``sample_rate``. Browser-sized chunks are
+        converted inline, since a thread hop costs more than the NumPy work;
+        only chunks of at least ``STT_TRANSCODE_OFFLOAD_BYTES`` go to a worker thread.
+        """
+        if self.transcoder is None:
+            return chunk
+        started = time.perf_counter()
+        if len(chunk) >= config.STT_TRANSCODE_OFFLOAD_BYTES:
+            chunk = await asyncio.to_thread(self.transcoder.process, chunk)
+            metrics.incr("stt.transcode_offloaded")
+        else:
+            chunk = self.transcoder.process(chunk)
+        metrics.observe("stt.transcode_ms", (time.perf_counter() - started) * 1000)
+        return chunk
+
+    @abstractmethod
+    async def on_audio_chunk(self, event: ClientAudio):
+        pass
+
+    @abstractmethod
+    async def start(self):
+        pass
+
+    @abstractmethod
+    async def stop(self):
+        pass
+
+    @classmethod
+    async def startup(cls):
+        """Process-wide warm-up (shared clients, pools) before the first call."""
+
+    @classmethod
+    async def shutdown(cls):
+        """Release process-wide resources."""
+
+
+def register_stt(name: str):
+    """Class decorator that makes a provider available to ``create_stt``."""
+    def decorator(cls: Type[STT]) -> Type[STT]:
+        _providers[name] = cls
+        return cls
+    return decorator
+
+
+def get_stt_class(name: str) -> Type[STT]:
+    if name not in _providers and name in PROVIDER_MODULES:
+        importlib.import_module(PROVIDER_MODULES[name])
+    if name not in _providers:
+        raise ValueError(f"Unknown STT backend '{name}', expected one of {sorted(PROVIDER_MODULES)}")
+    return _providers[name]
+
+
+def create_stt(name: str, client_id, **kwargs) -> STT:
+    return get_stt_class(name)(client_id=client_id, **kwargs)
@@ -0,0 +1,183 @@
+"""
+Turn-taking: decides when the caller has finished a turn
+"""
+import asyncio
+import re
+import time
+from typing import Awaitable, Callable, Optional
+
+from app.core.metrics import metrics
+from app.schemas.events import STTFinal, STTPartial
+
+ENDPOINTING_MODES = ("provider", "silence", "first")
+
+_PUNCT = re.compile(r"[^\w]")
+
+
+def _norm(token: str) -> str:
+    return _PUNCT.sub("", token.lower())
+
+
+class TurnDetector:
+    """
+    Builds caller turns from recognizer results and speech activity.
+
+    Modes:
+    - ``provider``: a turn ends on the recognizer's final result (previous behaviour);
+    - ``silence``: a turn ends after ``silence_ms`` without speech. Recognizer
+      finals only commit text, so one turn can span several of them;
+    - ``first``: whichever of the two happens first.
+
+    When the silence timer ends a turn, the recognizer has not finalized that
+    speech yet: its later partials and its final still repeat those words.
+    They are stripped (and a final with nothing new is dropped), so a turn is
+    never answered twice.
+
+    Turn timing is on the call's audio clock: ``start_ms``/``end_ms`` come
+    from VAD transitions when available, otherwise from the results.
+    """
+
+    def __init__(
+        self,
+        client_id,
+        publish: Callable[[str, object], Awaitable[None]],
+        mode: str = "provider",
+        silence_ms: float = 700,
+        settle_ms: float = 150,
+    ):
+        if mode not in ENDPOINTING_MODES:
+            raise ValueError(f"Unknown endpointing mode '{mode}', expected one of {ENDPOINTING_MODES}")
+        self.client_id = client_id
+        self.mode = mode
+        self.silence_ms = silence_ms
+        self.settle_ms = settle_ms
+        self._publish = publish
+
+        self._committed: list[str] = []    # recognizer finals inside the current turn
+        self._partial: list[str] = []      # current recognizer segment, minus consumed words
+        self._consumed: list[str] = []     # normalized words of the segment already sent as a turn
+        self._start_ms: Optional[int] = None
+        self._end_ms: Optional[int] = None
+        self._speaking = False
+        self._vad_seen = False
+        self._silence_since = 0.0
+        self._last_partial_at = 0.0
+        self._timer: Optional[asyncio.Task] = None
+
+    def text(self) -> str:
+        return " ".join(self._committed + self._partial).strip()
+
+    def _strip_consumed(self, text: str) -> list[str]:
+        tokens = text.split()
+        if not self._consumed:
+            return tokens
+        matched = 0
+        for i, token in enumerate(tokens):
+            word = _norm(token)
+            if not word:
+                continue
+            if word != self._consumed[matched]:
+                return tokens  # the recognizer revised those words: keep its text as is
+            matched += 1
+            if matched == len(self._consumed):
+                return tokens[i + 1:]
+        return []
+
+    async def on_partial(self, text: str, start_ms: int, end_ms: int):
+        if self.mode == "provider":
+            await self._publish("stt.partial", STTPartial(
+                text=text, client_id=self.client_id, start_ms=start_ms, end_ms=end_ms,
+            ))
+            return
+
+        tokens = self._strip_consumed(text)
+        if not tokens and not self._committed:
+            return
+        now = time.monotonic()
+        self._partial = tokens
+        self._last_partial_at = now
+        if self._start_ms is None:
+            self._start_ms = start_ms
+        if not self._vad_seen:
+            self._silence_since = now
+            self._end_ms = end_ms
+        await self._publish("stt.partial", STTPartial(
+            text=self.text(), client_id=self.client_id, start_ms=self._start_ms, end_ms=end_ms,
+        ))
+        self._arm()
+
+    async def on_final(self, text: str, start_ms: int, end_ms: int):
+        if self.mode == "provider":
+            await self._emit(text, start_ms, end_ms, "provider")
+            return
+
+        remainder = self._strip_consumed(text)
+        self._consumed = []  # the recognizer segment is closed
+        self._partial = []
+        if remainder:
+            self._committed.append(" ".join(remainder))
+            if self._start_ms is None:
+                self._start_ms = start_ms
+            if not self._vad_seen or self._speaking:
+                self._end_ms = end_ms
+        elif not self._committed:
+            metrics.incr("stt.endpoint.deduped")
+            return
+
+        if self.mode == "first":
+            await self._finalize("provider")
+        else:
+            self._arm()
+
+    def on_speech_start(self, at_ms: int):
+        self._vad_seen = True
+        self._speaking = True
+        if self._start_ms is None or not self.text():
+            self._start_ms = at_ms
+        self._cancel_timer()
+
+    def on_speech_end(self, at_ms: int, lag_ms: float = 0.0):
+        """``lag_ms``: how long ago (in audio time) the speech ended, e.g. the VAD hangover."""
+        self._vad_seen = True
+        self._speaking = False
+        self._end_ms = at_ms
+        self._silence_since = time.monotonic() - lag_ms / 1000
+        self._arm()
+
+    def _arm(self):
+        self._cancel_timer()
+        if self.mode == "provider" or self._speaking or not self.text():
+            return
+        deadline = max(self._silence_since + self.silence_ms / 1000, self._last_partial_at + self.settle_ms / 1000)
+        self._timer = asyncio.create_task(self._fire_at(deadline), name=f"stt:endpoint:{self.client_id}")
+
+    def _cancel_timer(self):
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+
+    async def _fire_at(self, deadline: float):
+        await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+        self._timer = None
+        await self._finalize("silence")
+
+    async def _finalize(self, reason: str):
+        text = self.text()
+        self._cancel_timer()
+        if not text:
+            return
+        # Words of the open recognizer segment are now answered; strip them when it repeats them
+        self._consumed += [w for w in (_norm(t) for t in self._partial) if w]
+        start_ms, end_ms = self._start_ms or 0, self._end_ms or self._start_ms or 0
+        self._committed, self._partial = [], []
+        self._start_ms = self._end_ms = None
+        await self._emit(text, start_ms, end_ms, reason)
+
+    async def _emit(self, text: str, start_ms: int, end_ms: int, reason: str):
+        metrics.incr(f"stt.endpoint.{reason}")
+        await self._publish("stt.final", STTFinal(
+            text=text, client_id=self.client_id, start_ms=int(start_ms), end_ms=int(end_ms),
+        ))
+
+    def close(self):
+        self._cancel_timer()
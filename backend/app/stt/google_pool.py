@@ -0,0 +1,185 @@
+"""
+Shared Google Speech v2 clients and pre-opened streaming sessions
+"""
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Optional
+
+from google.cloud import speech_v2
+from google.cloud.speech_v2.types import cloud_speech
+
+from app.core import config
+from app.core.metrics import metrics
+
+
+def build_config_request(recognizer: str, rate: int, language: str) -> cloud_speech.StreamingRecognizeRequest:
+    """The first request of every stream: recognizer and decoding configuration."""
+    explicit_config = cloud_speech.ExplicitDecodingConfig(
+        encoding=cloud_speech.ExplicitDecodingConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=rate,
+        audio_channel_count=1,
+    )
+    recognition_config = cloud_speech.RecognitionConfig(
+        explicit_decoding_config=explicit_config,
+        language_codes=[language],
+        model="chirp_3",  # Using chirp model
+    )
+    streaming_config = cloud_speech.StreamingRecognitionConfig(
+        config=recognition_config,
+        streaming_features=cloud_speech.StreamingRecognitionFeatures(interim_results=True),
+    )
+    return cloud_speech.StreamingRecognizeRequest(recognizer=recognizer, streaming_config=streaming_config)
+
+
+class SpeechClientPool:
+    """
+    Process-wide SpeechAsyncClients. Each client owns one gRPC channel that
+    multiplexes many streams, so calls share them instead of paying channel
+    setup and a TLS handshake per connection.
+    """
+
+    def __init__(self, size: int = 1):
+        self.size = max(1, size)
+        self._clients: list[speech_v2.SpeechAsyncClient] = []
+        self._next = 0
+
+    def get(self) -> speech_v2.SpeechAsyncClient:
+        if len(self._clients) < self.size:
+            if config.GOOGLE_APPLICATION_CREDENTIALS:
+                os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = config.GOOGLE_APPLICATION_CREDENTIALS
+            self._clients.append(speech_v2.SpeechAsyncClient(
+                client_options={"api_endpoint": f"{config.LOCATION}-speech.googleapis.com"}
+            ))
+            return self._clients[-1]
+        client = self._clients[self._next % len(self._clients)]
+        self._next += 1
+        return client
+
+    async def close(self):
+        for client in self._clients:
+            await client.transport.close()
+        self._clients.clear()
+
+
+class PrewarmedStream:
+    """
+    A streaming_recognize call that is already open and configured, waiting
+    for an audio source. ``claim`` hands it to a call; until then the request
+    iterator is parked after the config request.
+    """
+
+    def __init__(self, client, config_request: cloud_speech.StreamingRecognizeRequest, key: tuple):
+        self.key = key
+        self.created_at = time.monotonic()
+        self.responses = None
+        self._client = client
+        self._config_request = config_request
+        self._source: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    async def open(self):
+        self.responses = await self._client.streaming_recognize(requests=self._requests())
+
+    async def _requests(self):
+        yield self._config_request
+        source = await self._source
+        if source is None:
+            return
+        async for request in source:
+            yield request
+
+    def claim(self, audio_requests: AsyncIterator[cloud_speech.StreamingRecognizeRequest]):
+        """Attach the caller's audio and return the stream's response iterator."""
+        self._source.set_result(audio_requests)
+        return self.responses
+
+    async def discard(self):
+        """Half-close an unclaimed stream and let the server finish it."""
+        if not self._source.done():
+            self._source.set_result(None)
+        if self.responses is None:
+            return
+        try:
+            async with asyncio.timeout(2):
+                async for _ in self.responses:
+                    pass
+        except Exception:
+            pass
+
+
+class StreamPrewarmer:
+    """Keeps up to ``size`` pre-opened streams ready for new calls to claim."""
+
+    def __init__(self, pool: SpeechClientPool, size: int = 0, max_age_s: float = 5.0):
+        self.pool = pool
+        self.size = size
+        self.max_age_s = max_age_s
+        self._ready: list[PrewarmedStream] = []
+        self._task: Optional[asyncio.Task] = None
+        self._retiring: set[asyncio.Task] = set()
+        self._wake = asyncio.Event()
+
+    def _default_key(self) -> tuple:
+        recognizer = f"projects/{config.PROJECT_ID}/locations/{config.LOCATION}/recognizers/{config.RECOGNIZER_NAME}"
+        return recognizer, 16000, "et-EE"
+
+    async def start(self):
+        if self.size > 0 and self._task is None:
+            self._task = asyncio.create_task(self._refill(), name="stt:prewarm")
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        ready, self._ready = self._ready, []
+        await asyncio.gather(*(s.discard() for s in ready), return_exceptions=True)
+
+    def claim(self, key: tuple) -> Optional[PrewarmedStream]:
+        """Take a fresh pre-opened stream for this configuration, if one is ready."""
+        now = time.monotonic()
+        for i, stream in enumerate(self._ready):
+            if stream.key == key and now - stream.created_at < self.max_age_s:
+                del self._ready[i]
+                self._wake.set()
+                metrics.incr("stt.prewarm.claimed")
+                return stream
+        if self.size > 0:
+            metrics.incr("stt.prewarm.missed")
+        return None
+
+    async def _refill(self):
+        while True:
+            now = time.monotonic()
+            # Retire streams before the server gives up on a stream without audio
+            for stream in [s for s in self._ready if now - s.created_at >= self.max_age_s]:
+                self._ready.remove(stream)
+                task = asyncio.create_task(stream.discard())
+                self._retiring.add(task)
+                task.add_done_callback(self._retiring.discard)
+
+            while len(self._ready) < self.size:
+                key = self._default_key()
+                stream = PrewarmedStream(self.pool.get(), build_config_request(*key), key)
+                try:
+                    await stream.open()
+                except Exception as e:
+                    print(f"⚠️ Could not pre-open STT stream: {e}")
+                    await stream.discard()
+                    break
+                self._ready.append(stream)
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.max_age_s / 2)
+            except asyncio.TimeoutError:
+                pass
+
+
+# Shared instances used by every GoogleSTT
+speech_clients = SpeechClientPool(size=config.STT_CLIENT_POOL_SIZE)
+stream_prewarmer = StreamPrewarmer(
+    speech_clients,
+    size=config.STT_PREWARM_STREAMS,
+    max_age_s=config.STT_PREWARM_MAX_AGE_S,
+)
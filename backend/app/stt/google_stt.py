@@ -1,88 +1,235 @@
 import asyncio
-import os
+import bisect
+import time
+from collections import deque
 from typing import AsyncGenerator
 
-from google.cloud import speech_v2
 from google.cloud.speech_v2.types import cloud_speech
 
 from app.bus import bus
-from app.core.config import GOOGLE_APPLICATION_CREDENTIALS
 from app.core.config import LOCATION
 from app.core.config import PROJECT_ID
 from app.core.config import RECOGNIZER_NAME
-from app.schemas.events import ClientAudio, STTFinal, STTPartial
+from app.core.config import STT_INGRESS_MAX_FRAMES, STT_INGRESS_POLICY, STT_SILENCE_RMS
+from app.core import config
+from app.core.metrics import metrics
+from app.schemas.events import ClientAudio, SpeechActivity
+from app.stt.audio_buffer import AudioIngressBuffer
+from app.stt.base import STT, register_stt
+from app.stt.google_pool import build_config_request, speech_clients, stream_prewarmer
+from app.stt.reframer import PCMReframer
+from app.stt.vad import EnergyVAD
 
 
-class GoogleSTT:
+@register_stt("google")
+class GoogleSTT(STT):
 
-    def __init__(self, client_id, recognizer_path: str | None = None, language: str = "et-EE"):
+    def __init__(self, client_id, recognizer_path: str | None = None, language: str = "et-EE", client=None):
+        super().__init__(client_id)
         # Configuration
         self.PROJECT_ID = PROJECT_ID
         self.LOCATION = LOCATION
         self.RECOGNIZER_NAME = RECOGNIZER_NAME
 
-        if GOOGLE_APPLICATION_CREDENTIALS:
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GOOGLE_APPLICATION_CREDENTIALS
-
         self.RECOGNIZER = f"projects/{self.PROJECT_ID}/locations/{self.LOCATION}/recognizers/{self.RECOGNIZER_NAME}"
-        self.RATE = 16000  # Sample rate needs to match frontend
-        self.CHUNK = 1024 * 4
+        self.RATE = self.sample_rate  # client audio is converted to this rate (see on_stt_init)
+        self.CHUNK = int(self.RATE * config.STT_FRAME_MS / 1000) * 2  # bytes per request (16-bit mono)
 
-        self.client_id = client_id
-        self._client = speech_v2.SpeechAsyncClient(
-            client_options={"api_endpoint": f"{self.LOCATION}-speech.googleapis.com"}
+        # Shared, already-connected channel; injectable for tests and fakes
+        self._client = client or speech_clients.get()
+        # Bounded: a stalled or reconnecting stream must not buffer audio indefinitely
+        self._audio_queue = AudioIngressBuffer(
+            max_frames=STT_INGRESS_MAX_FRAMES,
+            policy=STT_INGRESS_POLICY,
+            silence_rms=STT_SILENCE_RMS,
         )
-        self._audio_queue = asyncio.Queue()
+        self._vad = EnergyVAD(
+            sample_rate=self.RATE,
+            threshold_rms=config.STT_VAD_THRESHOLD_RMS,
+            start_ms=config.STT_VAD_START_MS,
+            hangover_ms=config.STT_VAD_HANGOVER_MS,
+            preroll_ms=config.STT_VAD_PREROLL_MS,
+            keepalive_ms=config.STT_VAD_KEEPALIVE_MS,
+        ) if config.STT_VAD_ENABLED else None
         self._task = None
+        self._started_at = None
+        self._first_result = True
+        # Stream rollover state: current stream, call audio clock and replay window
+        self._stream: _RecognizerStream | None = None
+        self._audio_ms = 0.0
+        self._last_final_ms = 0.0
+        self._replay: deque[tuple[float, bytes]] = deque()
+        # VAD gating and ingress drops make recognizer offsets skip call time:
+        # (uploaded ms, call ms) at each jump, both measured where audio leaves the ingress buffer
+        self._received_ms = 0.0  # call audio clock without VAD
+        self._call_anchors: deque[tuple[float, float]] = deque()
         self._language = language
         self._recognizer = recognizer_path or self.RECOGNIZER  # <— use provided or fallback
 
-        bus.subscribe("client.audio", self.on_audio_chunk)
         print(f"GoogleSTT instance created for client {client_id}")
 
+    def attach(self, session):
+        """Registers this recognizer's subscription, queue and shutdown with a call session."""
+        # Routed by client_id: audio from other callers never reaches this handler
+        super().attach(session)
+        session.register_queue(self._audio_queue)
+
+    @classmethod
+    async def startup(cls):
+        # Open the shared STT channel (and optional ready streams) before the first call
+        speech_clients.get()
+        await stream_prewarmer.start()
+
+    @classmethod
+    async def shutdown(cls):
+        await stream_prewarmer.close()
+        await speech_clients.close()
+
     async def on_audio_chunk(self, event: ClientAudio):
         """Callback to handle incoming audio chunks from the event bus."""
-        if event.client_id == self.client_id:
-            print(f"📥 Received audio chunk for client {self.client_id}, size: {len(event.chunk)} bytes")
-            await self._audio_queue.put(event.chunk)
+        audio = await self.decode_audio(event.chunk)
+        if self._vad is None:
+            at_ms = self._received_ms
+            self._received_ms += self._frame_ms(audio)
+            await self._audio_queue.put(audio, at_ms)
+            return
 
-    async def _requests_generator(self) -> AsyncGenerator[cloud_speech.StreamingRecognizeRequest, None]:
-        """Async generator for creating Google Cloud Speech streaming requests."""
-        explicit_config = cloud_speech.ExplicitDecodingConfig(
-            encoding=cloud_speech.ExplicitDecodingConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=self.RATE,
-            audio_channel_count=1,
-        )
-        config = cloud_speech.RecognitionConfig(
-            explicit_decoding_config=explicit_config,
-            language_codes=["et-EE"],
-            model="chirp_3",  # Using chirp model
-        )
-        streaming_config = cloud_speech.StreamingRecognitionConfig(config=config,
-                                                                   streaming_features=cloud_speech.StreamingRecognitionFeatures(
-                                                                       interim_results=True))
+        # Only speech (plus pre-roll/hangover) is uploaded to the recognizer
+        chunks, transitions = self._vad.process(audio)
+        for kind, at_ms in transitions:
+            if kind == "speech_start":
+                self.turns.on_speech_start(at_ms)
+            else:
+                self.turns.on_speech_end(at_ms, lag_ms=self._vad.position_ms - at_ms)
+            await bus.publish(f"vad.{kind}", SpeechActivity(kind=kind, at_ms=at_ms, client_id=self.client_id))
+        forwarded = 0
+        for chunk, call_ms in zip(chunks, self._vad.forwarded_at):
+            forwarded += len(chunk)
+            await self._audio_queue.put(chunk, call_ms)
+        metrics.incr("stt.vad.forwarded_bytes", forwarded)
+        metrics.incr("stt.vad.suppressed_bytes", max(0, len(audio) - forwarded))
 
+    def _anchor(self, uploaded_ms: float, call_ms: float):
+        """Notes that the uploaded audio at ``uploaded_ms`` was recorded at ``call_ms`` on the call's clock."""
+        if self._call_anchors:
+            last_up, last_call = self._call_anchors[-1]
+            if abs(last_call + (uploaded_ms - last_up) - call_ms) < 1:
+                return  # contiguous with the previous chunk
+        self._call_anchors.append((uploaded_ms, call_ms))
+        # Results never refer to audio older than the replay window
+        horizon = uploaded_ms - config.STT_ROLLOVER_REPLAY_MS - 5000
+        while len(self._call_anchors) > 1 and self._call_anchors[1][0] <= horizon:
+            self._call_anchors.popleft()
+
+    def _call_ms(self, uploaded_ms: float) -> float:
+        """Maps a recognizer offset (uploaded audio only) to call audio time, as VAD events use."""
+        if not self._call_anchors:
+            return uploaded_ms
+        i = max(0, bisect.bisect_right(self._call_anchors, uploaded_ms, key=lambda a: a[0]) - 1)
+        fwd, call = self._call_anchors[i]
+        return call + (uploaded_ms - fwd)
+
+    def _stream_key(self) -> tuple:
+        return self._recognizer, self.RATE, self._language
+
+    def _frame_ms(self, frame: bytes) -> float:
+        return len(frame) / 2 / self.RATE * 1000
+
+    async def _requests_generator(self, stream: "_RecognizerStream") -> AsyncGenerator[cloud_speech.StreamingRecognizeRequest, None]:
+        """Async generator for creating Google Cloud Speech streaming requests."""
         # First request contains the configuration
-        yield cloud_speech.StreamingRecognizeRequest(
-            recognizer=self.RECOGNIZER, streaming_config=streaming_config
-        )
+        yield build_config_request(*self._stream_key())
 
-        # Subsequent requests contain the audio data
+        async for request in stream.requests():
+            yield request
+
+    async def _audio_frames(self) -> AsyncGenerator[bytes, None]:
+        """Audio from the ingress buffer, re-framed to CHUNK bytes per request."""
+        # Re-framed so tiny browser frames don't flood the stream and huge
+        # ones don't add latency
+        reframer = PCMReframer(self.CHUNK)
+        flush_after_s = 2 * config.STT_FRAME_MS / 1000
         while True:
-            chunk = await self._audio_queue.get()
+            try:
+                chunk, call_ms = await asyncio.wait_for(self._audio_queue.get_timed(), timeout=flush_after_s)
+            except asyncio.TimeoutError:
+                # Input went quiet (e.g. VAD hangover ended): send the partial frame now
+                tail = reframer.flush()
+                if tail:
+                    yield tail
+                continue
+
             if chunk is None:
+                tail = reframer.flush()
+                if tail:
+                    yield tail
                 break
-            yield cloud_speech.StreamingRecognizeRequest(audio=chunk)
+
+            # The chunk starts after everything already pumped and what the re-framer holds;
+            # anchored here, chunks the ingress buffer dropped leave a gap in call time
+            if call_ms is not None:
+                self._anchor(self._audio_ms + reframer.pending / 2 / self.RATE * 1000, call_ms)
+            for frame in reframer.push(chunk):
+                yield frame
+
+    async def _pump(self):
+        """Routes call audio to the current stream and keeps the replay window."""
+        async for frame in self._audio_frames():
+            start_ms = self._audio_ms
+            self._audio_ms += self._frame_ms(frame)
+            self._replay.append((start_ms, frame))
+            while self._replay and self._audio_ms - self._replay[0][0] > config.STT_ROLLOVER_REPLAY_MS:
+                self._replay.popleft()
+            # Bounded: a stalled stream holds the pump back, and the ingress buffer drops by policy
+            await self._stream.send(frame, self._frame_ms(frame))
+            metrics.incr("stt.requests")
+        await self._stream.end()
+
+    async def _open_stream(self, allow_prewarmed: bool = False) -> "_RecognizerStream":
+        """Opens a streaming call; it receives no audio until it is made current."""
+        # Room for the replay window on top of the usual ingress capacity
+        stream = _RecognizerStream(
+            max_frames=STT_INGRESS_MAX_FRAMES + int(config.STT_ROLLOVER_REPLAY_MS / config.STT_FRAME_MS) + 1,
+            policy=STT_INGRESS_POLICY,
+            silence_rms=STT_SILENCE_RMS,
+        )
+        # A pre-opened stream skips the call setup; otherwise open one now
+        prewarmed = stream_prewarmer.claim(self._stream_key()) if allow_prewarmed else None
+        if prewarmed is not None:
+            stream.responses = prewarmed.claim(stream.requests())
+        else:
+            stream.responses = await self._client.streaming_recognize(requests=self._requests_generator(stream))
+        stream.consumer = asyncio.create_task(self._consume(stream))
+        return stream
+
+    async def _switch_to(self, new: "_RecognizerStream"):
+        """
+        Makes ``new`` the current stream. Audio after the last final result is
+        replayed into it, so nothing the old stream had not finalized is lost;
+        the old stream's remaining results are dropped to avoid duplicates.
+        """
+        old = self._stream
+        replay = [(start_ms, frame) for start_ms, frame in self._replay if start_ms >= self._last_final_ms]
+        new.base_ms = replay[0][0] if replay else self._audio_ms
+        for _, frame in replay:
+            await new.send(frame, self._frame_ms(frame))
+        self._stream = new
+
+        if old is not None:
+            await old.end()
+            old.consumer.cancel()
+            metrics.incr("stt.rollovers")
+            print(f"🔁 STT stream rolled over for {self.client_id}, replayed {sum(self._frame_ms(f) for _, f in replay):.0f} ms")
 
     async def start(self):
         """Starts the STT process."""
         print(f"Starting Google STT for client {self.client_id}...")
+        self._started_at = time.monotonic()
         self._task = asyncio.create_task(self._run_stt())
 
     async def stop(self):
         """Stops the STT process."""
         print(f"Stopping Google STT for client {self.client_id}...")
-        bus.subscribe("client.audio", self.on_audio_chunk)
         if self._task:
             await self._audio_queue.put(None)  # Signal the end of the audio stream
             self._task.cancel()
@@ -90,49 +237,143 @@ class GoogleSTT:
                 await self._task
             except asyncio.CancelledError:
                 pass
+            self._task = None
+        print(f"📊 Audio ingress for client {self.client_id}: {self._audio_queue.stats()}")
         print(f"Google STT stopped for client {self.client_id}.")
 
     async def _run_stt(self):
-        """The main loop for the STT process."""
+        """
+        The main loop for the STT process. Streaming sessions have a maximum
+        duration, so the next stream is opened before the current one expires
+        (preferably during a pause) or as soon as it dies, and the call keeps
+        being transcribed without a gap.
+        """
+        pump = None
+        failures = 0
         try:
-            responses = await  self._client.streaming_recognize(requests=self._requests_generator())
+            while True:
+                try:
+                    first = await self._open_stream(allow_prewarmed=True)
+                    break
+                except Exception as e:
+                    print(f"⚠️ Could not open STT stream for {self.client_id}: {e}")
+                    failures += 1
+                    await asyncio.sleep(min(5.0, 0.5 * 2 ** (failures - 1)))
+            failures = 0
+            await self._switch_to(first)
+            pump = asyncio.create_task(self._pump())
+
+            while True:
+                stream = self._stream
+                deadline = stream.opened_at + config.STT_STREAM_MAX_S - config.STT_ROLLOVER_LEAD_S
+                soft_deadline = deadline - config.STT_ROLLOVER_WINDOW_S
+                now = time.monotonic()
+                if now < soft_deadline:
+                    timeout = soft_deadline - now
+                elif now < deadline and self._vad is not None and self._vad.speaking:
+                    timeout = min(0.25, deadline - now)  # wait for a pause to roll over
+                else:
+                    timeout = 0
 
-            async for response in responses:
+                await asyncio.wait({stream.consumer, pump}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if pump.done():
+                    # Call audio ended: let the current stream finish its results
+                    await stream.consumer
+                    break
+
+                if stream.consumer.done():
+                    # Stream died before its time (error or server-side limit)
+                    lived_s = time.monotonic() - stream.opened_at
+                    failures = failures + 1 if lived_s < 2 else 0
+                    if failures > 1:
+                        # Repeated immediate failures: back off instead of spinning
+                        await asyncio.sleep(min(5.0, 0.5 * 2 ** (failures - 2)))
+                elif time.monotonic() < soft_deadline:
+                    continue
+                elif time.monotonic() < deadline and self._vad is not None and self._vad.speaking:
+                    continue
+
+                try:
+                    nxt = await self._open_stream()
+                except Exception as e:
+                    print(f"⚠️ Could not open next STT stream for {self.client_id}: {e}")
+                    failures += 1
+                    await asyncio.sleep(min(5.0, 0.5 * 2 ** (failures - 1)))
+                    continue
+                await self._switch_to(nxt)
+
+        except asyncio.CancelledError:
+            print(f"STT process for {self.client_id} was cancelled.")
+        except Exception as e:
+            print(f"An error occurred in the STT process for client {self.client_id}: {e}")
+        finally:
+            tasks = [t for t in (pump, self._stream and self._stream.consumer) if t is not None]
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            print(f"STT process for {self.client_id} has ended.")
+
+    async def _consume(self, stream: "_RecognizerStream"):
+        """Publishes the results of one stream."""
+        try:
+            async for response in stream.responses:
                 if not response.results:
                     continue
+                if self._first_result:
+                    self._first_result = False
+                    metrics.observe("stt.first_result_ms", (time.monotonic() - self._started_at) * 1000)
 
                 for result in response.results:
                     if not result.alternatives:
                         continue
 
                     transcript = result.alternatives[0].transcript
+                    # Offsets are relative to the audio this stream received
+                    end_offset = getattr(result, "result_end_offset", None)
+                    if end_offset:
+                        end_ms = stream.base_ms + end_offset.total_seconds() * 1000
+                    else:
+                        end_ms = stream.base_ms + stream.sent_ms
+                    start_ms = self._last_final_ms
+
                     if result.is_final:
+                        self._last_final_ms = end_ms
                         print(f"✅ Final transcript for {self.client_id}: {transcript}")
-                        await bus.publish(
-                            "stt.final",
-                            STTFinal(
-                                text=transcript,
-                                client_id=self.client_id,
-                                start_ms=0,  # start_ms and end_ms are not provided by the API in this mode
-                                end_ms=0
-                            ),
-                        )
+                        await self.turns.on_final(transcript, int(self._call_ms(start_ms)), int(self._call_ms(end_ms)))
                     else:
                         print(f"🕓 Interim transcript for {self.client_id}: {transcript}", end="\r", flush=True)
-                        await bus.publish(
-                            "stt.partial",
-                            STTPartial(
-                                text=transcript,
-                                client_id=self.client_id,
-                                start_ms=0,
-                                end_ms=0
-                            ),
-                        )
+                        await self.turns.on_partial(transcript, int(self._call_ms(start_ms)), int(self._call_ms(end_ms)))
         except asyncio.CancelledError:
-            print(f"STT process for {self.client_id} was cancelled.")
+            raise
         except Exception as e:
-            print(f"An error occurred in the STT process for client {self.client_id}: {e}")
-        finally:
-            print(f"STT process for {self.client_id} has ended.")
+            print(f"⚠️ STT stream for client {self.client_id} ended with an error: {e}")
+
+
+class _RecognizerStream:
+    """One streaming_recognize call and the audio routed to it."""
+
+    def __init__(self, max_frames: int = 100, policy: str = "drop_oldest", silence_rms: float = 300.0):
+        self.opened_at = time.monotonic()
+        self.base_ms = 0.0  # call audio time of the first byte this stream receives
+        self.sent_ms = 0.0
+        self.responses = None
+        self.consumer: asyncio.Task | None = None
+        # Same bound and overflow policy as the ingress buffer it is fed from
+        self._queue = AudioIngressBuffer(max_frames=max_frames, policy=policy, silence_rms=silence_rms)
+
+    async def send(self, frame: bytes, frame_ms: float):
+        self.sent_ms += frame_ms
+        await self._queue.put(frame)
+
+    async def end(self):
+        await self._queue.put(None)
+
+    async def requests(self) -> AsyncGenerator[cloud_speech.StreamingRecognizeRequest, None]:
+        while True:
+            frame = await self._queue.get()
+            if frame is None:
+                return
+            yield cloud_speech.StreamingRecognizeRequest(audio=frame)
 
 # The lifecycle of GoogleSTT will be managed by the WebSocket connection handler.
@@ -0,0 +1,58 @@
+"""
+Fixed-duration re-framing of a PCM byte stream
+"""
+
+
+class PCMReframer:
+    """
+    Turns arbitrarily sized PCM chunks into frames of exactly ``frame_bytes``.
+
+    Small chunks are coalesced in one preallocated staging buffer; large
+    chunks are sliced straight out of the source without staging. Each output
+    frame is materialized once, as the ``bytes`` the request message needs.
+    """
+
+    def __init__(self, frame_bytes: int):
+        if frame_bytes <= 0 or frame_bytes % 2:
+            raise ValueError("frame_bytes must be a positive, even number of bytes (16-bit samples)")
+        self.frame_bytes = frame_bytes
+        self._buf = bytearray(frame_bytes)
+        self._fill = 0
+
+    @property
+    def pending(self) -> int:
+        """Bytes waiting for the next frame to be completed."""
+        return self._fill
+
+    def push(self, chunk: bytes | memoryview) -> list[bytes]:
+        frame = self.frame_bytes
+        mv = memoryview(chunk).cast("B")
+        size = len(mv)
+        pos = 0
+        out: list[bytes] = []
+
+        if self._fill:
+            take = min(frame - self._fill, size)
+            self._buf[self._fill:self._fill + take] = mv[:take]
+            self._fill += take
+            pos = take
+            if self._fill < frame:
+                return out
+            out.append(bytes(self._buf))
+            self._fill = 0
+
+        while size - pos >= frame:
+            out.append(bytes(mv[pos:pos + frame]))
+            pos += frame
+
+        rest = size - pos
+        if rest:
+            self._buf[:rest] = mv[pos:]
+            self._fill = rest
+        return out
+
+    def flush(self) -> bytes:
+        """Return the incomplete frame (if any), trimmed to whole samples."""
+        n = self._fill - (self._fill % 2)
+        self._fill = 0
+        return bytes(self._buf[:n]) if n else b""
@@ -0,0 +1,95 @@
+"""
+Offline STT backend that replays scripted transcripts, for load tests and
+benchmarks of the voice pipeline without network access.
+"""
+import asyncio
+import json
+import os
+from typing import Any, Dict, Optional
+
+from app.core import config
+from app.schemas.events import ClientAudio
+from app.stt.base import STT, register_stt
+
+DEFAULT_SCRIPT: Dict[str, Any] = {
+    "start_on": "connect",       # "connect" or "audio" (first audio chunk)
+    "partial_interval_ms": 150,  # one more word per partial
+    "final_delay_ms": 400,       # last partial -> final
+    "turns": [
+        {"pause_ms": 1000, "text": "Tere"},
+        {"pause_ms": 4000, "text": "Millised on teie lahtiolekuajad"},
+        {"pause_ms": 4000, "text": "Tahaksin broneerida juukselõikuse homme kell neliteist"},
+    ],
+}
+
+
+def load_script(path: Optional[str]) -> Dict[str, Any]:
+    """Load a replay script from JSON, relative to the backend directory."""
+    if not path:
+        return DEFAULT_SCRIPT
+    script_file = path if os.path.isabs(path) else os.path.join(os.path.dirname(__file__), "..", "..", path)
+    try:
+        with open(script_file, 'r', encoding='utf-8') as f:
+            return {**DEFAULT_SCRIPT, **json.load(f)}
+    except Exception as e:
+        print(f"Error loading STT replay script {script_file}: {e}")
+        return DEFAULT_SCRIPT
+
+
+@register_stt("replay")
+class ReplaySTT(STT):
+    """
+    Deterministic recognizer: publishes the script's turns as growing
+    ``stt.partial`` events followed by an ``stt.final``, with the configured
+    timing (scaled by ``speed``). Incoming audio is only used as a start
+    trigger, so any client (or none) can drive it.
+    """
+
+    def __init__(self, client_id, script: Optional[Dict[str, Any]] = None, speed: Optional[float] = None, **kwargs):
+        super().__init__(client_id)
+        self.script = script or load_script(config.STT_REPLAY_SCRIPT)
+        self.speed = speed or config.STT_REPLAY_SPEED
+        self._audio_started = asyncio.Event()
+        self._task = None
+
+    async def on_audio_chunk(self, event: ClientAudio):
+        self._audio_started.set()
+
+    async def start(self):
+        print(f"Starting replay STT for client {self.client_id}...")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        print(f"Replay STT stopped for client {self.client_id}.")
+
+    async def _sleep_ms(self, ms: float):
+        await asyncio.sleep(ms / 1000 / self.speed)
+
+    async def _run(self):
+        if self.script.get("start_on") == "audio":
+            await self._audio_started.wait()
+
+        t_ms = 0
+        partial_interval = self.script["partial_interval_ms"]
+        for turn in self.script["turns"]:
+            await self._sleep_ms(turn.get("pause_ms", 0))
+            t_ms += turn.get("pause_ms", 0)
+            start_ms = t_ms
+
+            words = turn["text"].split()
+            for i in range(1, len(words) + 1):
+                await self._sleep_ms(partial_interval)
+                t_ms += partial_interval
+                await self.turns.on_partial(" ".join(words[:i]), start_ms, t_ms)
+
+            final_delay = turn.get("final_delay_ms", self.script["final_delay_ms"])
+            await self._sleep_ms(final_delay)
+            t_ms += final_delay
+            await self.turns.on_final(turn["text"], start_ms, t_ms)
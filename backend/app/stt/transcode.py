@@ -0,0 +1,136 @@
+"""
+Client audio formats -> 16-bit PCM at the recognizer's rate, with NumPy
+"""
+from math import gcd
+
+import numpy as np
+
+# Encoding names as sent in ``stt_init`` (case-insensitive), with their aliases
+ENCODINGS = {
+    "linear16": "linear16",
+    "pcm_s16le": "linear16",
+    "mulaw": "mulaw",
+    "mu-law": "mulaw",
+    "pcmu": "mulaw",
+    "alaw": "alaw",
+    "a-law": "alaw",
+    "pcma": "alaw",
+}
+
+
+def _mulaw_table() -> np.ndarray:
+    u = ~np.arange(256, dtype=np.uint8)
+    sign = u & 0x80
+    exponent = (u >> 4) & 0x07
+    mantissa = (u & 0x0F).astype(np.int32)
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return np.where(sign, -magnitude, magnitude).astype(np.int16)
+
+
+def _alaw_table() -> np.ndarray:
+    a = np.arange(256, dtype=np.uint8) ^ 0x55
+    sign = a & 0x80
+    exponent = ((a >> 4) & 0x07).astype(np.int32)
+    mantissa = (a & 0x0F).astype(np.int32)
+    magnitude = np.where(
+        exponent == 0,
+        (mantissa << 4) + 8,
+        ((mantissa << 4) + 0x108) << np.maximum(exponent - 1, 0),
+    )
+    return np.where(sign, magnitude, -magnitude).astype(np.int16)
+
+
+# G.711 decoding is a lookup: one table index per byte for a whole chunk
+MULAW_TABLE = _mulaw_table()
+ALAW_TABLE = _alaw_table()
+
+
+def normalize_encoding(encoding: str) -> str:
+    try:
+        return ENCODINGS[encoding.lower()]
+    except KeyError:
+        raise ValueError(f"Unsupported audio encoding '{encoding}', expected one of {sorted(set(ENCODINGS.values()))}")
+
+
+class PolyphaseResampler:
+    """
+    Streaming rational resampler (``in_rate * up / down = out_rate``) with a
+    windowed-sinc low-pass split into ``up`` polyphase branches. Only the
+    output samples that are kept are computed, each as one dot product over
+    a gathered window of input, for a whole chunk at once. Filter history
+    carries over between chunks, so chunk boundaries are seamless.
+    """
+
+    def __init__(self, in_rate: int, out_rate: int, zero_crossings: int = 8):
+        g = gcd(in_rate, out_rate)
+        self.up = out_rate // g
+        self.down = in_rate // g
+        factor = max(self.up, self.down)
+
+        # Low-pass at the lower Nyquist, designed at the upsampled rate
+        taps = 2 * zero_crossings * factor
+        taps += -taps % self.up  # whole number of taps per branch
+        cutoff = 0.5 / factor
+        n = np.arange(taps) - (taps - 1) / 2
+        h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(taps, 8.0) * self.up
+
+        self.taps_per_phase = taps // self.up
+        # branches[p, k] = h[k * up + p]
+        self._branches = h.reshape(self.taps_per_phase, self.up).T.astype(np.float32).copy()
+        self._history = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        self._next = 0  # position of the next output, in 1/up input samples, relative to the chunk
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.up == self.down:
+            return samples
+        x = samples.astype(np.float32)
+        k = self.taps_per_phase
+        span = len(x) * self.up
+        if self._next >= span:
+            self._next -= span
+            self._history = np.concatenate((self._history, x))[-(k - 1):] if k > 1 else self._history
+            return np.zeros(0, dtype=np.int16)
+
+        count = -(-(span - self._next) // self.down)  # outputs whose newest input is in this chunk
+        pos = self._next + self.down * np.arange(count)
+        base, phase = pos // self.up, pos % self.up
+
+        buf = np.concatenate((self._history, x))
+        window = buf[(k - 1) + base[:, None] - np.arange(k)[None, :]]
+        y = np.einsum("nk,nk->n", window, self._branches[phase])
+
+        self._next = int(pos[-1]) + self.down - span
+        if k > 1:
+            self._history = buf[-(k - 1):]
+        return np.clip(np.rint(y), -32768, 32767).astype(np.int16)
+
+
+class AudioTranscoder:
+    """Decodes a client's negotiated format and resamples it for the recognizer."""
+
+    def __init__(self, encoding: str = "LINEAR16", in_rate: int = 16000, out_rate: int = 16000):
+        if not 1000 <= in_rate <= 192000:
+            raise ValueError(f"Unsupported sample rate {in_rate}")
+        self.encoding = normalize_encoding(encoding)
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self._resampler = PolyphaseResampler(in_rate, out_rate) if in_rate != out_rate else None
+        self._carry = b""  # odd trailing byte of a LINEAR16 chunk
+
+    @property
+    def passthrough(self) -> bool:
+        return self.encoding == "linear16" and self._resampler is None
+
+    def process(self, chunk: bytes | memoryview) -> bytes:
+        if self.encoding == "linear16":
+            data = self._carry + bytes(chunk) if self._carry else chunk
+            usable = len(data) - len(data) % 2
+            self._carry = bytes(data[usable:])
+            samples = np.frombuffer(data, dtype="<i2", count=usable // 2)
+        else:
+            table = MULAW_TABLE if self.encoding == "mulaw" else ALAW_TABLE
+            samples = table[np.frombuffer(chunk, dtype=np.uint8)]
+
+        if self._resampler is not None:
+            samples = self._resampler.process(samples)
+        return samples.astype("<i2", copy=False).tobytes()
@@ -0,0 +1,122 @@
+"""
+Server-side voice activity detection for LINEAR16 audio
+"""
+from collections import deque
+
+import numpy as np
+
+
+class EnergyVAD:
+    """
+    Energy + zero-crossing VAD with hysteresis, evaluated on 10 ms sub-frames
+    with NumPy.
+
+    ``process`` returns the chunks that should go to the recognizer and the
+    speech transitions detected in the chunk. Silence is suppressed, except:
+    - a short pre-roll before speech onset, so the first syllable is not cut;
+    - a hangover after speech, so the recognizer hears the pause it needs to
+      finalize the utterance;
+    - one chunk every ``keepalive_ms`` of suppressed audio, so the streaming
+      session is not closed for lack of audio.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        threshold_rms: float = 300.0,
+        start_ms: int = 60,
+        hangover_ms: int = 600,
+        preroll_ms: int = 300,
+        keepalive_ms: int = 3000,
+        unvoiced_zcr: float = 0.25,
+    ):
+        self.sample_rate = sample_rate
+        self.threshold_rms = threshold_rms
+        self.start_ms = start_ms
+        self.hangover_ms = hangover_ms
+        self.preroll_ms = preroll_ms
+        self.keepalive_ms = keepalive_ms
+        self.unvoiced_zcr = unvoiced_zcr
+        self._sub = max(1, sample_rate // 100)  # samples per 10 ms
+
+        self.speaking = False
+        self.position_ms = 0.0  # audio time processed so far
+        self._speech_run_ms = 0.0
+        self._silence_run_ms = 0.0
+        self._suppressed_ms = 0.0
+        self._preroll: deque[tuple[bytes | memoryview, float, float]] = deque()
+        self._preroll_ms = 0.0
+        self.forwarded_at: list[float] = []  # call audio time where each chunk of the last result starts
+
+    def _speech_flags(self, chunk: bytes | memoryview) -> tuple[np.ndarray, np.ndarray]:
+        samples = np.frombuffer(chunk, dtype=np.int16, count=len(chunk) // 2).astype(np.float32)
+        usable = samples.size // self._sub * self._sub
+        frames = [samples[:usable].reshape(-1, self._sub)] if usable else []
+        durations = [np.full(usable // self._sub, 10.0)] if usable else []
+
+        flags = []
+        for block in frames:
+            rms = np.sqrt(np.mean(block * block, axis=1))
+            signs = np.signbit(block)
+            zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+            flags.append((rms >= self.threshold_rms) |
+                         ((rms >= self.threshold_rms * 0.5) & (zcr >= self.unvoiced_zcr)))
+
+        tail = samples[usable:]
+        if tail.size:
+            tail_rms = np.sqrt(np.mean(tail * tail))
+            flags.append(np.array([tail_rms >= self.threshold_rms]))
+            durations.append(np.array([tail.size * 1000.0 / self.sample_rate]))
+
+        if not flags:
+            return np.zeros(0, dtype=bool), np.zeros(0)
+        return np.concatenate(flags), np.concatenate(durations)
+
+    def process(self, chunk: bytes | memoryview) -> tuple[list[bytes | memoryview], list[tuple[str, int]]]:
+        """Returns (chunks to forward, [(\"speech_start\" | \"speech_end\", at_ms), ...])."""
+        flags, durations = self._speech_flags(chunk)
+        chunk_ms = float(durations.sum())
+        events: list[tuple[str, int]] = []
+        active = self.speaking
+
+        chunk_start = t = self.position_ms
+        for is_speech, dur in zip(flags.tolist(), durations.tolist()):
+            t += dur
+            if is_speech:
+                self._speech_run_ms += dur
+                self._silence_run_ms = 0.0
+                if not self.speaking and self._speech_run_ms >= self.start_ms:
+                    self.speaking = True
+                    active = True
+                    events.append(("speech_start", int(t - self._speech_run_ms)))
+            else:
+                self._speech_run_ms = 0.0
+                if self.speaking:
+                    self._silence_run_ms += dur
+                    if self._silence_run_ms >= self.hangover_ms:
+                        self.speaking = False
+                        events.append(("speech_end", int(t - self._silence_run_ms)))
+        self.position_ms = t
+
+        if active:
+            out = [c for c, _, _ in self._preroll]
+            out.append(chunk)
+            self.forwarded_at = [start for _, _, start in self._preroll] + [chunk_start]
+            self._preroll.clear()
+            self._preroll_ms = 0.0
+            self._suppressed_ms = 0.0
+            return out, events
+
+        self._suppressed_ms += chunk_ms
+        if self._suppressed_ms >= self.keepalive_ms:
+            self._suppressed_ms = 0.0
+            self.forwarded_at = [chunk_start]
+            return [chunk], events
+
+        self._preroll.append((chunk, chunk_ms, chunk_start))
+        self._preroll_ms += chunk_ms
+        while self._preroll and self._preroll_ms - self._preroll[0][1] >= self.preroll_ms:
+            _, dropped_ms, _ = self._preroll.popleft()
+            self._preroll_ms -= dropped_ms
+        self.forwarded_at = []
+        return [], events
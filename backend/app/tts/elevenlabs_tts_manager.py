@@ -1,10 +1,13 @@
+import asyncio
+
 from app.bus import bus
+from app.core.turns import turns
 from app.core.config import ELEVENLABS_API_KEY as ELEVENLABS_API_KEY
 from app.core.config import ELEVENLABS_LANGUAGE as LANGUAGE_CODE
 from app.core.config import ELEVENLABS_MODEL as MODEL_ID
 from app.core.config import ELEVENLABS_VOICE_ID as VOICE_ID
-from app.schemas.events import ManagerAnswer
-from app.tts.elevenlabs_v3_parallel_tts import V3ParallelPrefetchTTS
+from app.schemas.events import ManagerAnswer, ManagerAnswerDelta
+from app.tts.elevenlabs_v3_parallel_tts import SentenceStreamer, V3ParallelPrefetchTTS
 from app.tts.elevenlabs_v3_stream_tts import ElevenLabsHTTPStream
 
 
@@ -16,6 +19,75 @@ def _is_short(text: str) -> bool:
     return len(text) <= 240 or sentences <= 2
 
 
+def _prefetch_tts() -> V3ParallelPrefetchTTS:
+    return V3ParallelPrefetchTTS(
+        api_key=ELEVENLABS_API_KEY,
+        voice_id=VOICE_ID,
+        language_code=LANGUAGE_CODE,
+        model_id=MODEL_ID,
+        max_concurrency=3,     # tweak if needed
+        chunk_emit_size=8192,  # outgoing chunks to WS
+        stability=0.5,         # allowed: 0.0 | 0.5 | 1.0
+        output_format="mp3_44100_64",  # balanced speed/quality
+    )
+
+
+async def synthesize(text: str) -> bytes:
+    """A complete MP3 of a short text in the answers' voice and format, e.g. for pre-recorded phrases."""
+    return await _prefetch_tts().synthesize(text)
+
+
+# Answers being streamed from the LLM: trace_id -> queue of its deltas
+_answer_streams: dict[str, asyncio.Queue] = {}
+_speakers: set[asyncio.Task] = set()
+
+
+@bus.subscribe("manager.answer.delta")
+async def on_manager_answer_delta(event: ManagerAnswerDelta):
+    """
+    Routes a streamed answer piece to its trace's speaker. The first delta of
+    a trace starts one; this handler only enqueues, so deltas keep their order.
+    """
+    queue = _answer_streams.get(event.trace_id)
+    if queue is None:
+        if not ELEVENLABS_API_KEY:
+            if event.is_final:
+                print("❌ ELEVENLABS_API_KEY missing; TTS disabled.")
+            return
+        queue = _answer_streams[event.trace_id] = asyncio.Queue()
+        task = asyncio.create_task(_speak_answer_stream(event.trace_id, event.client_id, queue))
+        turns.track(event.client_id, task)
+        _speakers.add(task)
+        task.add_done_callback(_speakers.discard)
+    queue.put_nowait(event)
+
+
+async def _speak_answer_stream(trace_id: str, client_id, queue: asyncio.Queue):
+    """Synthesizes each sentence as soon as the LLM has finished it."""
+    full_text = None
+
+    async def sentences():
+        nonlocal full_text
+        segmenter = SentenceStreamer()
+        while True:
+            delta: ManagerAnswerDelta = await queue.get()
+            for sentence in segmenter.push(delta.text):
+                yield sentence
+            if delta.is_final:
+                full_text = delta.full_text
+                for sentence in segmenter.flush():
+                    yield sentence
+                return
+
+    print(f"🔊 TTS streaming answer {trace_id} for client {client_id}")
+    tts = _prefetch_tts()
+    try:
+        await tts.stream_sentences(client_id, sentences())
+        await tts.send_final(client_id, full_text or "")
+    finally:
+        _answer_streams.pop(trace_id, None)
+
+
 @bus.subscribe("manager.answer")
 async def on_manager_answer(event: ManagerAnswer):
     print(f"🔊 TTS received manager.answer for client {event.client_id}: '{event.text}'")
@@ -23,6 +95,8 @@ async def on_manager_answer(event: ManagerAnswer):
     if not ELEVENLABS_API_KEY:
         print("❌ ELEVENLABS_API_KEY missing; TTS disabled.")
         return
+    # Cancelled when the caller barges in
+    turns.track(event.client_id)
 
     # Choose fast path (single stream) vs parallel prefetch
     if _is_short(event.text):
@@ -39,14 +113,5 @@ async def on_manager_answer(event: ManagerAnswer):
 
     print(f"📚 Using long text path for: '{event.text}'")
     # --- Long text path (parallel prefetch by sentence)
-    tts = V3ParallelPrefetchTTS(
-        api_key=ELEVENLABS_API_KEY,
-        voice_id=VOICE_ID,
-        language_code=LANGUAGE_CODE,
-        model_id=MODEL_ID,
-        max_concurrency=3,     # tweak if needed
-        chunk_emit_size=8192,  # outgoing chunks to WS
-        stability=0.5,         # allowed: 0.0 | 0.5 | 1.0
-        output_format="mp3_44100_64",  # balanced speed/quality
-    )
+    tts = _prefetch_tts()
     await tts.stream(event)
\ No newline at end of file
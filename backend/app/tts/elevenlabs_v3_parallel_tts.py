@@ -3,7 +3,7 @@ import asyncio
 import contextlib
 import io
 import re
-from typing import List, Tuple, Dict
+from typing import AsyncIterator, Dict, List, Tuple
 
 import aiohttp
 
@@ -34,6 +34,42 @@ def split_sentences(text: str, max_chars: int = 220) -> List[str]:
                 parts.append(" ".join(buf))
     return parts
 
+class SentenceStreamer:
+    """
+    Inkrementaalne lausetükeldus voogedastatud tekstile: ``push`` tagastab
+    laused kohe, kui need on lõppenud; ``flush`` ülejäägi voo lõpus.
+    """
+
+    def __init__(self, max_chars: int = 220):
+        self.max_chars = max_chars
+        self._buf = ""
+
+    def push(self, delta: str) -> List[str]:
+        self._buf += delta
+        last = None
+        for last in _SENT_SPLIT.finditer(self._buf):
+            pass
+        if last is not None:
+            done, self._buf = self._buf[:last.start()], self._buf[last.end():]
+            return split_sentences(done, self.max_chars)
+        if len(self._buf) > self.max_chars:
+            # Pikk lõik ilma lauselõputa: saada välja kõik peale viimase tüki
+            parts = split_sentences(self._buf, self.max_chars)
+            if len(parts) > 1:
+                self._buf = parts[-1]
+                return parts[:-1]
+        return []
+
+    def flush(self) -> List[str]:
+        rest, self._buf = self._buf, ""
+        return split_sentences(rest, self.max_chars)
+
+
+async def _iterate(items: List[str]):
+    for item in items:
+        yield item
+
+
 def prosody_prep(s: str) -> str:
     """Lihtsad eestipärased parandused: komad, ühikud, %-d, kellaajad."""
     s = re.sub(r"\s+", " ", s).strip()
@@ -106,6 +142,13 @@ class V3ParallelPrefetchTTS:
                     buff.write(chunk)
         return idx, buff.getvalue()
 
+    async def synthesize(self, text: str) -> bytes:
+        """Ühe lühikese teksti terviklik MP3 (nt ette salvestatud fraasid)."""
+        timeout = aiohttp.ClientTimeout(total=30, connect=8)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            _, mp3 = await self._fetch_one(session, 0, text)
+        return mp3
+
     async def stream(self, event: ManagerAnswer):
         """
         1) Tükelda tekst lauseteks.
@@ -120,57 +163,84 @@ class V3ParallelPrefetchTTS:
                 await active_connections[event.client_id].send_json({"isFinal": True})
             return
 
+        await self.stream_sentences(event.client_id, _iterate(parts))
+        await self.send_final(event.client_id, event.text)
+
+    async def stream_sentences(self, client_id, sentences: AsyncIterator[str]):
+        """
+        Sama mis ``stream``, aga laused saabuvad jooksvalt (nt LLM-i voost):
+        iga lause päring algab kohe, kui lause on olemas, ja esitus järgib
+        lausete järjekorda.
+        """
         timeout = aiohttp.ClientTimeout(total=120, connect=8, sock_read=90)
         sem = asyncio.Semaphore(self.max_concurrency)
 
         results: Dict[int, bytes] = {}
-        ready_events = [asyncio.Event() for _ in range(len(parts))]
-        next_to_emit = 0
+        ready_events: List[asyncio.Event] = []
+        order: asyncio.Queue = asyncio.Queue()  # indeksid esitusjärjekorras, None = lõpp
+        tasks: List[asyncio.Task] = []
 
         async with aiohttp.ClientSession(timeout=timeout) as session:
 
             async def worker(i: int, t: str):
-                nonlocal results
                 async with sem:
                     idx, mp3 = await self._fetch_one(session, i, t)
                     results[idx] = mp3
                     ready_events[idx].set()
 
-            tasks = [asyncio.create_task(worker(i, t)) for i, t in enumerate(parts)]
+            async def reader():
+                try:
+                    async for t in sentences:
+                        i = len(ready_events)
+                        ready_events.append(asyncio.Event())
+                        tasks.append(asyncio.create_task(worker(i, t)))
+                        order.put_nowait(i)
+                finally:
+                    order.put_nowait(None)
+
+            reader_task = asyncio.create_task(reader())
 
             # Emitteri tsükkel: oota alati JÄRGMIST indeksit ja esita kohe
             try:
-                while next_to_emit < len(parts):
-                    await ready_events[next_to_emit].wait()  # oota kuni just see lause on valmis
+                while (next_to_emit := await order.get()) is not None:
+                    worker_task = tasks[next_to_emit]
+                    ready = asyncio.create_task(ready_events[next_to_emit].wait())
+                    await asyncio.wait({ready, worker_task}, return_when=asyncio.FIRST_COMPLETED)
+                    ready.cancel()
+                    if next_to_emit not in results:
+                        worker_task.result()  # päring ebaõnnestus: tõstatab vea
                     mp3 = results.pop(next_to_emit)
                     # tükelda väikesteks pakkideks ja saada kliendile
                     mv = memoryview(mp3)
                     pos = 0
                     step = self.chunk_emit_size
                     while pos < len(mv):
-                        chunk = mv[pos:pos+step].tobytes()
+                        chunk = mv[pos:pos+step]  # zero-copy slice, mp3 stays alive via mv
                         pos += step
-                        await bus.publish("tts.audio", TTSAudio(chunk=chunk, client_id=event.client_id))
-                    next_to_emit += 1
+                        await bus.publish("tts.audio", TTSAudio(chunk=chunk, client_id=client_id))
+                    # lause on terviklik MP3: klient võib selle kohe esitada
+                    await bus.publish("tts.audio", TTSAudio(chunk=b"", client_id=client_id, segment_end=True))
             except Exception as e:
                 print(f"[v3-prefetch] emit error: {e}")
             finally:
                 # lõpeta tööd kenasti
-                for t in tasks:
-                    with contextlib.suppress(asyncio.CancelledError):
-                        if not t.done():
-                            t.cancel()
-                for t in tasks:
+                for t in [reader_task, *tasks]:
+                    if not t.done():
+                        t.cancel()
+                for t in [reader_task, *tasks]:
                     with contextlib.suppress(asyncio.CancelledError, Exception):
                         await t
 
-        # Lõpu-signal
+    async def send_final(self, client_id, text: str):
+        """Lõpu-signaal: assistendi tekst ja isFinal."""
+        from app.api.ws import active_connections
+
         try:
-            if event.client_id in active_connections:
-                await active_connections[event.client_id].send_json({
-                    "client_id": str(event.client_id),
+            if client_id in active_connections:
+                await active_connections[client_id].send_json({
+                    "client_id": str(client_id),
                     "role": "assistant",
-                    "text": event.text,
+                    "text": text,
                     "isFinal": True
                 })
         except Exception as se:
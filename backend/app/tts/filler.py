@@ -0,0 +1,180 @@
+"""
+Latency masking: a short acknowledgement spoken while a slow answer is still being generated
+"""
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app.bus import bus
+from app.core import config
+from app.core.metrics import metrics
+from app.core.turns import turns
+from app.llm.scheduler import DEFAULT, llm_scheduler
+from app.schemas.events import ManagerRoute, TTSAudio
+from app.tts.elevenlabs_tts_manager import synthesize
+
+PHRASES = ("Hetk, vaatan…", "Üks hetk, kontrollin.", "Kohe vaatan.")
+
+
+def parse_defaults(spec: str) -> Dict[str, float]:
+    """``"booking:long=2500,booking:turn=1800"`` -> ``{kind: ms}``; malformed entries are skipped."""
+    defaults: Dict[str, float] = {}
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        kind, _, ms = entry.rpartition("=")
+        try:
+            defaults[kind.strip()] = float(ms)
+        except ValueError:
+            print(f"⚠️ Ignoring filler default '{entry}'")
+    return defaults
+
+
+class _Turn:
+    __slots__ = ("kind", "started_at", "heard", "filler_at")
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.started_at = time.monotonic()
+        self.heard = False                      # any playable audio sent, filler included
+        self.filler_at: Optional[float] = None
+
+
+class FillerPlayer:
+    """
+    Covers the dead air between the end of the caller's turn and the first
+    audio of the answer with a pre-synthesized acknowledgement ("Hetk, vaatan…").
+
+    A turn gets the filler when the router escalated it and its expected time
+    to first audio (recent median for that kind of escalation, e.g.
+    ``booking:question``, plus the current LLM queue wait) is above
+    ``threshold_ms``; turns answered locally never do. Until a kind has been
+    timed, ``defaults`` (or ``default_ms``) stands in for its median, so a
+    fresh process fills too. Clips are synthesized once, in the voice and MP3
+    format of the answers, and sent as a playable segment: the client plays
+    it at once and the answer's sentences after it.
+
+    Both timings run from the routing decision to the moment the first
+    playable segment (a sentence, or a short answer as a whole) is handed to
+    the client's socket; network and playback start are not included:
+    ``voice.perceived_first_audio_sent_ms`` counts the filler,
+    ``voice.first_audio_sent_ms`` only the answer.
+    """
+
+    def __init__(
+        self,
+        phrases=PHRASES,
+        threshold_ms: float = 1200,
+        defaults: Optional[Dict[str, float]] = None,
+        default_ms: float = 1800,
+        max_clients: int = 1000,
+    ):
+        self.phrases = phrases
+        self.threshold_ms = threshold_ms
+        self.defaults = defaults or {}
+        self.default_ms = default_ms
+        self.max_clients = max_clients
+        self.clips: List[tuple] = []            # (phrase, mp3 bytes)
+        self._next = itertools.count()
+        self._turns: OrderedDict = OrderedDict()
+        self._warming: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.clips)
+
+    # --- clips ---
+
+    def start(self):
+        """Synthesizes the clips in the background; turns get no filler until they are ready."""
+        if config.FILLER_ENABLED and config.ELEVENLABS_API_KEY and self._warming is None:
+            self._warming = asyncio.create_task(self.warm())
+
+    async def close(self):
+        if self._warming is not None and not self._warming.done():
+            self._warming.cancel()
+
+    async def warm(self):
+        for phrase in self.phrases:
+            try:
+                audio = await synthesize(phrase)
+            except Exception as e:
+                print(f"❌ Filler clip '{phrase}' failed: {e}")
+                continue
+            if audio:
+                self.clips.append((phrase, audio))
+        print(f"🫧 Filler clips ready: {len(self.clips)}/{len(self.phrases)}")
+
+    # --- decisions ---
+
+    def expected_ms(self, kind: str) -> float:
+        """Expected time to the answer's first audio: the configured default until the kind is timed."""
+        typical = metrics.percentile(f"voice.first_audio_sent_ms.{kind}", 50)
+        if typical is None:
+            typical = self.defaults.get(kind, self.default_ms)
+        return typical + llm_scheduler.expected_wait_s(DEFAULT) * 1000
+
+    def begin(self, client_id, event: ManagerRoute) -> _Turn:
+        # Escalations keep their kind; local answers are grouped (faq:<id> -> faq)
+        kind = event.intent if event.agents else event.intent.split(":")[0]
+        turn = self._turns[client_id] = _Turn(kind)
+        self._turns.move_to_end(client_id)
+        while len(self._turns) > self.max_clients:
+            self._turns.popitem(last=False)
+        return turn
+
+    async def play(self, client_id, turn: _Turn):
+        phrase, audio = self.clips[next(self._next) % len(self.clips)]
+        turn.filler_at = time.monotonic()
+        metrics.incr("voice.filler.played")
+        print(f"🫧 Filler '{phrase}' for {client_id}")
+        # A complete segment: the client plays it right away, the answer queues behind it
+        await bus.publish("tts.audio", TTSAudio(
+            chunk=audio, client_id=client_id, text=phrase, filler=True, segment_end=True,
+        ))
+
+    # --- timing ---
+
+    def on_audio(self, event: TTSAudio):
+        # Audio becomes playable on the client at a segment boundary (or a short answer's end)
+        turn = self._turns.get(event.client_id)
+        if turn is None or not (event.segment_end or event.is_final):
+            return
+        elapsed_ms = (time.monotonic() - turn.started_at) * 1000
+        if not turn.heard:
+            turn.heard = True
+            metrics.observe("voice.perceived_first_audio_sent_ms", elapsed_ms)
+        if event.filler:
+            return
+        del self._turns[event.client_id]
+        metrics.observe("voice.first_audio_sent_ms", elapsed_ms)
+        metrics.observe(f"voice.first_audio_sent_ms.{turn.kind}", elapsed_ms)
+        if turn.filler_at is not None:
+            metrics.observe("voice.filler.lead_ms", (time.monotonic() - turn.filler_at) * 1000)
+
+
+# Shared instance; started with the app
+filler = FillerPlayer(
+    threshold_ms=config.FILLER_THRESHOLD_MS,
+    defaults=parse_defaults(config.FILLER_DEFAULT_MS_BY_KIND),
+    default_ms=config.FILLER_DEFAULT_MS,
+)
+
+
+@bus.subscribe("manager.route")
+async def on_manager_route(event: ManagerRoute):
+    turn = filler.begin(event.client_id, event)
+    if not event.agents or not filler.ready:
+        return
+    expected = filler.expected_ms(turn.kind)
+    if expected < filler.threshold_ms:
+        metrics.incr("voice.filler.skipped")
+        return
+    # Cancelled with the turn on barge-in
+    turns.track(event.client_id)
+    await filler.play(event.client_id, turn)
+
+
+@bus.subscribe("tts.audio")
+async def on_tts_audio(event: TTSAudio):
+    filler.on_audio(event)
@@ -0,0 +1,114 @@
+"""
+Per-chunk cost of the audio events: the previous pydantic models vs. the slotted dataclasses.
+
+Run from the backend directory:
+    python -m benchmarks.bench_audio_events [--iterations 200000] [--subscribers 1]
+
+Measures, per chunk:
+- inbound: building ClientAudio for a 4 KiB microphone frame;
+- outbound: building TTSAudio for an 8 KiB slice of a fetched MP3 (the old
+  path copied the slice with ``tobytes()``, the new one passes the memoryview);
+- fan-out: publishing those events on an ordered topic to routed subscribers.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Literal
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from app.bus.memory_bus import MemoryEventBus
+from app.schemas.events import ClientAudio, TTSAudio
+
+FRAME = b"\x01\x00" * 2048       # 4 KiB of 16-bit PCM
+MP3 = bytes(range(256)) * 256    # 64 KiB "sentence"
+SLICE = 8192
+
+
+# The event types as they were before (pydantic, validated, bytes only)
+class PydanticClientAudio(BaseModel):
+    chunk: bytes
+    encoding: Literal["pcm_s16le"] = "pcm_s16le"
+    sr: int = 16000
+    client_id: UUID
+
+
+class PydanticTTSAudio(BaseModel):
+    chunk: bytes
+    mime: Literal["audio/mpeg"] = "audio/mpeg"
+    client_id: UUID
+
+
+def _per_call_us(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def bench_construct(iterations: int):
+    client_id = uuid.uuid4()
+    mv = memoryview(MP3)
+
+    def old_in():
+        PydanticClientAudio(chunk=FRAME, client_id=client_id)
+
+    def new_in():
+        ClientAudio(chunk=FRAME, client_id=client_id)
+
+    def old_out():
+        PydanticTTSAudio(chunk=mv[SLICE:2 * SLICE].tobytes(), client_id=client_id)
+
+    def new_out():
+        TTSAudio(chunk=mv[SLICE:2 * SLICE], client_id=client_id)
+
+    print(f"inbound frame  ({len(FRAME) // 1024} KiB):  pydantic {_per_call_us(old_in, iterations):.2f} us"
+          f" -> slots {_per_call_us(new_in, iterations):.2f} us")
+    print(f"outbound chunk ({SLICE // 1024} KiB):  pydantic + tobytes {_per_call_us(old_out, iterations):.2f} us"
+          f" -> slots + memoryview {_per_call_us(new_out, iterations):.2f} us")
+
+
+async def bench_fanout(iterations: int, subscribers: int):
+    bus = MemoryEventBus(ordered_topics=("client.audio", "tts.audio"))
+    client_id = uuid.uuid4()
+    mv = memoryview(MP3)
+    received = 0
+
+    async def on_event(event):
+        nonlocal received
+        received += len(event.chunk)
+
+    for _ in range(subscribers):
+        bus.subscribe("client.audio", on_event, key=client_id)
+        bus.subscribe("tts.audio", on_event, key=client_id)
+
+    cases = (
+        ("inbound  pydantic", "client.audio", lambda: PydanticClientAudio(chunk=FRAME, client_id=client_id)),
+        ("inbound  slots", "client.audio", lambda: ClientAudio(chunk=FRAME, client_id=client_id)),
+        ("outbound pydantic + tobytes", "tts.audio",
+         lambda: PydanticTTSAudio(chunk=mv[:SLICE].tobytes(), client_id=client_id)),
+        ("outbound slots + memoryview", "tts.audio", lambda: TTSAudio(chunk=mv[:SLICE], client_id=client_id)),
+    )
+    print(f"publish to {subscribers} routed subscriber(s):")
+    for label, topic, make in cases:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await bus.publish(topic, make(), key=client_id)
+        per_chunk = (time.perf_counter() - started) / iterations * 1e6
+        print(f"  {label:<28} {per_chunk:.2f} us/chunk")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    parser.add_argument("--subscribers", type=int, default=1)
+    args = parser.parse_args()
+
+    bench_construct(args.iterations)
+    asyncio.run(bench_fanout(args.iterations, args.subscribers))
+
+
+if __name__ == "__main__":
+    main()
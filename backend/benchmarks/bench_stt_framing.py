@@ -0,0 +1,110 @@
+"""
+STT request framing: gRPC messages per second and time to first partial, by client frame size.
+
+Run from the backend directory:
+    python -m benchmarks.bench_stt_framing [--seconds 2] [--frame-ms 100]
+
+Feeds GoogleSTT real-time PCM in browser frames of several sizes through a
+fake ``streaming_recognize`` (no network). The fake counts the audio
+requests it receives and answers with a partial once it has heard
+``--partial-after-ms`` of audio, as a recognizer needs some speech before its
+first hypothesis. Each frame size is run twice:
+- ``per-frame``: one request per client frame (the behaviour before re-framing);
+- ``reframed``: frames re-framed to ``STT_FRAME_MS``.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+
+from app.bus import bus
+from app.core import config
+from app.schemas.events import ClientAudio, STTPartial
+from app.stt.google_stt import GoogleSTT
+
+CLIENT_FRAME_MS = (10, 20, 40, 100, 250)
+
+
+class FakeSpeechClient:
+    """Stands in for SpeechAsyncClient: counts audio requests, answers once enough audio arrived."""
+
+    def __init__(self, partial_after_ms: float, rate: int):
+        self.partial_after_bytes = int(partial_after_ms * rate / 1000) * 2
+        self.requests = 0
+
+    async def streaming_recognize(self, requests):
+        return self._responses(requests)
+
+    async def _responses(self, requests):
+        received = 0
+        answered = False
+        async for request in requests:
+            if not request.audio:
+                continue  # the config request
+            self.requests += 1
+            received += len(request.audio)
+            if not answered and received >= self.partial_after_bytes:
+                answered = True
+                result = SimpleNamespace(
+                    alternatives=[SimpleNamespace(transcript="tere")],
+                    is_final=False,
+                    result_end_offset=None,
+                )
+                yield SimpleNamespace(results=[result])
+
+
+async def run_case(client_frame_ms: int, reframe: bool, seconds: float, partial_after_ms: float) -> dict:
+    client_id = uuid.uuid4()
+    rate = GoogleSTT.sample_rate
+    fake = FakeSpeechClient(partial_after_ms, rate)
+    stt = GoogleSTT(client_id, recognizer_path="bench", client=fake)
+    if not reframe:
+        stt.CHUNK = int(rate * client_frame_ms / 1000) * 2  # every client frame is one request
+
+    first_partial = asyncio.get_running_loop().create_future()
+
+    async def on_partial(event: STTPartial):
+        if event.client_id == client_id and not first_partial.done():
+            first_partial.set_result(time.perf_counter())
+
+    bus.subscribe("stt.partial", on_partial)
+    frame = b"\x10\x27" * int(rate * client_frame_ms / 1000)  # loud enough to count as speech
+    frames = int(seconds * 1000 / client_frame_ms)
+    try:
+        await stt.start()
+        started = time.perf_counter()
+        for i in range(frames):
+            await stt.on_audio_chunk(ClientAudio(chunk=frame, client_id=client_id))
+            # Real time: the browser sends a frame once it has recorded it
+            await asyncio.sleep(max(0.0, started + (i + 1) * client_frame_ms / 1000 - time.perf_counter()))
+        first_at = await asyncio.wait_for(first_partial, timeout=5)
+        await stt.stop()
+    finally:
+        bus.unsubscribe("stt.partial", on_partial)
+    return {
+        "messages_per_s": fake.requests / seconds,
+        "first_partial_ms": (first_at - started) * 1000,
+    }
+
+
+async def main(args):
+    config.STT_VAD_ENABLED = False  # every frame is uploaded; VAD gating is measured elsewhere
+    print(f"re-framed to {config.STT_FRAME_MS} ms, partial after {args.partial_after_ms:.0f} ms of audio, {args.seconds:.0f} s per case")
+    print(f"{'client frame':>12}  {'mode':<9}  {'msgs/s':>7}  {'first partial':>13}")
+    for client_frame_ms in CLIENT_FRAME_MS:
+        for reframe in (False, True):
+            result = await run_case(client_frame_ms, reframe, args.seconds, args.partial_after_ms)
+            print(f"{client_frame_ms:>9} ms  {'reframed' if reframe else 'per-frame':<9}  "
+                  f"{result['messages_per_s']:>7.1f}  {result['first_partial_ms']:>10.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--partial-after-ms", type=float, default=300.0)
+    parser.add_argument("--frame-ms", type=int, default=None, help="override STT_FRAME_MS")
+    args = parser.parse_args()
+    if args.frame_ms:
+        config.STT_FRAME_MS = args.frame_ms
+    asyncio.run(main(args))
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Run from the backend directory, like the app: `python -m pytest tests`
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("DB_URL", "app/data/context_database.json")
@@ -0,0 +1,195 @@
+"""
+LLMClient endpoint pool against mock servers: failover, hedging and health checks
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.core.metrics import metrics
+from app.llm.client import LLMClient
+
+A = "http://llm-a:8000/v1/completions"
+B = "http://llm-b:8000/v1/completions"
+
+
+class MockServers:
+    """
+    One handler per host, served through httpx.MockTransport. A server is a
+    (status, delay_s) pair, or an exception to raise instead of answering.
+    """
+
+    def __init__(self, **servers):
+        self.servers = servers
+        self.calls: list[str] = []
+        self.cancelled: list[str] = []
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host.split("-")[1]
+        self.calls.append(f"{host} {request.url.path}")
+        server = self.servers[host]
+        if isinstance(server, Exception):
+            raise server
+        status, delay_s = server
+        if request.url.path.endswith("/completions") and json.loads(request.content).get("stream"):
+            return httpx.Response(status, content=self._stream(host, delay_s))
+        try:
+            await asyncio.sleep(delay_s)
+        except asyncio.CancelledError:
+            self.cancelled.append(host)
+            raise
+        return httpx.Response(status, json={"choices": [{"text": f"from {host}"}]})
+
+    async def _stream(self, host: str, delay_s: float):
+        try:
+            await asyncio.sleep(delay_s)
+            yield f'data: {{"choices": [{{"text": "from {host}"}}]}}\n\n'.encode()
+            yield b"data: [DONE]\n\n"
+        except asyncio.CancelledError:
+            self.cancelled.append(host)
+            raise
+
+
+def _client(servers: MockServers, **kwargs) -> LLMClient:
+    client = LLMClient([A, B], health_interval_s=0, **kwargs)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(servers.handle))
+    return client
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_failover_on_5xx():
+    servers = MockServers(a=(503, 0), b=(200, 0))
+
+    async def main():
+        client = _client(servers)
+        data = await client.complete({"prompt": "tere"})
+        await client.close()
+        return client, data
+
+    client, data = asyncio.run(main())
+    assert data["choices"][0]["text"] == "from b"
+    assert servers.calls == ["a /v1/completions", "b /v1/completions"]
+    assert metrics.counter("llm.failover.started") == 1
+    assert client.endpoints[0].failures == 1 and client.endpoints[1].failures == 0
+
+
+def test_failover_on_connect_error():
+    servers = MockServers(a=httpx.ConnectError("refused"), b=(200, 0))
+
+    async def main():
+        client = _client(servers)
+        data = await client.complete({"prompt": "tere"})
+        await client.close()
+        return data
+
+    assert asyncio.run(main())["choices"][0]["text"] == "from b"
+
+
+def test_no_failover_on_4xx():
+    servers = MockServers(a=(400, 0), b=(200, 0))
+
+    async def main():
+        client = _client(servers)
+        try:
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.complete({"prompt": "tere"})
+        finally:
+            await client.close()
+        return client
+
+    client = asyncio.run(main())
+    assert servers.calls == ["a /v1/completions"]
+    assert client.endpoints[0].failures == 0  # the request's fault, not the server's
+
+
+def test_failover_happens_once():
+    servers = MockServers(a=(502, 0), b=(503, 0))
+
+    async def main():
+        client = _client(servers)
+        try:
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.complete({"prompt": "tere"})
+        finally:
+            await client.close()
+
+    asyncio.run(main())
+    assert len(servers.calls) == 2
+
+
+def test_hedge_wins_over_slow_primary():
+    servers = MockServers(a=(200, 2.0), b=(200, 0))
+    for _ in range(20):
+        metrics.observe("llm.endpoint.complete_ms", 10)
+
+    async def main():
+        client = _client(servers, hedge=True, hedge_min_ms=50)
+        started = asyncio.get_running_loop().time()
+        data = await client.complete({"prompt": "tere"})
+        elapsed = asyncio.get_running_loop().time() - started
+        await client.close()
+        return client, data, elapsed
+
+    client, data, elapsed = asyncio.run(main())
+    assert data["choices"][0]["text"] == "from b"
+    assert elapsed < 1.0
+    assert servers.cancelled == ["a"]
+    assert metrics.counter("llm.hedge.started") == 1 and metrics.counter("llm.hedge.won") == 1
+    assert all(e.outstanding == 0 for e in client.endpoints)
+
+
+def test_no_hedge_without_samples_or_before_the_delay():
+    servers = MockServers(a=(200, 0.1), b=(200, 0.1))
+
+    async def main():
+        client = _client(servers, hedge=True, hedge_min_ms=50)
+        await client.complete({"prompt": "tere"})  # no timings yet: never hedged
+        for _ in range(20):
+            metrics.observe("llm.endpoint.complete_ms", 500)
+        await client.complete({"prompt": "tere"})  # answers well before the p95
+        await client.close()
+
+    asyncio.run(main())
+    assert servers.calls == ["a /v1/completions", "b /v1/completions"]  # one request per call
+    assert metrics.counter("llm.hedge.started") == 0
+
+
+def test_streamed_hedge_closes_the_loser():
+    servers = MockServers(a=(200, 2.0), b=(200, 0))
+    for _ in range(20):
+        metrics.observe("llm.endpoint.first_byte_ms", 10)
+
+    async def main():
+        client = _client(servers, hedge=True, hedge_min_ms=50)
+        async with client.stream({"prompt": "tere", "stream": True}) as response:
+            lines = [line async for line in response.aiter_lines() if line]
+        await client.close()
+        return client, lines
+
+    client, lines = asyncio.run(main())
+    assert lines[0] == 'data: {"choices": [{"text": "from b"}]}'
+    assert servers.cancelled == ["a"]
+    assert all(e.outstanding == 0 for e in client.endpoints)
+
+
+@pytest.mark.parametrize("status, healthy", [(200, True), (404, True), (503, False)])
+def test_health_check(status, healthy):
+    servers = MockServers(a=(status, 0), b=(200, 0))
+
+    async def main():
+        client = _client(servers, health_path="/ping")
+        await client.check_health()
+        await client.close()
+        return client
+
+    client = asyncio.run(main())
+    assert sorted(servers.calls) == ["a /ping", "b /ping"]
+    assert client.endpoints[0].healthy is healthy
+    assert client.pick() is (client.endpoints[0] if healthy else client.endpoints[1])
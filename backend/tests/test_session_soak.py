@@ -0,0 +1,89 @@
+"""
+Soak test: opening and closing many calls leaves nothing behind on the shared bus or loop
+"""
+import asyncio
+import gc
+import uuid
+import weakref
+
+from app.api.session import CallSession
+from app.bus import bus
+from app.core.turns import turns
+from app.schemas.events import ClientAudio, STTFinal
+from app.stt.replay_stt import ReplaySTT
+
+CALLS = 300
+
+# Two quick turns per call, started by the first audio chunk
+SCRIPT = {
+    "start_on": "audio",
+    "partial_interval_ms": 1,
+    "final_delay_ms": 1,
+    "turns": [
+        {"pause_ms": 0, "text": "Tere"},
+        {"pause_ms": 0, "text": "Millised on teie lahtiolekuajad"},
+    ],
+}
+
+
+def _footprint() -> dict:
+    return {
+        "subscribers": sum(len(callbacks) for callbacks in bus.subscribers.values()),
+        "routed": sum(len(routes) for routes in bus.keyed_subscribers.values()),
+        "bus_tasks": len(bus._tasks),
+        "tasks": len(asyncio.all_tasks()),
+        "turns": len(turns._turns),
+    }
+
+
+async def _call(finished: bool, sessions: weakref.WeakSet):
+    """One call, wired the way websocket_endpoint wires it."""
+    client_id = uuid.uuid4()
+    async with CallSession(client_id) as session:
+        sessions.add(session)
+        session.on_close(lambda: turns.forget(client_id))
+        await bus.register_connection(client_id)
+        session.on_close(lambda: bus.unregister_connection(client_id))
+
+        stt = ReplaySTT(client_id, script=SCRIPT)
+        stt.attach(session)
+        await stt.start()
+
+        queue = session.register_queue(asyncio.Queue())
+        queue.put_nowait(b"\0" * 3200)
+        await bus.publish("client.audio", ClientAudio(chunk=b"\0" * 320, client_id=client_id), key=client_id)
+
+        if finished:
+            await stt._task
+        else:
+            # Hang up mid-answer
+            await asyncio.sleep(0.003)
+    assert session.closed and queue.empty()
+
+
+def test_sessions_leave_nothing_behind():
+    async def answer(event: STTFinal):
+        # Stand-in for the LLM/TTS work on a turn: only the call closing ends it
+        turns.track(event.client_id)
+        await asyncio.sleep(3600)
+
+    async def main():
+        bus.subscribe("stt.final", answer)
+        try:
+            sessions = weakref.WeakSet()
+            await _call(True, sessions)
+            await asyncio.wait_for(bus.drain(), 5)
+            baseline = _footprint()
+
+            for i in range(CALLS):
+                await _call(i % 2 == 0, sessions)
+            # An answer left running after its call closed would never finish
+            await asyncio.wait_for(bus.drain(), 5)
+
+            assert _footprint() == baseline
+            gc.collect()
+            assert len(sessions) == 0
+        finally:
+            bus.unsubscribe("stt.final", answer)
+
+    asyncio.run(main())
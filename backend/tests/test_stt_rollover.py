@@ -0,0 +1,186 @@
+"""
+GoogleSTT stream rollover against a fake streaming_recognize with a time limit
+"""
+import asyncio
+import time
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("google.cloud.speech_v2")
+
+from app.core import config  # noqa: E402
+from app.schemas.events import ClientAudio  # noqa: E402
+from app.stt import google_stt  # noqa: E402
+
+RATE = 16000
+FRAME_MS = 100
+FRAME_SAMPLES = RATE * FRAME_MS // 1000
+FINAL_EVERY = 5  # frames per final result
+
+
+def _frame(index: int) -> bytes:
+    # Loud enough to pass the VAD; the sample value tells the fake which frame it got
+    return np.full(FRAME_SAMPLES, 10000 + index, dtype=np.int16).tobytes()
+
+
+class FakeRecognizer:
+    """
+    SpeechAsyncClient stand-in. Every stream ends after ``limit_s`` like the
+    real service's session limit, and reports a final result (the indices of
+    the frames it covers) every ``FINAL_EVERY`` frames, with offsets relative
+    to the audio that stream received.
+    """
+
+    def __init__(self, limit_s: float):
+        self.limit_s = limit_s
+        self.received: list[list[int]] = []  # frame indices, per stream
+
+    async def streaming_recognize(self, requests):
+        frames: list[int] = []
+        self.received.append(frames)
+        return self._responses(requests, frames)
+
+    async def _responses(self, requests, frames: list[int]):
+        deadline = time.monotonic() + self.limit_s
+        pending: list[int] = []
+        requests = aiter(requests)
+        while True:
+            try:
+                request = await asyncio.wait_for(anext(requests), deadline - time.monotonic())
+            except (StopAsyncIteration, asyncio.TimeoutError):
+                return
+            if not request.audio:
+                continue  # the config request
+            audio = np.frombuffer(request.audio, dtype=np.int16)
+            assert audio.size == FRAME_SAMPLES
+            frames.append(int(audio[0]) - 10000)
+            pending.append(frames[-1])
+            if len(pending) == FINAL_EVERY:
+                result = SimpleNamespace(
+                    alternatives=[SimpleNamespace(transcript=" ".join(map(str, pending)))],
+                    is_final=True,
+                    result_end_offset=timedelta(milliseconds=len(frames) * FRAME_MS),
+                )
+                pending = []
+                yield SimpleNamespace(results=[result])
+
+
+class Turns:
+    """Records what the recognizer reports to the turn detector."""
+
+    def __init__(self):
+        self.finals: list[tuple[list[int], int, int]] = []
+
+    async def on_final(self, text, start_ms, end_ms):
+        self.finals.append(([int(i) for i in text.split()], start_ms, end_ms))
+
+    async def on_partial(self, text, start_ms, end_ms):
+        pass
+
+    def on_speech_start(self, at_ms):
+        pass
+
+    def on_speech_end(self, at_ms, lag_ms=0.0):
+        pass
+
+
+@pytest.fixture
+def stt_config(monkeypatch):
+    monkeypatch.setattr(config, "STT_FRAME_MS", FRAME_MS)
+    monkeypatch.setattr(config, "STT_VAD_START_MS", 60)
+    monkeypatch.setattr(config, "STT_ROLLOVER_REPLAY_MS", 10000)
+    monkeypatch.setattr(config, "STT_ROLLOVER_WINDOW_S", 0)
+    monkeypatch.setattr(google_stt, "STT_INGRESS_POLICY", "drop_oldest")
+    return monkeypatch
+
+
+def _run(limit_s: float, frames: int, burst: range = range(0)):
+    """Feeds ``frames`` frames at 5x real time (``burst`` all at once) and waits for every final."""
+    async def main():
+        recognizer = FakeRecognizer(limit_s)
+        stt = google_stt.GoogleSTT(uuid.uuid4(), recognizer_path="test", client=recognizer)
+        stt.turns = turns = Turns()
+        await stt.start()
+        for i in range(frames):
+            await stt.on_audio_chunk(ClientAudio(chunk=_frame(i), client_id=stt.client_id))
+            if i not in burst:
+                await asyncio.sleep(FRAME_MS / 1000 / 5)
+
+        expected = frames - stt._audio_queue.dropped
+        deadline = time.monotonic() + 10
+        while sum(len(f) for f, _, _ in turns.finals) < expected - expected % FINAL_EVERY:
+            assert time.monotonic() < deadline, "not every frame was finalized"
+            await asyncio.sleep(0.05)
+        await stt.stop()
+        return recognizer, turns, stt._audio_queue.dropped
+
+    return asyncio.run(main())
+
+
+def _check_replay_and_finals(recognizer: FakeRecognizer, turns: Turns):
+    finalized = [i for frames, _, _ in turns.finals for i in frames]
+    assert len(finalized) == len(set(finalized)), "a final transcript was repeated"
+    assert finalized == sorted(finalized)
+
+    # A new stream starts with exactly the frames its predecessor had not finalized
+    for old, new in zip(recognizer.received, recognizer.received[1:]):
+        if not new:
+            continue
+        done = len(old) - len(old) % FINAL_EVERY
+        replayed = old[done:]
+        assert new[:len(replayed)] == replayed
+        assert all(i not in old for i in new[len(replayed):]), "audio was sent to a stream twice"
+    return finalized
+
+
+@pytest.mark.parametrize("vad", [True, False])
+def test_rollover_before_the_limit(stt_config, vad):
+    # The client rolls over 0.4 s into each 0.5 s stream
+    stt_config.setattr(config, "STT_VAD_ENABLED", vad)
+    stt_config.setattr(config, "STT_STREAM_MAX_S", 0.5)
+    stt_config.setattr(config, "STT_ROLLOVER_LEAD_S", 0.1)
+
+    recognizer, turns, _ = _run(limit_s=0.5, frames=60)
+
+    assert len(recognizer.received) >= 3
+    assert _check_replay_and_finals(recognizer, turns) == list(range(60))
+    for frames, _, end_ms in turns.finals:
+        assert end_ms == (frames[-1] + 1) * FRAME_MS
+
+
+def test_stream_killed_at_the_limit(stt_config):
+    # The service ends each stream after 0.5 s, long before the client would roll over
+    stt_config.setattr(config, "STT_VAD_ENABLED", True)
+    stt_config.setattr(config, "STT_STREAM_MAX_S", 300)
+
+    recognizer, turns, _ = _run(limit_s=0.5, frames=40)
+
+    assert len(recognizer.received) >= 2
+    assert _check_replay_and_finals(recognizer, turns) == list(range(40))
+
+
+@pytest.mark.parametrize("vad", [True, False])
+def test_dropped_ingress_keeps_the_call_clock(stt_config, vad):
+    # A burst overflows the 10-frame ingress buffer: offsets after the gap must
+    # still be call time, not uploaded time
+    stt_config.setattr(config, "STT_VAD_ENABLED", vad)
+    stt_config.setattr(config, "STT_STREAM_MAX_S", 0.8)
+    stt_config.setattr(config, "STT_ROLLOVER_LEAD_S", 0.1)
+    stt_config.setattr(google_stt, "STT_INGRESS_MAX_FRAMES", 10)
+
+    recognizer, turns, dropped = _run(limit_s=0.8, frames=70, burst=range(20, 45))
+
+    assert dropped > 0
+    finalized = _check_replay_and_finals(recognizer, turns)
+    # Frames after the last final only wait for a full result
+    missing = sorted(set(range(finalized[-1])) - set(finalized))
+    assert len(missing) == dropped and all(i in range(20, 45) for i in missing)
+    previous_end = 0
+    for frames, start_ms, end_ms in turns.finals:
+        assert end_ms == (frames[-1] + 1) * FRAME_MS
+        assert previous_end <= start_ms <= frames[0] * FRAME_MS
+        previous_end = end_ms
@@ -19,6 +19,9 @@ export const useVoiceSocket = () => {
   const audioQueue = useRef<Uint8Array[]>([]);
   const audioElement = useRef<HTMLAudioElement | null>(null);
   const receivingAudio = useRef<boolean>(false);
+  // Clips play one after another (filler, then the answer); a barge-in starts a new epoch
+  const playback = useRef<Promise<void>>(Promise.resolve());
+  const playbackEpoch = useRef(0);
 
   const [messages, setMessages] = useState<
     { role: "user" | "assistant"; content: string; timestamp: string }[]
@@ -60,6 +63,16 @@ export const useVoiceSocket = () => {
     });
   }, []);
 
+  const enqueuePlayback = useCallback(
+    (chunks: Uint8Array[]) => {
+      const epoch = playbackEpoch.current;
+      playback.current = playback.current.then(() =>
+        epoch === playbackEpoch.current ? playAudioChunks(chunks) : undefined
+      );
+    },
+    [playAudioChunks]
+  );
+
   // --- WebSocket connection ---
   const connectSocket = useCallback(() => {
     if (socket.current && socket.current.readyState === WebSocket.OPEN) {
@@ -89,6 +102,29 @@ export const useVoiceSocket = () => {
       if (typeof event.data === "string") {
         try {
           const message = JSON.parse(event.data);
+
+          // The caller spoke over the answer: stop it and drop queued audio
+          if (message.type === "barge_in") {
+            console.log(`✋ Barge-in (${message.reason}), stopping playback`);
+            audioQueue.current = [];
+            receivingAudio.current = false;
+            playbackEpoch.current += 1;
+            playback.current = Promise.resolve();
+            if (audioElement.current) {
+              audioElement.current.pause();
+              audioElement.current = null;
+            }
+            return;
+          }
+
+          // A finished sentence (or the filler before the answer): play it while the rest is synthesized
+          if (message.type === "segment") {
+            const chunks = [...audioQueue.current];
+            audioQueue.current = [];
+            if (chunks.length > 0) enqueuePlayback(chunks);
+            return;
+          }
+
           if (message.text) setTranscript(message.text);
 
           if (message.is_final || message.isFinal) {
@@ -108,7 +144,7 @@ export const useVoiceSocket = () => {
               if (audioQueue.current.length > 0) {
                 const chunks = [...audioQueue.current];
                 audioQueue.current = [];
-                playAudioChunks(chunks);
+                enqueuePlayback(chunks);
               }
             }
           }
@@ -121,7 +157,7 @@ export const useVoiceSocket = () => {
         audioQueue.current.push(new Uint8Array(event.data));
       }
     };
-  }, [playAudioChunks]);
+  }, [enqueuePlayback]);
 
   const disconnectSocket = useCallback(() => {
     if (socket.current) {
@@ -167,6 +203,16 @@ export const useVoiceSocket = () => {
       audioContext.current = new AudioContextClass({ sampleRate: 16000 });
       source.current = audioContext.current.createMediaStreamSource(stream);
 
+      // Tell the backend the rate we actually got (some browsers ignore the
+      // requested one); it resamples for the recognizer if needed.
+      socket.current?.send(
+        JSON.stringify({
+          type: "stt_init",
+          sampleRate: audioContext.current.sampleRate,
+          encoding: "LINEAR16",
+        })
+      );
+
       // --- Try to use AudioWorklet for efficiency ---
       try {
         await audioContext.current.audioWorklet.addModule(
@@ -18,6 +18,9 @@ fi
 mkdir -p /data/hf_cache
 
 # Run container
+# Prefix caching reuses the KV cache of the shared prompt prefix (system prompt +
+# business context, see backend/app/llm/prompt.py); prompt token details report
+# the cached token count per request in "usage".
 docker run --gpus all --network host --ipc=host --ulimit memlock=-1 \
   -e HF_TOKEN="$HF_TOKEN" \
   -v /data/hf_cache:/root/.cache/huggingface \
@@ -28,4 +31,6 @@ docker run --gpus all --network host --ipc=host --ulimit memlock=-1 \
   --max-model-len 8192 \
   --port 8000 \
   --host 0.0.0.0 \
+  --enable-prefix-caching \
+  --enable-prompt-tokens-details \
   --disable-log-stats